@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from accounts.permissions import VERSION_KEY, get_version
+
+
+USER_KEY = 'accounts:user:{user_pk}:{global_version}:{user_version}'
+# хеш пароля в кэш не попадает: файловый кэш или общий Redis читают и другие процессы
+CACHED_FIELDS = tuple(field.attname for field in User._meta.concrete_fields if field.attname != 'password')
+
+
+class CachedModelBackend(ModelBackend):
+    '''ModelBackend, который отдаёт пользователя сессии из кэша вместе с названиями его групп.
+    Ключ включает версии прав (accounts.permissions), поэтому смена групп, пароля или
+    активности пользователя (accounts.signals) даёт новый ключ'''
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(
+            user_pk=user_id,
+            global_version=get_version(VERSION_KEY),
+            user_version=get_version(f'{VERSION_KEY}:{user_id}'),
+        )
+        data = cache.get(key)
+        if data is None:
+            try:
+                user = User._default_manager.get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            data = {name: getattr(user, name) for name in CACHED_FIELDS}
+            data['group_names'] = frozenset(user.groups.values_list('name', flat=True))
+            data['session_auth_hash'] = user.get_session_auth_hash()
+            cache.set(key, data, settings.PERMISSIONS_CACHE_TIMEOUT)
+        user = make_user(data)
+        return user if self.user_can_authenticate(user) else None
+
+
+def make_user(data: dict) -> User:
+    '''пользователь из закэшированных полей. Пароль остаётся отложенным полем: чтение user.password
+    загрузит его из базы, а save() без update_fields его не перезапишет.
+    Сессию django.contrib.auth проверяет по HMAC пароля, сохранённому при загрузке'''
+    user = User.from_db(User._default_manager.db, CACHED_FIELDS, [data[name] for name in CACHED_FIELDS])
+    user.group_names = data['group_names']
+    session_auth_hash = data['session_auth_hash']
+    user.get_session_auth_hash = lambda: session_auth_hash
+    return user
@@ -0,0 +1,112 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from issue.models import Project, Task
+
+
+VERSION_KEY = 'accounts:permissions:version'
+STATE_KEY = 'accounts:permissions:{user_pk}:{global_version}:{user_version}'
+
+
+def get_version(key: str) -> int:
+    '''версия хранится без срока жизни и стартует со времени, чтобы после
+    потери ключа не совпасть с версией старых записей'''
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(user_pk=None):
+    '''сбрасывает кэш прав пользователя, без user_pk - всех пользователей'''
+    key = VERSION_KEY if user_pk is None else f'{VERSION_KEY}:{user_pk}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+class UserPermissions:
+    '''группы пользователя и его участие в проектах, вычисляются один раз за запрос
+    и хранятся в кэше между запросами до смены версии (см. accounts.signals)'''
+
+    def __init__(self, user):
+        self.user = user
+        self.key = None
+        self.state = None
+        self.task_projects = {}
+
+    def load(self) -> dict:
+        if self.state is not None:
+            return self.state
+        if not self.user.is_authenticated:
+            self.state = {'groups': frozenset(), 'projects': {}}
+            return self.state
+        self.key = STATE_KEY.format(
+            user_pk=self.user.pk,
+            global_version=get_version(VERSION_KEY),
+            user_version=get_version(f'{VERSION_KEY}:{self.user.pk}'),
+        )
+        self.state = cache.get(self.key)
+        if self.state is None:
+            # пользователь из CachedModelBackend уже несёт названия групп
+            groups = getattr(self.user, 'group_names', None)
+            if groups is None:
+                groups = frozenset(self.user.groups.values_list('name', flat=True))
+            self.state = {'groups': groups, 'projects': {}}
+            self.save()
+        return self.state
+
+    def save(self):
+        if self.key:
+            cache.set(self.key, self.state, settings.PERMISSIONS_CACHE_TIMEOUT)
+
+    @property
+    def group_names(self) -> frozenset:
+        return self.load()['groups']
+
+    def in_groups(self, groups) -> bool:
+        return not self.group_names.isdisjoint(groups)
+
+    async def ain_groups(self, groups) -> bool:
+        return await sync_to_async(self.in_groups)(groups)
+
+    def is_project_member(self, project_pk) -> bool:
+        '''проверка участия одним EXISTS по уникальному индексу (project_id, user_id)'''
+        project_pk = int(project_pk)
+        state = self.load()
+        if project_pk not in state['projects']:
+            if not self.user.is_authenticated:
+                return False
+            state['projects'][project_pk] = Project.users.through.objects.filter(
+                project_id=project_pk, user_id=self.user.pk
+            ).exists()
+            self.save()
+        return state['projects'][project_pk]
+
+    async def ais_project_member(self, project_pk) -> bool:
+        return await sync_to_async(self.is_project_member)(project_pk)
+
+    def get_task_project_pk(self, task_pk) -> int:
+        '''проект задачи, 404 если задачи нет'''
+        task_pk = int(task_pk)
+        if task_pk not in self.task_projects:
+            project_pk = Task.objects.filter(pk=task_pk).values_list('project_id', flat=True).first()
+            if project_pk is None:
+                raise Http404('Задача не найдена')
+            self.task_projects[task_pk] = project_pk
+        return self.task_projects[task_pk]
+
+
+def get_permissions(request) -> UserPermissions:
+    '''права текущего пользователя, один объект на запрос'''
+    permissions = getattr(request, '_permissions', None)
+    if permissions is None or permissions.user is not request.user:
+        permissions = UserPermissions(request.user)
+        request._permissions = permissions
+    return permissions
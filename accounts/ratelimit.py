@@ -0,0 +1,82 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class TokenBucket:
+    '''ведро токенов в кэше: capacity попыток подряд, дальше rate попыток в секунду.
+    Состояние читается и записывается без блокировки, при гонке процессов
+    возможна лишняя попытка - для защиты от перебора этого достаточно'''
+
+    def __init__(self, name, capacity, rate, cache_alias='default'):
+        self.name = name
+        self.capacity = capacity
+        self.rate = rate
+        self.cache = caches[cache_alias]
+
+    def key(self, identity) -> str:
+        return f'ratelimit:{self.name}:{identity}'
+
+    def get_tokens(self, identity, now) -> float:
+        tokens, updated = self.cache.get(self.key(identity), (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def wait(self, identity, now=None) -> float:
+        '''как take, но без расхода токена'''
+        now = time.time() if now is None else now
+        tokens = self.get_tokens(identity, now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, identity, now=None) -> float:
+        '''0 если попытка разрешена, иначе сколько секунд ждать следующего токена'''
+        now = time.time() if now is None else now
+        tokens = self.get_tokens(identity, now)
+        timeout = int(self.capacity / self.rate) + 1
+        if tokens < 1:
+            self.cache.set(self.key(identity), (tokens, now), timeout)
+            return (1 - tokens) / self.rate
+        self.cache.set(self.key(identity), (tokens - 1, now), timeout)
+        return 0.0
+
+    def reset(self, identity):
+        self.cache.delete(self.key(identity))
+
+
+def get_login_buckets() -> tuple:
+    '''(по адресу клиента, по логину с этого адреса). Лимит по логину ведётся отдельно для каждого
+    адреса: неудачные попытки с чужих адресов не блокируют вход владельцу учётной записи.
+    Перебор паролей одного пользователя с разных адресов ограничен только лимитами этих адресов.
+    Кэш должен быть общим для рабочих процессов, иначе у каждого процесса свой лимит (core/caches.py)'''
+    rate = settings.LOGIN_RATE_LIMIT_PER_MINUTE / 60
+    capacity = settings.LOGIN_RATE_LIMIT_BURST
+    alias = settings.LOGIN_RATE_LIMIT_CACHE
+    return TokenBucket('login:ip', capacity, rate, alias), TokenBucket('login:user', capacity, rate, alias)
+
+
+def get_address(request) -> str:
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_login_identity(request, username) -> str:
+    return f'{(username or "").casefold()}:{get_address(request)}'
+
+
+def check_login_rate(request, username) -> float:
+    '''0 если можно проверять пароль, иначе секунды до следующей попытки.
+    Адрес расходует токен на каждую попытку: проверка пароля (PBKDF2) - самая дорогая часть входа.
+    Лимит по логину только проверяется, расходуют его неудачные попытки (login_failed)'''
+    address_bucket, user_bucket = get_login_buckets()
+    wait = user_bucket.wait(get_login_identity(request, username))
+    if wait:
+        return wait
+    return address_bucket.take(get_address(request))
+
+
+def login_failed(request, username):
+    '''неверный пароль: токен по логину. Удачный вход лимит не расходует и сбрасывает его'''
+    get_login_buckets()[1].take(get_login_identity(request, username))
+
+
+def login_succeeded(request, username):
+    get_login_buckets()[1].reset(get_login_identity(request, username))
@@ -0,0 +1,39 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.permissions import bump_version
+from issue.models import Project
+
+
+@receiver(m2m_changed, sender=User.groups.through, dispatch_uid='accounts_groups_changed')
+@receiver(m2m_changed, sender=Project.users.through, dispatch_uid='accounts_project_users_changed')
+def membership_changed(sender, instance, action, pk_set, **kwargs):
+    '''сброс кэша прав при изменении групп пользователя или участников проекта'''
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, User):
+        bump_version(instance.pk)
+    elif pk_set is None:
+        bump_version()
+    else:
+        for user_pk in pk_set:
+            bump_version(user_pk)
+
+
+@receiver(post_delete, sender=Project, dispatch_uid='accounts_project_deleted')
+@receiver(post_delete, sender=Group, dispatch_uid='accounts_group_deleted')
+@receiver(post_save, sender=Group, dispatch_uid='accounts_group_saved')
+def permissions_reset(sender, **kwargs):
+    '''переименование или удаление группы/проекта затрагивает всех пользователей'''
+    bump_version()
+
+
+@receiver(post_save, sender=User, dispatch_uid='accounts_user_saved')
+@receiver(post_delete, sender=User, dispatch_uid='accounts_user_deleted')
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    '''пользователь в кэше CachedModelBackend (пароль, активность, права);
+    обновление last_login при входе его не меняет'''
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_version(instance.pk)
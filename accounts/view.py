@@ -1,3 +1,5 @@
+import math
+
 from django.views.generic import TemplateView
 from accounts.forms import LoginForm, CustomUserСreationForm
 from django.contrib.auth import authenticate, login, logout
@@ -7,6 +9,9 @@ from django.contrib.auth.mixins import UserPassesTestMixin
 from django.contrib.auth.models import User
 from django.urls import reverse
 
+from accounts.permissions import get_permissions
+from accounts.ratelimit import check_login_rate, login_failed, login_succeeded
+
 
 
 class LoginView(TemplateView):
@@ -25,17 +30,25 @@ class LoginView(TemplateView):
 
         username: str = form.cleaned_data.get('username')
         password: str = form.cleaned_data.get('password')
+        # лимит попыток до проверки пароля: хеширование PBKDF2 - самая дорогая часть входа
+        wait = check_login_rate(request, username)
+        if wait:
+            response = self.render_to_response({'form': form, 'rate_limited': True}, status=429)
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
         user: User | None = authenticate(request=request, username=username, password=password)
 
         next: str = request.GET.get('next')
 
         if not user:
+            login_failed(request, username)
             if next:
                 return redirect(reverse('login') + f'?next={next}')
             else:
                 return redirect('login')
 
         login(request, user)
+        login_succeeded(request, username)
 
         if next:
             return redirect(next)
@@ -67,4 +80,26 @@ class GroupPermission(UserPassesTestMixin):
     groups = []
 
     def test_func(self):
-        return self.request.user.groups.filter(name__in=self.groups).exists()
+        return get_permissions(self.request).in_groups(self.groups)
+
+
+class ProjectMemberPermission:
+    '''доступ только участникам проекта, проверяется до остальных проверок dispatch.
+    По умолчанию pk проекта берётся из project_pk_kwarg, для задач
+    переопределяется get_permission_project_pk'''
+    project_pk_kwarg = 'pk'
+
+    def get_permission_project_pk(self):
+        return self.kwargs[self.project_pk_kwarg]
+
+    def dispatch(self, request, *args, **kwargs):
+        if not get_permissions(request).is_project_member(self.get_permission_project_pk()):
+            return self.handle_no_permission()
+        return super().dispatch(request, *args, **kwargs)
+
+
+class TaskProjectMemberPermission(ProjectMemberPermission):
+    '''доступ только участникам проекта задачи из kwargs['pk']'''
+
+    def get_permission_project_pk(self):
+        return get_permissions(self.request).get_task_project_pk(self.kwargs['pk'])
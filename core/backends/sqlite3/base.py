@@ -0,0 +1,24 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    '''SQLite с PRAGMA на каждом новом соединении и режимом начала транзакции.
+    OPTIONS: pragmas - {'journal_mode': 'WAL', ...}, transaction_mode - DEFERRED/IMMEDIATE/EXCLUSIVE.
+    IMMEDIATE берёт блокировку записи в начале atomic(): транзакция, начавшая с чтения,
+    не получит "database is locked" при переходе к записи, а подождёт busy_timeout'''
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
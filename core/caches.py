@@ -0,0 +1,49 @@
+import os
+
+from core.db import env_int
+
+
+# DJANGO_CACHE_BACKEND:
+#   locmem - кэш в памяти процесса, у каждого рабочего процесса свой (разработка, runserver)
+#   file   - файлы в DJANGO_CACHE_LOCATION (по умолчанию var/cache), общий для процессов одной машины
+#   redis  - Redis по адресу DJANGO_CACHE_LOCATION, общий для нескольких машин (нужен пакет redis)
+# Версии в кэше (issue.cache) и лимит попыток входа работают между процессами только в общем кэше,
+# поэтому без переменной профили базы для нескольких процессов (sqlite-wal, postgres) получают file
+BACKENDS = ('locmem', 'file', 'redis')
+SHARED_DB_PROFILES = ('sqlite-wal', 'postgres')
+# ratelimit - отдельно, чтобы вытеснение фрагментов при переполнении не сбрасывало лимит попыток входа
+ALIASES = ('default', 'sessions', 'ratelimit')
+
+
+def get_backend(env) -> str:
+    backend = env.get('DJANGO_CACHE_BACKEND')
+    if not backend:
+        backend = 'file' if env.get('DJANGO_DB_PROFILE') in SHARED_DB_PROFILES else 'locmem'
+    if backend not in BACKENDS:
+        raise ValueError(f'DJANGO_CACHE_BACKEND должен быть одним из: {", ".join(BACKENDS)}')
+    return backend
+
+
+def get_cache(backend, alias, base_dir, env) -> dict:
+    if backend == 'locmem':
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': alias}
+    if backend == 'file':
+        location = env.get('DJANGO_CACHE_LOCATION') or base_dir / 'var' / 'cache'
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(location, alias),
+            # при переполнении удаляется доля файлов (в том числе версий), порог выше стандартных 300
+            'OPTIONS': {'MAX_ENTRIES': env_int(env, 'DJANGO_CACHE_MAX_ENTRIES', 10000)},
+        }
+    return {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env.get('DJANGO_CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+        'KEY_PREFIX': alias,
+    }
+
+
+def get_caches(base_dir, env=os.environ) -> dict:
+    '''CACHES по DJANGO_CACHE_BACKEND: default, sessions (для DJANGO_SESSION_ENGINE=cached_db)
+    и ratelimit (accounts.ratelimit) на одном хранилище, в разных каталогах или с разными префиксами ключей'''
+    backend = get_backend(env)
+    return {alias: get_cache(backend, alias, base_dir, env) for alias in ALIASES}
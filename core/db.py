@@ -0,0 +1,73 @@
+import os
+
+
+# DJANGO_DB_PROFILE:
+#   sqlite     - файл SQLite с настройками по умолчанию (разработка)
+#   sqlite-wal - SQLite для нескольких рабочих процессов: WAL, busy_timeout, mmap, cache_size,
+#                BEGIN IMMEDIATE и постоянные соединения
+#   postgres   - PostgreSQL, постоянные соединения с проверкой перед запросом;
+#                пул соединений - через PgBouncer (DJANGO_DB_POOLER=pgbouncer, см. readme)
+PROFILES = ('sqlite', 'sqlite-wal', 'postgres')
+
+
+def env_int(env, name, default):
+    value = env.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def sqlite_wal(env, name) -> dict:
+    return {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': env_int(env, 'DJANGO_DB_CONN_MAX_AGE', 600),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # секунды ожидания блокировки, sqlite3 превращает их в busy_timeout
+            'timeout': env_int(env, 'DJANGO_SQLITE_BUSY_TIMEOUT', 20000) / 1000,
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'mmap_size': env_int(env, 'DJANGO_SQLITE_MMAP_SIZE', 128 * 1024 * 1024),
+                # отрицательное значение - размер в КиБ
+                'cache_size': env_int(env, 'DJANGO_SQLITE_CACHE_SIZE', -64000),
+                'temp_store': 'MEMORY',
+            },
+        },
+    }
+
+
+def postgres(env) -> dict:
+    pooled = env.get('DJANGO_DB_POOLER') == 'pgbouncer'
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('DJANGO_DB_NAME', 'tracker'),
+        'USER': env.get('DJANGO_DB_USER', ''),
+        'PASSWORD': env.get('DJANGO_DB_PASSWORD', ''),
+        'HOST': env.get('DJANGO_DB_HOST', ''),
+        'PORT': env.get('DJANGO_DB_PORT', ''),
+        # за PgBouncer соединение с пулом держится постоянно, серверные соединения раздаёт пул
+        'CONN_MAX_AGE': env_int(env, 'DJANGO_DB_CONN_MAX_AGE', None if pooled else 600),
+        'CONN_HEALTH_CHECKS': True,
+        # в режиме пула transaction серверные курсоры iterator() не переживают конец транзакции
+        'DISABLE_SERVER_SIDE_CURSORS': pooled,
+    }
+
+
+def get_databases(base_dir, env=os.environ) -> dict:
+    '''DATABASES по профилю из окружения, без правки кода'''
+    profile = env.get('DJANGO_DB_PROFILE', 'sqlite')
+    name = env.get('DJANGO_DB_NAME') or base_dir / 'db.sqlite3'
+    if profile == 'sqlite':
+        database = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': name,
+            'CONN_MAX_AGE': env_int(env, 'DJANGO_DB_CONN_MAX_AGE', 0),
+        }
+    elif profile == 'sqlite-wal':
+        database = sqlite_wal(env, name)
+    elif profile == 'postgres':
+        database = postgres(env)
+    else:
+        raise ValueError(f'DJANGO_DB_PROFILE должен быть одним из: {", ".join(PROFILES)}')
+    return {'default': database}
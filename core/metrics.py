@@ -0,0 +1,109 @@
+import bisect
+import threading
+
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1000, 10000, 100000, 1000000, 10000000)
+
+# имя метрики -> (описание, границы корзин)
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Время обработки запроса', DURATION_BUCKETS),
+    'http_request_db_queries': ('Число запросов к базе за запрос', QUERY_BUCKETS),
+    'http_request_db_duration_seconds': ('Время запросов к базе', DURATION_BUCKETS),
+    'http_request_template_duration_seconds': ('Время рендеринга шаблона', DURATION_BUCKETS),
+    'http_response_size_bytes': ('Размер тела ответа', SIZE_BUCKETS),
+}
+COUNTERS = {
+    'http_query_budget_exceeded_total': 'Запросы, превысившие бюджет числа запросов к базе',
+}
+
+
+class Histogram:
+    '''накопительные корзины в формате Prometheus'''
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class MetricsRegistry:
+    '''метрики текущего процесса по представлениям; у каждого рабочего процесса свои значения'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, labels: dict, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(HISTOGRAMS[name][1])
+            self.histograms[key].observe(value)
+
+    def increment(self, name, labels: dict, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def render(self) -> str:
+        '''текстовый формат Prometheus 0.0.4'''
+        lines = []
+        with self.lock:
+            for name, (description, _) in HISTOGRAMS.items():
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for (key_name, labels), histogram in sorted(self.histograms.items()):
+                    if key_name != name:
+                        continue
+                    for bound, total in histogram.cumulative():
+                        lines.append(f'{name}_bucket{format_labels(labels + (("le", bound),))} {total}')
+                    lines.append(f'{name}_sum{format_labels(labels)} {histogram.sum}')
+                    lines.append(f'{name}_count{format_labels(labels)} {histogram.count}')
+            for name, description in COUNTERS.items():
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+                for (key_name, labels), value in sorted(self.counters.items()):
+                    if key_name == name:
+                        lines.append(f'{name}{format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+
+registry = MetricsRegistry()
+
+
+def metrics_view(request):
+    '''/metrics для Prometheus, только для сотрудников (is_staff)'''
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
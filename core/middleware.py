@@ -0,0 +1,303 @@
+import json
+import logging
+import mimetypes
+import os
+import random
+import time
+from contextlib import ExitStack
+from gzip import GzipFile
+from urllib.parse import urlparse
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.middleware.gzip import GZipMiddleware
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import StreamingBuffer
+from django.views.static import was_modified_since
+
+from core.metrics import registry
+
+
+logger = logging.getLogger('core.performance')
+
+
+class QueryRecorder:
+    '''execute_wrapper: число и время запросов ко всем базам за время обработки запроса'''
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class PerformanceMiddleware:
+    '''время запроса, запросы к базе, рендеринг шаблона и размер ответа по каждому представлению:
+    заголовок Server-Timing, гистограммы для /metrics, выборочный лог в core.performance
+    и предупреждение, если представление превысило бюджет числа запросов.
+    Потоковая страница (core.streaming) записывается, когда отдана целиком: запросы и рендеринг
+    идут во время отдачи, Server-Timing у неё - только до первого байта.
+    Работает и в асинхронной цепочке (ASGI), без переходов между потоками на каждом запросе'''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def recording(self, recorder) -> ExitStack:
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        return stack
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request._performance = {'template': 0.0}
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with self.recording(recorder):
+            response = self.get_response(request)
+        return self.process_response(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        request._performance = {'template': 0.0}
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        # соединения с базой у каждого потока свои: запросы синхронных представлений и sync_to_async
+        # идут в общем потоке запроса (thread_sensitive), обёртка ставится и снимается там же
+        recording = await sync_to_async(self.recording)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recording.close)()
+        return self.process_response(request, response, recorder, started)
+
+    def process_response(self, request, response, recorder, started):
+        if response.streaming and not isinstance(response, FileResponse):
+            self.set_server_timing(response, time.perf_counter() - started, recorder, 0.0)
+            response.streaming_content = self.stream(request, response, response.streaming_content, recorder, started)
+            return response
+        duration = time.perf_counter() - started
+        self.record(request, response, duration, recorder)
+        return response
+
+    def stream(self, request, response, content, recorder, started):
+        state = request._performance
+        state['size'] = 0
+        with self.recording(recorder):
+            render_started = time.perf_counter()
+            for chunk in content:
+                state['size'] += len(chunk)
+                yield chunk
+            state['template'] += time.perf_counter() - render_started
+        self.record(request, response, time.perf_counter() - started, recorder)
+
+    def process_template_response(self, request, response):
+        '''TemplateResponse рендерится после представления, время рендеринга замеряется обёрткой'''
+        render = response.render
+        state = request._performance
+
+        def timed_render():
+            render_started = time.perf_counter()
+            try:
+                return render()
+            finally:
+                state['template'] += time.perf_counter() - render_started
+
+        response.render = timed_render
+        return response
+
+    def get_view_name(self, request) -> str:
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match else 'unresolved'
+
+    def get_size(self, request, response):
+        if 'size' in request._performance:
+            return request._performance['size']
+        if response.streaming:
+            return int(response['Content-Length']) if response.has_header('Content-Length') else None
+        return len(response.content)
+
+    def set_server_timing(self, response, duration, recorder, template):
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'app;dur={duration * 1000:.1f}',
+                f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+                f'tpl;dur={template * 1000:.1f}',
+            ])
+
+    def record(self, request, response, duration, recorder):
+        view = self.get_view_name(request)
+        template = request._performance['template']
+        size = self.get_size(request, response)
+        labels = {'view': view, 'method': request.method}
+        registry.observe('http_request_duration_seconds', labels, duration)
+        registry.observe('http_request_db_queries', labels, recorder.count)
+        registry.observe('http_request_db_duration_seconds', labels, recorder.duration)
+        registry.observe('http_request_template_duration_seconds', labels, template)
+        if size is not None:
+            registry.observe('http_response_size_bytes', labels, size)
+
+        if not response.streaming or isinstance(response, FileResponse):
+            self.set_server_timing(response, duration, recorder, template)
+
+        data = {
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'db_queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 3),
+            'template_ms': round(template * 1000, 3),
+            'size': size,
+        }
+        budget = settings.PERFORMANCE_QUERY_BUDGETS.get(view, settings.PERFORMANCE_QUERY_BUDGET)
+        if budget is not None and recorder.count > budget:
+            registry.increment('http_query_budget_exceeded_total', {'view': view})
+            logger.warning(
+                'query budget exceeded: %s made %s queries (budget %s)', view, recorder.count, budget,
+                extra={'performance': data},
+            )
+        elif random.random() < settings.PERFORMANCE_LOG_SAMPLE_RATE:
+            logger.info(json.dumps(data), extra={'performance': data})
+
+
+def compress_parts(parts):
+    '''как django.utils.text.compress_sequence, но после каждой части сжатие сбрасывается (Z_SYNC_FLUSH).
+    Без сброса zlib копит вывод, и клиент получает всю страницу в последнем блоке, а потоковая
+    отдача теряет смысл. Сброс стоит несколько байт на часть, частей у страницы немного'''
+    buffer = StreamingBuffer()
+    with GzipFile(mode='wb', compresslevel=6, fileobj=buffer, mtime=0) as file:
+        for part in parts:
+            file.write(part)
+            file.flush()
+            yield buffer.read()
+    yield buffer.read()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    '''GZip для ответов с типом из RESPONSE_COMPRESS_CONTENT_TYPES не меньше RESPONSE_COMPRESS_MIN_SIZE байт,
+    потоковые страницы сжимаются по частям. Включается настройкой RESPONSE_COMPRESSION.
+    Статика сюда не попадает: её сжатые варианты готовит collectstatic (core.storage)'''
+
+    def __init__(self, get_response):
+        if not settings.RESPONSE_COMPRESSION:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').partition(';')[0].strip()
+        if content_type not in settings.RESPONSE_COMPRESS_CONTENT_TYPES:
+            return response
+        if not response.streaming:
+            if len(response.content) < settings.RESPONSE_COMPRESS_MIN_SIZE:
+                return response
+            return super().process_response(request, response)
+        # заголовки, Vary и проверку Accept-Encoding оставляет GZipMiddleware, сжатие частей - compress_parts
+        encoded = response.has_header('Content-Encoding')
+        parts = response.streaming_content
+        response = super().process_response(request, response)
+        if not encoded and response.get('Content-Encoding') == 'gzip':
+            response.streaming_content = compress_parts(parts)
+        return response
+
+
+class StaticFilesMiddleware:
+    '''раздача собранной статики из STATIC_ROOT в режиме STATIC_MODE = 'production':
+    сжатый при collectstatic вариант (.br, .gz - core.storage), если клиент его принимает,
+    файлы с хешем в имени кэшируются на STATIC_MAX_AGE с immutable, остальные - на STATIC_UNHASHED_MAX_AGE.
+    Ответ отдаётся до сессий и базы данных, в ASGI - без перехода в синхронный поток'''
+    encodings = (('br', '.br'), ('gzip', '.gz'))
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.STATIC_MODE != 'production':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = urlparse(settings.STATIC_URL).path
+        self.hashed_names = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def is_hashed(self, name) -> bool:
+        '''имена из манифеста меняются вместе с содержимым, их можно кэшировать навсегда'''
+        if self.hashed_names is None:
+            self.hashed_names = set(staticfiles_storage.hashed_files.values())
+        return name in self.hashed_names
+
+    def get_accepted_encodings(self, request) -> set:
+        '''кодировки из Accept-Encoding, кроме явно запрещённых (q=0)'''
+        accepted = set()
+        for part in request.headers.get('Accept-Encoding', '').split(','):
+            encoding, _, params = part.partition(';')
+            params = params.replace(' ', '')
+            try:
+                weight = float(params[2:]) if params.startswith('q=') else 1
+            except ValueError:
+                weight = 1
+            if weight > 0:
+                accepted.add(encoding.strip().lower())
+        return accepted
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.serve(request)
+        return self.get_response(request) if response is None else response
+
+    async def __acall__(self, request):
+        response = self.serve(request)
+        return await self.get_response(request) if response is None else response
+
+    def serve(self, request):
+        '''ответ с файлом из STATIC_ROOT или None, если запрос не к собранной статике'''
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return None
+        name = request.path_info[len(self.prefix):]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        served, content_encoding = path, None
+        accepted = self.get_accepted_encodings(request)
+        for encoding, suffix in self.encodings:
+            if encoding in accepted and os.path.isfile(path + suffix):
+                served, content_encoding = path + suffix, encoding
+                break
+        # время изменения исходного файла: у сжатых вариантов одного файла Last-Modified общий
+        mtime = os.stat(path).st_mtime
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            response = FileResponse(open(served, 'rb'), content_type=content_type)
+            del response['Content-Disposition']
+            if content_encoding:
+                response['Content-Encoding'] = content_encoding
+        response['Last-Modified'] = http_date(mtime)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        if self.is_hashed(name):
+            patch_cache_control(response, public=True, max_age=settings.STATIC_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=settings.STATIC_UNHASHED_MAX_AGE)
+        return response
@@ -0,0 +1,29 @@
+import copy
+
+
+# DJANGO_RENDER_PROFILE:
+#   dev        - шаблоны с отладочной информацией, ответы без сжатия, страница целиком
+#   production - шаблоны компилируются один раз на процесс (cached.Loader), без отладочной информации,
+#                HTML и JSON сжимаются gzip, большие списки отдаются потоком (core.streaming)
+PROFILES = ('dev', 'production')
+
+PRODUCTION_LOADERS = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+
+def get_templates(templates: list, profile: str) -> list:
+    '''TEMPLATES для профиля; исходный список не меняется'''
+    if profile not in PROFILES:
+        raise ValueError(f'DJANGO_RENDER_PROFILE: {profile}, ожидается один из {", ".join(PROFILES)}')
+    templates = copy.deepcopy(templates)
+    if profile == 'production':
+        for backend in templates:
+            if backend['BACKEND'] == 'django.template.backends.django.DjangoTemplates':
+                backend['APP_DIRS'] = False
+                backend['OPTIONS']['debug'] = False
+                backend['OPTIONS']['loaders'] = PRODUCTION_LOADERS
+    return templates
@@ -13,6 +13,10 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 from pathlib import Path
 import os 
 
+from core.caches import get_caches
+from core.db import get_databases
+from core.rendering import get_templates
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,7 +47,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,12 +87,9 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# профиль базы выбирается переменной окружения DJANGO_DB_PROFILE (sqlite, sqlite-wal, postgres), см. core/db.py
+
+DATABASES = get_databases(BASE_DIR)
 
 
 # Password validation
@@ -128,6 +132,20 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# DJANGO_STATIC_MODE=production: имена файлов с хешем содержимого и сжатые варианты .gz/.br
+# (core.storage, после manage.py collectstatic), раздача из STATIC_ROOT через
+# core.middleware.StaticFilesMiddleware: файлы с хешем кэшируются на STATIC_MAX_AGE секунд,
+# остальные - на STATIC_UNHASHED_MAX_AGE. dev - файлы из STATICFILES_DIRS как есть.
+# Сжатый вариант сохраняется, если он меньше исходного не меньше чем на STATIC_COMPRESS_MIN_SIZE байт
+
+STATIC_MODE = os.environ.get('DJANGO_STATIC_MODE', 'dev')
+STATIC_ROOT = BASE_DIR / 'var' / 'static'
+if STATIC_MODE == 'production':
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+STATIC_UNHASHED_MAX_AGE = 60
+STATIC_COMPRESS_MIN_SIZE = 256
+
 LOGIN_REDIRECT_URL = 'base'
 LOGOUT_REDIRECT_URL = 'base'
 
@@ -135,3 +153,113 @@ LOGOUT_REDIRECT_URL = 'base'
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Search
+# движок поиска задач: None - FTS5 для SQLite, индекс в памяти для остальных баз
+
+ISSUE_SEARCH_BACKEND = None
+
+# Permissions
+# сколько секунд кэшируются группы пользователя и участие в проектах (accounts.permissions)
+
+PERMISSIONS_CACHE_TIMEOUT = 300
+
+# Pagination
+# режим пагинации списка задач: 'offset' - номера страниц, 'cursor' - keyset по (created_at, id)
+
+TASK_LIST_PAGINATION = 'offset'
+
+# размер страницы задач на странице проекта (keyset, догружается фрагментами)
+
+PROJECT_TASKS_PAGE_SIZE = 20
+
+# Cache
+# время жизни фрагментов шаблонов, сбрасываются раньше по версиям из issue.cache
+
+ISSUE_FRAGMENT_CACHE_TIMEOUT = 600
+
+# Jobs
+# фоновая очередь issue.jobs: попыток на задание, пауза перед повтором (удваивается с каждой попыткой),
+# через сколько секунд выполняемое задание считается брошенным, как часто run_jobs проверяет очередь
+# и где лежат загруженные файлы до обработки и готовые выгрузки задач, сколько дней выгрузка хранится
+
+JOBS_MAX_ATTEMPTS = 3
+JOBS_RETRY_DELAY = 10
+JOBS_STALE_TIMEOUT = 600
+JOBS_POLL_INTERVAL = 1
+JOBS_FILE_DIR = BASE_DIR / 'var' / 'jobs'
+JOBS_EXPORT_RETENTION_DAYS = 7
+
+# Archive
+# сколько дней удалённая задача лежит в корзине проекта, прежде чем задание archive_deleted_tasks
+# (manage.py archive_tasks) перенесёт её в ArchivedTask, и сколько задач переносится одной транзакцией
+
+TASK_ARCHIVE_RETENTION_DAYS = 30
+TASK_ARCHIVE_BATCH_SIZE = 500
+
+# Analytics
+# статусы, переход в которые считается закрытием задачи; события моложе ANALYTICS_ROLLUP_LAG секунд
+# свёртка (manage.py update_analytics) не берёт, наибольший запрашиваемый период - ANALYTICS_MAX_DAYS
+
+ANALYTICS_CLOSED_STATUSES = ['Done']
+ANALYTICS_ROLLUP_LAG = 60
+ANALYTICS_MAX_DAYS = 3660
+
+# Rendering
+# DJANGO_RENDER_PROFILE - см. core.rendering. В production HTML и JSON от RESPONSE_COMPRESS_MIN_SIZE байт
+# сжимаются gzip (core.middleware.CompressionMiddleware), task_list и project_detail отдаются потоком
+# (под WSGI; под ASGI страница рендерится целиком, см. core.streaming.can_stream)
+
+RENDER_PROFILE = os.environ.get('DJANGO_RENDER_PROFILE', 'dev')
+TEMPLATES = get_templates(TEMPLATES, RENDER_PROFILE)
+RESPONSE_COMPRESSION = RENDER_PROFILE == 'production'
+RESPONSE_COMPRESS_MIN_SIZE = 1024
+RESPONSE_COMPRESS_CONTENT_TYPES = ['text/html', 'application/json']
+STREAMING_TEMPLATES = RENDER_PROFILE == 'production'
+
+# Board
+# как часто (в секундах) открытая доска проекта запрашивает изменения задач
+
+ISSUE_BOARD_POLL_INTERVAL = 5
+
+# Performance
+# core.middleware.PerformanceMiddleware: заголовок Server-Timing, гистограммы на /metrics,
+# логгер core.performance - выборка запросов (INFO) и превышения бюджета запросов к базе (WARNING).
+# Бюджет по умолчанию и отдельные значения по имени URL, None - без проверки
+
+PERFORMANCE_SERVER_TIMING = True
+PERFORMANCE_LOG_SAMPLE_RATE = 0.01
+PERFORMANCE_QUERY_BUDGET = 20
+PERFORMANCE_QUERY_BUDGETS = {
+    # число запросов растёт с числом пачек в файле
+    'task_import': None,
+}
+
+# Sessions
+# DJANGO_SESSION_ENGINE: db - таблица django_session, cached_db - сессии в кэше sessions
+# с записью в базу, signed_cookies - подписанная cookie без обращения к базе
+# (выход из системы не отзывает уже выданную cookie до истечения SESSION_COOKIE_AGE)
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('DJANGO_SESSION_ENGINE', 'db')]
+
+# хранилище кэша выбирается переменной окружения DJANGO_CACHE_BACKEND (locmem, file, redis), см. core/caches.py
+CACHES = get_caches(BASE_DIR)
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Authentication
+# пользователь сессии и его группы берутся из кэша (accounts.backends)
+
+AUTHENTICATION_BACKENDS = ['accounts.backends.CachedModelBackend']
+
+# лимит попыток входа на адрес и на логин с этого адреса: LOGIN_RATE_LIMIT_BURST подряд,
+# дальше LOGIN_RATE_LIMIT_PER_MINUTE в минуту (accounts.ratelimit).
+# Кэш ratelimit общий для рабочих процессов при DJANGO_CACHE_BACKEND=file или redis (core/caches.py)
+
+LOGIN_RATE_LIMIT_BURST = 10
+LOGIN_RATE_LIMIT_PER_MINUTE = 5
+LOGIN_RATE_LIMIT_CACHE = 'ratelimit'
@@ -0,0 +1,53 @@
+import gzip
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    # необязательная зависимость: без неё собираются только .gz
+    brotli = None
+
+
+# текстовые файлы, которые имеет смысл сжимать; картинки и шрифты уже сжаты
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.html', '.txt', '.json', '.xml')
+
+
+def compress(content: bytes) -> dict:
+    '''суффикс -> сжатое содержимое; mtime=0, чтобы повторная сборка давала те же байты'''
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content, quality=11)
+    return variants
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    '''имена файлов с хешем содержимого (manifest) и сжатые варианты рядом с каждым текстовым файлом,
+    .gz и .br (если установлен brotli). Сжатие идёт один раз при collectstatic, а не на каждый запрос;
+    вариант сохраняется, только если он меньше исходного файла не меньше чем на STATIC_COMPRESS_MIN_SIZE'''
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception) and hashed_name:
+                processed_names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if not dry_run:
+            for name in sorted(processed_names):
+                self.compress_file(name)
+
+    def compress_file(self, name):
+        if not name.endswith(COMPRESSED_EXTENSIONS) or not self.exists(name):
+            return
+        with self.open(name) as file:
+            content = file.read()
+        for suffix, data in compress(content).items():
+            path = self.path(name + suffix)
+            if len(content) - len(data) < settings.STATIC_COMPRESS_MIN_SIZE:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            with open(path, 'wb') as file:
+                file.write(data)
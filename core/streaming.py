@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.template.context import make_context
+from django.template.loader import select_template
+from django.template.loader_tags import BLOCK_CONTEXT_KEY, BlockContext, BlockNode, ExtendsNode
+from django.template.base import TextNode
+
+
+def iter_nodes(nodelist, context):
+    '''части страницы по узлам верхнего уровня. Уже готовый текст отдаётся перед каждым блоком:
+    шапка base.html уходит клиенту до блока content, где выполняются запросы к базе'''
+    buffer = []
+    for node in nodelist:
+        if isinstance(node, ExtendsNode):
+            if buffer:
+                yield ''.join(buffer)
+                buffer = []
+            yield from iter_extends(node, context)
+            continue
+        if isinstance(node, BlockNode) and buffer:
+            yield ''.join(buffer)
+            buffer = []
+        buffer.append(str(node.render_annotated(context)))
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_extends(node: ExtendsNode, context):
+    '''ExtendsNode.render по частям: блоки потомка подставляются в узлы родителя'''
+    compiled_parent = node.get_parent(context)
+    block_context = context.render_context.setdefault(BLOCK_CONTEXT_KEY, BlockContext())
+    block_context.add_blocks(node.blocks)
+    for parent_node in compiled_parent.nodelist:
+        # как в ExtendsNode.render: у корневого шаблона блоки добавляются тоже
+        if not isinstance(parent_node, TextNode):
+            if not isinstance(parent_node, ExtendsNode):
+                block_context.add_blocks({
+                    block.name: block for block in compiled_parent.nodelist.get_nodes_by_type(BlockNode)
+                })
+            break
+    with context.render_context.push_state(compiled_parent, isolated_context=False):
+        yield from iter_nodes(compiled_parent.nodelist, context)
+
+
+def stream_template(template_names, context=None, request=None):
+    '''рендеринг шаблона по частям для StreamingHttpResponse'''
+    template = select_template(template_names if isinstance(template_names, (list, tuple)) else [template_names])
+    template = template.template
+    context = make_context(context, request, autoescape=template.engine.autoescape)
+    with context.render_context.push_state(template):
+        with context.bind_template(template):
+            context.template_name = template.name
+            yield from iter_nodes(template.nodelist, context)
+
+
+def body_in_event_loop(request) -> bool:
+    '''ASGIHandler читает потоковое тело синхронно в цикле событий, где запросы к базе запрещены
+    (SynchronousOnlyOperation). Генератор, который обращается к базе, под ASGI отдавать нельзя -
+    ответ собирается целиком в потоке представления'''
+    return isinstance(request, ASGIRequest)
+
+
+def can_stream(request) -> bool:
+    '''ленивые queryset, пользователь и права шаблона обращаются к базе,
+    поэтому под ASGI страница рендерится целиком (см. body_in_event_loop)'''
+    return settings.STREAMING_TEMPLATES and not body_in_event_loop(request)
+
+
+class StreamingTemplateMixin:
+    '''для TemplateView/ListView/DetailView: при STREAMING_TEMPLATES страница отдаётся
+    StreamingHttpResponse и первый байт уходит до рендеринга всего шаблона (только под WSGI, см. can_stream).
+    Заголовки (ETag, Last-Modified, cookie) должны быть известны до рендеринга'''
+
+    def render_to_response(self, context, **response_kwargs):
+        if not can_stream(self.request):
+            return super().render_to_response(context, **response_kwargs)
+        # {% csrf_token %} выполнится после CsrfViewMiddleware, cookie нужно выставить заранее
+        get_token(self.request)
+        response_kwargs.setdefault('content_type', self.content_type or 'text/html; charset=utf-8')
+        return StreamingHttpResponse(
+            stream_template(self.get_template_names(), context, self.request), **response_kwargs
+        )
@@ -1,7 +1,42 @@
 from django.contrib import admin
-from issue.models import Status, Task, Type, Project
+from issue.models import ArchivedTask, Status, Task, TaskEvent, Type, Project
 
+
+class TaskAdmin(admin.ModelAdmin):
+    '''в админке видны и удалённые задачи'''
+    list_display = ('summary', 'project', 'status', 'type', 'is_deleted')
+    list_filter = ('is_deleted',)
+
+    def get_queryset(self, request):
+        return Task.all_objects.select_related('project', 'status', 'type')
+
+
+class TaskEventAdmin(admin.ModelAdmin):
+    '''история только для чтения'''
+    list_display = ('task', 'kind', 'user', 'created_at')
+    list_filter = ('kind',)
+    list_select_related = ('task', 'user')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class ArchivedTaskAdmin(TaskEventAdmin):
+    '''архив только для чтения'''
+    list_display = ('summary', 'project', 'deleted_at', 'archived_at')
+    list_filter = ()
+    list_select_related = ('project',)
+
+
+admin.site.register(ArchivedTask, ArchivedTaskAdmin)
 admin.site.register(Status)
-admin.site.register(Task)
+admin.site.register(Task, TaskAdmin)
+admin.site.register(TaskEvent, TaskEventAdmin)
 admin.site.register(Type)
 admin.site.register(Project)
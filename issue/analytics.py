@@ -0,0 +1,270 @@
+import datetime
+import itertools
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from issue.models import ArchivedTask, ProjectDailyStats, RollupState, Status, TaskEvent, Type
+from issue.reference import reference_cache
+
+try:
+    import numpy
+except ImportError:
+    # необязательная зависимость: без неё пересчёт идёт построчно
+    numpy = None
+
+
+ROLLUP = 'project_daily_stats'
+# порядок колонок строки события для aggregate
+EVENT_COLUMNS = (
+    'kind', 'day', 'changes__status__0', 'changes__status__1',
+    'changes__project__1', 'changes__type__1', 'task__project_id', 'task__type_id',
+    'changes__context__project', 'changes__context__type',
+)
+CHUNK_SIZE = 50000
+
+
+def get_closed_status_ids() -> set:
+    return {
+        pk for pk, status in reference_cache.objects(Status).items()
+        if status.name in settings.ANALYTICS_CLOSED_STATUSES
+    }
+
+
+def get_events():
+    '''события, влияющие на итоги: создание задачи и смена статуса, день - в часовом поясе TIME_ZONE'''
+    return TaskEvent.objects.filter(Q(kind=TaskEvent.CREATED) | Q(changes__has_key='status')).annotate(
+        day=TruncDate('created_at', tzinfo=timezone.get_current_timezone())
+    )
+
+
+def get_archived_rows(project_ids=None, start=None, end=None):
+    '''строки EVENT_COLUMNS из истории задач в архиве (ArchivedTask.events, issue.archive):
+    проект и тип для смены статуса - из события или последние у задачи, день - в часовом поясе TIME_ZONE.
+    Все события задачи не позже её удаления, поэтому по началу периода отбор идёт по deleted_at,
+    остальные условия проверяются по строкам'''
+    archived = ArchivedTask.objects.all()
+    if start:
+        archived = archived.filter(deleted_at__date__gte=start)
+    rows = archived.values_list('project_id', 'type_id', 'events').iterator(chunk_size=1000)
+    for project, task_type, events in rows:
+        for event in events:
+            changes = event['changes']
+            if event['kind'] != TaskEvent.CREATED and 'status' not in changes:
+                continue
+            day = timezone.localtime(parse_datetime(event['created_at'])).date()
+            if (start and day < start) or (end and day > end):
+                continue
+            old, new = changes.get('status', (None, None))
+            created_project = changes.get('project', (None, None))[1]
+            context = changes.get('context', {})
+            if event['kind'] == TaskEvent.CREATED:
+                event_project = created_project
+            else:
+                event_project = context.get('project', project)
+            if project_ids and event_project not in project_ids:
+                continue
+            yield (
+                event['kind'], day, old, new, created_project, changes.get('type', (None, None))[1], project, task_type,
+                context.get('project'), context.get('type'),
+            )
+
+
+def aggregate_rows(rows, closed: set) -> dict:
+    '''(проект, тип, день) -> [создано, закрыто]. Проект и тип берутся из события: у созданной
+    задачи - из её полей, у смены статуса - из changes['context'] (issue.history). В событиях смены
+    статуса, записанных до появления context, его нет - для них берутся текущие проект и тип задачи,
+    поэтому recompute_rollups может перенести закрытие перенесённой задачи в другой проект или тип.
+    Закрытие - переход из незакрытого статуса в закрытый, в том числе создание сразу закрытой задачи'''
+    totals = {}
+    for kind, day, old, new, created_project, created_type, project, task_type, event_project, event_type in rows:
+        created = kind == TaskEvent.CREATED
+        if created:
+            project, task_type = created_project, created_type
+        elif event_project is not None:
+            project, task_type = event_project, event_type
+        if project is None or task_type is None:
+            continue
+        values = totals.setdefault((project, task_type, day), [0, 0])
+        values[0] += created
+        values[1] += new in closed and old not in closed
+    return totals
+
+
+def aggregate_arrays(rows, closed: set) -> dict:
+    '''то же, что aggregate_rows, векторно на NumPy: ключ (проект, тип, день) сводится
+    в одно целое ravel_multi_index, суммы по уникальным ключам - bincount'''
+    if not rows:
+        return {}
+    # двумерный массив объектов собирается быстрее, чем столбцы через zip(*rows)
+    columns = numpy.array(rows, dtype=object)
+
+    def ids(column):
+        values = columns[:, column]
+        return numpy.where(values == None, -1, values).astype(numpy.int64)  # noqa: E711
+
+    created = columns[:, 0] == TaskEvent.CREATED
+    has_context = ids(8) >= 0
+    project = numpy.where(created, ids(4), numpy.where(has_context, ids(8), ids(6)))
+    task_type = numpy.where(created, ids(5), numpy.where(has_context, ids(9), ids(7)))
+    closed_ids = numpy.array(sorted(closed), dtype=numpy.int64)
+    is_closed = numpy.isin(ids(3), closed_ids) & ~numpy.isin(ids(2), closed_ids)
+    days = numpy.fromiter((value.toordinal() for value in columns[:, 1]), dtype=numpy.int64, count=len(rows))
+    valid = (project >= 0) & (task_type >= 0)
+    if not valid.any():
+        return {}
+    project, task_type, days = project[valid], task_type[valid], days[valid]
+    first_day = days.min()
+    dims = (project.max() + 1, task_type.max() + 1, days.max() - first_day + 1)
+    keys = numpy.ravel_multi_index((project, task_type, days - first_day), dims)
+    unique, inverse = numpy.unique(keys, return_inverse=True)
+    created_sum = numpy.bincount(inverse, weights=created[valid], minlength=len(unique))
+    closed_sum = numpy.bincount(inverse, weights=is_closed[valid], minlength=len(unique))
+    unique_project, unique_type, unique_day = numpy.unravel_index(unique, dims)
+    return {
+        (int(p), int(t), datetime.date.fromordinal(int(d + first_day))): [int(c), int(s)]
+        for p, t, d, c, s in zip(unique_project, unique_type, unique_day, created_sum, closed_sum)
+    }
+
+
+def aggregate(rows, closed: set, vectorised=False) -> dict:
+    '''на строках из курсора построчный проход быстрее: сборка массивов из кортежей
+    дороже самой свёртки, поэтому NumPy - только по запросу'''
+    if vectorised and numpy is not None:
+        return aggregate_arrays(rows, closed)
+    return aggregate_rows(rows, closed)
+
+
+def apply_totals(totals: dict):
+    '''прибавляет итоги к строкам F-выражениями, недостающие строки создаются'''
+    for (project_id, type_id, day), (created, closed) in sorted(totals.items()):
+        if not created and not closed:
+            continue
+        lookup = {'project_id': project_id, 'type_id': type_id, 'date': day}
+        values = {'created': F('created') + created, 'closed': F('closed') + closed}
+        if not ProjectDailyStats.objects.filter(**lookup).update(**values):
+            ProjectDailyStats.objects.bulk_create([ProjectDailyStats(**lookup)], ignore_conflicts=True)
+            ProjectDailyStats.objects.filter(**lookup).update(**values)
+
+
+def update_rollups(batch_size=5000, lag=None) -> int:
+    '''добавляет к дневным итогам события после водяной отметки пачками, отметка сдвигается
+    в той же транзакции. Берутся события старше lag секунд: id выдаётся при вставке,
+    и транзакция с меньшим id, зафиксированная позже, иначе осталась бы за отметкой.
+    Возвращает число учтённых событий'''
+    lag = settings.ANALYTICS_ROLLUP_LAG if lag is None else lag
+    before = timezone.now() - datetime.timedelta(seconds=lag)
+    closed = get_closed_status_ids()
+    processed = 0
+    while True:
+        with transaction.atomic():
+            state, _ = RollupState.objects.select_for_update().get_or_create(name=ROLLUP)
+            events = list(
+                get_events().filter(pk__gt=state.last_event_id).order_by('pk')
+                .values_list('pk', 'created_at', *EVENT_COLUMNS)[:batch_size]
+            )
+            fetched = len(events)
+            ready = []
+            for event in events:
+                if event[1] >= before:
+                    break
+                ready.append(event)
+            if not ready:
+                return processed
+            apply_totals(aggregate([event[2:] for event in ready], closed))
+            state.last_event_id = ready[-1][0]
+            state.save()
+        processed += len(ready)
+        if len(ready) < fetched or fetched < batch_size:
+            return processed
+
+
+def recompute_rollups(project_ids=None, start=None, end=None, vectorised=False) -> int:
+    '''пересчёт итогов за период по всем событиям до водяной отметки (события после неё
+    добавит update_rollups): строки периода удаляются и создаются заново.
+    События читаются пачками по CHUNK_SIZE и сводятся aggregate (vectorised - на NumPy), вместе с ними -
+    история задач, перенесённых в архив (ArchivedTask.events): её уже нет в TaskEvent, и без неё
+    пересчёт периода старше TASK_ARCHIVE_RETENTION_DAYS потерял бы удалённые задачи.
+    Возвращает число строк итогов'''
+    closed = get_closed_status_ids()
+    with transaction.atomic():
+        state, _ = RollupState.objects.select_for_update().get_or_create(name=ROLLUP)
+        events = get_events().filter(pk__lte=state.last_event_id)
+        stats = ProjectDailyStats.objects.all()
+        if project_ids:
+            events = events.filter(
+                Q(task__project_id__in=project_ids)
+                | Q(kind=TaskEvent.CREATED, changes__project__1__in=project_ids)
+                | Q(changes__context__project__in=project_ids)
+            )
+            stats = stats.filter(project_id__in=project_ids)
+        if start:
+            events = events.filter(day__gte=start)
+            stats = stats.filter(date__gte=start)
+        if end:
+            events = events.filter(day__lte=end)
+            stats = stats.filter(date__lte=end)
+
+        totals = {}
+        chunk = []
+        rows = itertools.chain(
+            events.values_list(*EVENT_COLUMNS).iterator(chunk_size=CHUNK_SIZE),
+            get_archived_rows(project_ids, start, end),
+        )
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= CHUNK_SIZE:
+                merge(totals, aggregate(chunk, closed, vectorised))
+                chunk = []
+        merge(totals, aggregate(chunk, closed, vectorised))
+
+        stats.delete()
+        ProjectDailyStats.objects.bulk_create([
+            ProjectDailyStats(project_id=project_id, type_id=type_id, date=day, created=created, closed=closed_count)
+            for (project_id, type_id, day), (created, closed_count) in sorted(totals.items())
+            if (not project_ids or project_id in project_ids) and (created or closed_count)
+        ], batch_size=1000)
+    return len(totals)
+
+
+def merge(totals: dict, other: dict):
+    for key, (created, closed) in other.items():
+        values = totals.setdefault(key, [0, 0])
+        values[0] += created
+        values[1] += closed
+
+
+def get_project_stats(project_pk, start: datetime.date, end: datetime.date, type_ids=()) -> dict:
+    '''ответ аналитики из итогов: ряд по дням (дни без событий - нули), суммы по типам
+    и время последнего обновления итогов'''
+    stats = ProjectDailyStats.objects.filter(project_id=project_pk, date__range=(start, end))
+    if type_ids:
+        stats = stats.filter(type_id__in=type_ids)
+    days = {
+        start + datetime.timedelta(days=offset): {'created': 0, 'closed': 0}
+        for offset in range((end - start).days + 1)
+    }
+    types = {}
+    for day, type_id, created, closed in stats.values_list('date', 'type_id', 'created', 'closed'):
+        for values in (days[day], types.setdefault(type_id, {'created': 0, 'closed': 0})):
+            values['created'] += created
+            values['closed'] += closed
+    names = reference_cache.objects(Type)
+    return {
+        'project': project_pk,
+        'start': start,
+        'end': end,
+        'days': [{'date': day, **values} for day, values in days.items()],
+        'types': [
+            {'type_id': type_id, 'type': str(names.get(type_id, '')), **values} for type_id, values in sorted(types.items())
+        ],
+        'total': {
+            'created': sum(values['created'] for values in days.values()),
+            'closed': sum(values['closed'] for values in days.values()),
+        },
+        'updated_at': RollupState.objects.filter(name=ROLLUP).values_list('updated_at', flat=True).first(),
+    }
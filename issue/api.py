@@ -0,0 +1,368 @@
+import datetime
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.forms.models import model_to_dict
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import quote_etag
+from django.views import View
+
+from accounts.permissions import get_permissions
+from accounts.view import GroupPermission
+from core.streaming import body_in_event_loop
+from issue import analytics, board, exports
+from issue.cache import get_versions
+from issue.forms import ProjectForm, TaskForm
+from issue.jobs import enqueue, get_storage, job_data
+from issue.models import Job, Project, Task
+from issue.pagination import CursorPaginator
+
+
+# имя поля в ответе -> выражение для values()
+TASK_FIELDS = {
+    'id': 'id',
+    'summary': 'summary',
+    'description': 'description',
+    'status': 'status__name',
+    'status_id': 'status_id',
+    'type': 'type__name',
+    'type_id': 'type_id',
+    'project_id': 'project_id',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+PROJECT_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'start_date': 'start_date',
+    'end_date': 'end_date',
+}
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class ApiError(Exception):
+    '''ошибка запроса, превращается в JSON-ответ в ApiView.dispatch'''
+
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors
+
+    def response(self):
+        data = {'error': str(self)}
+        if self.errors:
+            data['errors'] = self.errors
+        return JsonResponse(data, status=self.status)
+
+
+def parse_json(request) -> dict:
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError('Некорректный JSON')
+    if not isinstance(data, dict):
+        raise ApiError('Ожидается JSON-объект')
+    return data
+
+
+def parse_int(value, name) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ApiError(f'Параметр {name} должен быть целым числом')
+
+
+def get_fields(request, available: dict) -> list:
+    '''?fields=id,summary - в запрос попадают только выбранные колонки'''
+    fields = [name for name in request.GET.get('fields', '').split(',') if name]
+    if not fields:
+        return list(available)
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def get_limit(request) -> int:
+    limit = parse_int(request.GET.get('limit', DEFAULT_LIMIT), 'limit')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def project_row(row: dict, fields: list, available: dict) -> dict:
+    return {name: row[available[name]] for name in fields}
+
+
+def get_task_data(task_pk, fields=None) -> dict:
+    fields = fields or list(TASK_FIELDS)
+    row = Task.objects.filter(pk=task_pk).values(*{TASK_FIELDS[name] for name in fields}).first()
+    if row is None:
+        raise Http404('Задача не найдена')
+    return project_row(row, fields, TASK_FIELDS)
+
+
+def get_project_data(project_pk, fields=None) -> dict:
+    fields = fields or list(PROJECT_FIELDS)
+    row = Project.objects.filter(pk=project_pk).values(*{PROJECT_FIELDS[name] for name in fields}).first()
+    if row is None:
+        raise Http404('Проект не найден')
+    return project_row(row, fields, PROJECT_FIELDS)
+
+
+def parse_since(value) -> datetime.datetime:
+    try:
+        since = parse_datetime(value or '')
+    except ValueError:
+        since = None
+    if since is None:
+        raise ApiError('Параметр since должен быть датой и временем ISO 8601')
+    return timezone.make_aware(since) if timezone.is_naive(since) else since
+
+
+def parse_day(value, name, default) -> datetime.date:
+    if not value:
+        return default
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ApiError(f'Параметр {name} должен быть датой ГГГГ-ММ-ДД')
+    return day
+
+
+def get_task_filters(request) -> dict:
+    '''?project=1&status=2&type=3, параметры можно повторять'''
+    filters = {}
+    for name in ('project', 'status', 'type'):
+        values = request.GET.getlist(name)
+        if values:
+            filters[f'{name}_id__in'] = [parse_int(value, name) for value in values]
+    return filters
+
+
+def filter_tasks(request, queryset):
+    return queryset.filter(**get_task_filters(request))
+
+
+class ApiView(GroupPermission, View):
+    '''базовое JSON-представление: ошибки прав и запроса отдаются JSON,
+    для изменяющих методов можно задать отдельные write_groups'''
+    groups = ['Project Manager', 'Team Lead', 'Developer']
+    write_groups = None
+
+    def test_func(self):
+        if self.write_groups is not None and self.request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return get_permissions(self.request).in_groups(self.write_groups)
+        return super().test_func()
+
+    def handle_no_permission(self):
+        if not self.request.user.is_authenticated:
+            return JsonResponse({'error': 'Требуется вход'}, status=401)
+        return JsonResponse({'error': 'Доступ запрещён'}, status=403)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return error.response()
+        except Http404 as error:
+            return JsonResponse({'error': str(error) or 'Не найдено'}, status=404)
+
+    def check_member(self, project_pk):
+        if not get_permissions(self.request).is_project_member(project_pk):
+            raise ApiError('Вы не участник проекта', status=403)
+
+    def json(self, data, status=200):
+        return JsonResponse(data, status=status, encoder=DjangoJSONEncoder)
+
+
+class TaskListApiView(ApiView):
+    '''GET - список задач курсорными страницами (?cursor, ?limit, ?fields, фильтры),
+    POST - создание задачи с проверкой TaskForm'''
+
+    def get(self, request, *args, **kwargs):
+        fields = get_fields(request, TASK_FIELDS)
+        columns = {TASK_FIELDS[name] for name in fields} | {'id', 'created_at'}
+        queryset = filter_tasks(request, Task.objects.all()).values(*columns)
+        page = CursorPaginator(queryset, get_limit(request)).page(request.GET.get('cursor'))
+        return self.json({
+            'results': [project_row(row, fields, TASK_FIELDS) for row in page],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        })
+
+    def post(self, request, *args, **kwargs):
+        form = TaskForm(parse_json(request))
+        if not form.is_valid():
+            raise ApiError('Ошибка валидации', errors=form.errors.get_json_data())
+        self.check_member(form.cleaned_data['project'].pk)
+        form.instance.changed_by = request.user
+        task = form.save()
+        return self.json(get_task_data(task.pk), status=201)
+
+
+class TaskDetailApiView(ApiView):
+    '''GET - задача, PATCH/PUT - изменение участником проекта,
+    ?fields= ограничивает и ответ на изменение (перенос карточки на доске)'''
+
+    def get(self, request, *args, **kwargs):
+        return self.json(get_task_data(kwargs['pk'], get_fields(request, TASK_FIELDS)))
+
+    def patch(self, request, *args, **kwargs):
+        fields = get_fields(request, TASK_FIELDS)
+        task = get_object_or_404(Task, pk=kwargs['pk'])
+        self.check_member(task.project_id)
+        data = model_to_dict(task, fields=TaskForm.Meta.fields) if request.method == 'PATCH' else {}
+        data.update(parse_json(request))
+        form = TaskForm(data, instance=task)
+        if not form.is_valid():
+            raise ApiError('Ошибка валидации', errors=form.errors.get_json_data())
+        self.check_member(form.cleaned_data['project'].pk)
+        task.changed_by = request.user
+        form.save()
+        return self.json(get_task_data(task.pk, fields))
+
+    put = patch
+
+
+class TaskExportApiView(ApiView):
+    '''потоковая выгрузка всех задач в NDJSON (?format=ndjson) или CSV (?format=csv):
+    строки читаются iterator() пачками, поэтому память не зависит от размера таблицы.
+    Под ASGI генератор читал бы базу в цикле событий, там выгрузка собирается целиком.
+    ?background=1 - выгрузка пишется в файл очередью заданий, ответ 202 с адресом состояния,
+    файл отдаёт JobFileApiView'''
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'ndjson')
+        if export_format not in exports.FORMATS:
+            raise ApiError('format должен быть ndjson или csv')
+        fields = get_fields(request, TASK_FIELDS)
+        columns = [TASK_FIELDS[name] for name in fields]
+        filters = get_task_filters(request)
+        if request.GET.get('background'):
+            payload = {'fields': fields, 'columns': columns, 'filters': filters, 'export_format': export_format}
+            return self.json(job_data(enqueue('export_tasks', payload, user=request.user)), status=202)
+        content = exports.iter_export(export_format, fields, exports.get_rows(columns, filters))
+        content_type = exports.FORMATS[export_format]
+        if body_in_event_loop(request):
+            response = HttpResponse(''.join(content), content_type=content_type)
+        else:
+            response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="tasks.{export_format}"'
+        return response
+
+
+class ProjectListApiView(ApiView):
+    '''GET - проекты по возрастанию id (?after=<id>, ?limit, ?fields),
+    POST - создание проекта руководителем проекта'''
+    write_groups = ['Project Manager']
+
+    def get(self, request, *args, **kwargs):
+        fields = get_fields(request, PROJECT_FIELDS)
+        limit = get_limit(request)
+        queryset = Project.objects.order_by('pk')
+        if request.GET.get('after'):
+            queryset = queryset.filter(pk__gt=parse_int(request.GET['after'], 'after'))
+        rows = list(queryset.values(*{PROJECT_FIELDS[name] for name in fields} | {'id'})[:limit + 1])
+        next_after = rows[limit - 1]['id'] if len(rows) > limit else None
+        return self.json({
+            'results': [project_row(row, fields, PROJECT_FIELDS) for row in rows[:limit]],
+            'next_after': next_after,
+        })
+
+    def post(self, request, *args, **kwargs):
+        form = ProjectForm(parse_json(request))
+        if not form.is_valid():
+            raise ApiError('Ошибка валидации', errors=form.errors.get_json_data())
+        project = form.save()
+        return self.json(get_project_data(project.pk), status=201)
+
+
+class ProjectDetailApiView(ApiView):
+    '''GET - проект, PATCH/PUT - изменение руководителем проекта из его участников'''
+    write_groups = ['Project Manager']
+
+    def get(self, request, *args, **kwargs):
+        return self.json(get_project_data(kwargs['pk'], get_fields(request, PROJECT_FIELDS)))
+
+    def patch(self, request, *args, **kwargs):
+        project = get_object_or_404(Project, pk=kwargs['pk'])
+        self.check_member(project.pk)
+        data = model_to_dict(project) if request.method == 'PATCH' else {}
+        if 'users' in data:
+            data['users'] = [user.pk for user in data['users']]
+        data.update(parse_json(request))
+        form = ProjectForm(data, instance=project)
+        if not form.is_valid():
+            raise ApiError('Ошибка валидации', errors=form.errors.get_json_data())
+        form.save()
+        return self.json(get_project_data(project.pk))
+
+    put = patch
+
+
+class ProjectBoardChangesApiView(ApiView):
+    '''GET ?since=<ISO 8601> - карточки доски проекта, изменённые после водяной отметки,
+    и новая отметка. ETag - версия проекта в кэше: пока в проекте ничего не менялось,
+    опрос доски получает 304 без запросов к базе'''
+
+    def get(self, request, *args, **kwargs):
+        since = parse_since(request.GET.get('since'))
+        name = f'project:{kwargs["pk"]}'
+        etag = quote_etag(str(get_versions(name)[name]))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            tasks, watermark = board.get_changes(kwargs['pk'], since)
+            response = self.json({'tasks': tasks, 'watermark': watermark})
+        response['ETag'] = etag
+        return response
+
+
+class JobDetailApiView(ApiView):
+    '''GET - состояние задания фоновой очереди для опроса клиентом;
+    видно тому, кто его поставил, и сотрудникам'''
+
+    def get(self, request, *args, **kwargs):
+        jobs = Job.objects.all() if request.user.is_staff else Job.objects.filter(user_id=request.user.pk)
+        return self.json(job_data(get_object_or_404(jobs.defer('payload'), pk=kwargs['pk'])))
+
+
+class JobFileApiView(ApiView):
+    '''GET - файл выполненного задания (выгрузки задач), права как у JobDetailApiView'''
+
+    def get(self, request, *args, **kwargs):
+        jobs = Job.objects.all() if request.user.is_staff else Job.objects.filter(user_id=request.user.pk)
+        job = get_object_or_404(jobs.filter(status=Job.DONE).defer('payload'), pk=kwargs['pk'])
+        name = job.result.get('file') if isinstance(job.result, dict) else None
+        storage = get_storage()
+        if not name or not storage.exists(name):
+            raise Http404('Файл не найден')
+        return FileResponse(
+            storage.open(name, 'rb'), as_attachment=True, filename=f'tasks.{job.result["format"]}',
+            content_type=exports.FORMATS[job.result['format']],
+        )
+
+
+class ProjectAnalyticsApiView(ApiView):
+    '''GET ?start=&end= (ГГГГ-ММ-ДД, по умолчанию последние 30 дней), ?type= можно повторять -
+    создано и закрыто задач проекта по дням и типам из дневных итогов (issue.analytics),
+    без чтения таблицы задач'''
+    groups = ['Project Manager', 'Team Lead']
+
+    def get(self, request, *args, **kwargs):
+        end = parse_day(request.GET.get('end'), 'end', timezone.localdate())
+        start = parse_day(request.GET.get('start'), 'start', end - datetime.timedelta(days=29))
+        if start > end:
+            raise ApiError('start позже end')
+        if (end - start).days >= settings.ANALYTICS_MAX_DAYS:
+            raise ApiError(f'Период не больше {settings.ANALYTICS_MAX_DAYS} дней')
+        type_ids = [parse_int(value, 'type') for value in request.GET.getlist('type')]
+        self.check_member(kwargs['pk'])
+        return self.json(analytics.get_project_stats(kwargs['pk'], start, end, type_ids))
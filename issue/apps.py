@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class IssueConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'issue'
+
+    def ready(self):
+        from issue import signals  # noqa: F401
@@ -0,0 +1,63 @@
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from issue import cache, counters
+from issue.models import ArchivedTask, Task, TaskEvent
+from issue.search import get_search_backend
+
+
+# события задачи, переносимые в ArchivedTask.events
+EVENT_FIELDS = ('kind', 'changes', 'user_id', 'created_at')
+
+
+def get_archive_queryset(retention_days=None):
+    '''удалённые задачи старше срока хранения в корзине, по индексу task_deleted_at_idx'''
+    retention_days = settings.TASK_ARCHIVE_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = timezone.now() - datetime.timedelta(days=retention_days)
+    return Task.all_objects.filter(is_deleted=True, deleted_at__lt=cutoff)
+
+
+def archive_batch(tasks: list[Task]) -> int:
+    '''переносит задачи с историей в ArchivedTask одной транзакцией.
+    Удаление идёт одним DELETE без сигналов post_delete (по запросу на задачу),
+    поэтому счётчики, поисковый индекс и кэш обновляются здесь пачкой'''
+    pks = [task.pk for task in tasks]
+    events = {}
+    with transaction.atomic():
+        history = TaskEvent.objects.filter(task_id__in=pks).order_by('created_at', 'pk')
+        for row in history.values('task_id', *EVENT_FIELDS):
+            events.setdefault(row.pop('task_id'), []).append(row)
+        ArchivedTask.objects.bulk_create([
+            ArchivedTask(
+                id=task.pk, summary=task.summary, description=task.description, status_id=task.status_id,
+                type_id=task.type_id, project_id=task.project_id, created_at=task.created_at,
+                updated_at=task.updated_at, deleted_at=task.deleted_at, events=events.get(task.pk, []),
+            )
+            for task in tasks
+        ])
+        TaskEvent.objects.filter(task_id__in=pks)._raw_delete(TaskEvent.objects.db)
+        Task.all_objects.filter(pk__in=pks)._raw_delete(Task.all_objects.db)
+        counters.apply_deltas(counters.get_deltas([counters.task_state(task) for task in tasks]))
+        get_search_backend().remove_many(pks)
+    cache.bump_versions(cache.PROJECTS, *{f'project:{task.project_id}' for task in tasks})
+    return len(tasks)
+
+
+def archive_deleted(retention_days=None, batch_size=None) -> int:
+    '''переносит в архив задачи, удалённые дольше retention_days дней, пачками по batch_size:
+    каждая пачка - своя короткая транзакция, живая таблица не блокируется надолго.
+    Возвращает число перенесённых задач'''
+    batch_size = batch_size or settings.TASK_ARCHIVE_BATCH_SIZE
+    queryset = get_archive_queryset(retention_days)
+    archived = 0
+    while True:
+        with transaction.atomic():
+            # задача, восстановленная параллельно, остаётся заблокированной до конца переноса пачки
+            tasks = list(queryset.select_for_update().order_by('deleted_at', 'pk')[:batch_size])
+            if tasks:
+                archived += archive_batch(tasks)
+        if len(tasks) < batch_size:
+            return archived
@@ -0,0 +1,167 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.views import View
+
+from accounts.permissions import get_permissions
+from issue.cache import PROJECTS, REFERENCE, TASKS, get_etag, get_last_modified, get_versions, set_conditional_headers
+from issue.forms import SearchTaskForm
+from issue.models import Project, Task
+from issue.pagination import CursorPaginator
+from issue.search import get_search_backend, regex_search
+from issue.views import get_project_tasks_context
+
+
+class AsyncReadView(View):
+    '''асинхронное представление только для чтения: данные загружаются асинхронным ORM,
+    права и версии кэша проверяются через sync_to_async, шаблон рендерится в потоке.
+    groups - как у GroupPermission, None - доступно всем'''
+    template_name = None
+    groups = None
+    login_required = False
+
+    def get_version_names(self) -> list:
+        return [REFERENCE]
+
+    async def check_permissions(self, request):
+        '''None если доступ разрешён, иначе ответ или PermissionDenied как у AccessMixin'''
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if self.groups is None and not self.login_required:
+            return None
+        if is_authenticated and (self.groups is None or await get_permissions(request).ain_groups(self.groups)):
+            return None
+        if is_authenticated:
+            raise PermissionDenied
+        return redirect_to_login(request.get_full_path())
+
+    async def get_context_data(self, **kwargs) -> dict:
+        return kwargs
+
+    async def get(self, request, *args, **kwargs):
+        denied = await self.check_permissions(request)
+        if denied is not None:
+            return denied
+        self.cache_versions = await sync_to_async(get_versions)(*self.get_version_names())
+        etag = get_etag(request, self.__class__.__name__, self.cache_versions)
+        last_modified = get_last_modified(self.cache_versions)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            context = await self.get_context_data(**kwargs)
+            context['cache_versions'] = self.cache_versions
+            context['fragment_timeout'] = settings.ISSUE_FRAGMENT_CACHE_TIMEOUT
+            response = await sync_to_async(render)(request, self.template_name, context)
+        return set_conditional_headers(response, etag, last_modified)
+
+
+class AsyncTaskListView(AsyncReadView):
+    '''асинхронный вариант TaskListView с теми же поиском и пагинацией'''
+    template_name = 'task_list.html'
+    paginate_by = 3
+    paginate_orphans = 1
+    max_page_size = 100
+
+    def get_version_names(self):
+        return [TASKS, REFERENCE]
+
+    async def get_queryset(self, form):
+        queryset = Task.objects.for_list().order_by('-created_at', '-pk')
+        search = form.cleaned_data.get('search') if form.is_valid() else None
+        if search:
+            if form.cleaned_data.get('mode') == SearchTaskForm.MODE_REGEX:
+                queryset = regex_search(queryset, search)
+            else:
+                queryset = await get_search_backend().asearch(queryset, search)
+        return queryset
+
+    async def paginate(self, queryset):
+        get = self.request.GET
+        if get.get('pagination', settings.TASK_LIST_PAGINATION) == 'cursor':
+            try:
+                page_size = max(1, min(int(get.get('page_size', self.paginate_by)), self.max_page_size))
+            except ValueError:
+                page_size = self.paginate_by
+            paginator = CursorPaginator(queryset, page_size)
+            page = await paginator.apage(get.get('cursor'))
+            return paginator, page, True
+        paginator = Paginator(queryset, self.paginate_by, orphans=self.paginate_orphans)
+        paginator.count = await queryset.acount()
+        try:
+            page = paginator.page(get.get('page') or 1)
+        except InvalidPage as error:
+            raise Http404(str(error))
+        page.object_list = [task async for task in page.object_list]
+        return paginator, page, False
+
+    async def get_context_data(self, **kwargs):
+        form = SearchTaskForm(self.request.GET)
+        queryset = await self.get_queryset(form)
+        paginator, page, cursor_pagination = await self.paginate(queryset)
+        query = self.request.GET.copy()
+        for key in ('page', 'cursor'):
+            query.pop(key, None)
+        if cursor_pagination:
+            query['pagination'] = 'cursor'
+        return {
+            'form': form,
+            'tasks': page.object_list,
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': page.has_other_pages(),
+            'cursor_pagination': cursor_pagination,
+            'query': query.urlencode(),
+        }
+
+
+class AsyncTaskDetailView(AsyncReadView):
+    template_name = 'task_detail.html'
+    groups = ['Project Manager', 'Team Lead', 'Developer']
+    login_required = True
+
+    def get_version_names(self):
+        return [f'task:{self.kwargs["pk"]}', REFERENCE]
+
+    async def get_context_data(self, **kwargs):
+        try:
+            task = await Task.objects.for_detail().aget(pk=kwargs['pk'])
+        except Task.DoesNotExist:
+            raise Http404('Задача не найдена')
+        return {'task': task, 'object': task}
+
+
+class AsyncProjectListView(AsyncReadView):
+    template_name = 'project/project_list.html'
+    groups = ['Project Manager', 'Team Lead', 'Developer']
+
+    def get_version_names(self):
+        return [PROJECTS, REFERENCE]
+
+    async def get_context_data(self, **kwargs):
+        return {'projects': [project async for project in Project.objects.for_list()]}
+
+
+class AsyncProjectDetailView(AsyncReadView):
+    '''задачи остаются ленивыми: они внутри тегов {% cache %}
+    и запрашиваются только при промахе кэша во время рендеринга'''
+    template_name = 'project/project_detail.html'
+    groups = ['Project Manager', 'Team Lead', 'Developer']
+
+    def get_version_names(self):
+        return [f'project:{self.kwargs["pk"]}', REFERENCE]
+
+    async def get_context_data(self, **kwargs):
+        try:
+            project = await Project.objects.aget(pk=kwargs['pk'])
+        except Project.DoesNotExist:
+            raise Http404('Проект не найден')
+        return {
+            'project': project,
+            'object': project,
+            'members': [member async for member in project.users.only('username').order_by('username')],
+            'project_version': self.cache_versions[f'project:{project.pk}'],
+            **await sync_to_async(get_project_tasks_context)(self.request, project.pk),
+        }
@@ -0,0 +1,150 @@
+import datetime
+import math
+import random
+import statistics
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from issue import cache
+from issue.counters import recount
+from issue.models import Project, Status, Task, Type
+from issue.search import get_search_backend
+
+
+GROUPS = ('Project Manager', 'Team Lead', 'Developer')
+# доли пользователей по группам
+GROUP_WEIGHTS = (1, 2, 7)
+STATUSES = ('New', 'In Progress', 'Done')
+TYPES = ('Task', 'Bug', 'Enhancement')
+WORDS = (
+    'ошибка', 'форма', 'страница', 'проект', 'задача', 'пользователь', 'список', 'поиск', 'отчёт', 'экспорт',
+    'импорт', 'права', 'группа', 'статус', 'фильтр', 'кэш', 'запрос', 'база', 'индекс', 'шаблон', 'кнопка',
+    'сохранение', 'удаление', 'загрузка', 'ответ', 'сервер', 'время', 'дата', 'описание', 'настройка',
+    'login', 'api', 'csv', 'json', 'django', 'sqlite', 'timeout', 'migration', 'admin', 'release',
+)
+VERBS = (
+    'исправить', 'добавить', 'проверить', 'ускорить', 'обновить', 'удалить', 'описать', 'перенести',
+    'настроить', 'протестировать',
+)
+
+
+def percentile(values: list, percent: float) -> float:
+    '''перцентиль методом ближайшего ранга'''
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(timings_ms: list, elapsed_s: float | None = None) -> dict:
+    '''сводка по замерам в миллисекундах'''
+    summary = {
+        'requests': len(timings_ms),
+        'mean_ms': round(statistics.fmean(timings_ms), 3) if timings_ms else 0.0,
+        'p50_ms': round(percentile(timings_ms, 50), 3),
+        'p90_ms': round(percentile(timings_ms, 90), 3),
+        'p99_ms': round(percentile(timings_ms, 99), 3),
+        'max_ms': round(max(timings_ms), 3) if timings_ms else 0.0,
+    }
+    if elapsed_s:
+        summary['throughput_rps'] = round(len(timings_ms) / elapsed_s, 1)
+    return summary
+
+
+@contextmanager
+def temporary_database(verbosity=0):
+    '''временная тестовая база, как у manage.py test, рабочие данные не затрагиваются'''
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def seed_small_tracker(tasks=100, password=None) -> User:
+    '''проект с задачами и участником из группы Developer для замеров страниц'''
+    status = Status.objects.create(name='New')
+    task_type = Type.objects.create(name='Task')
+    project = Project.objects.create(name='Benchmark', start_date=datetime.date.today())
+    Task.objects.bulk_create([
+        Task(summary=f'Task {number}', description=f'Description {number}', status=status, type=task_type,
+             project=project)
+        for number in range(tasks)
+    ])
+    get_search_backend().rebuild(Task._base_manager.all())
+    user = User.objects.create_user('benchmark', password=password)
+    user.groups.add(Group.objects.get_or_create(name='Developer')[0])
+    project.users.add(user)
+    return user
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    text = ' '.join([rng.choice(VERBS)] + [rng.choice(WORDS) for _ in range(words - 1)])
+    return text[0].upper() + text[1:]
+
+
+def generate_tracker(projects=10, users=50, tasks=1000, members=5, seed=0, password='password',
+                     prefix='user', batch_size=1000) -> dict:
+    '''синтетические данные массовыми вставками: проекты, пользователи в трёх группах
+    (участники проектов) и задачи со случайными текстами, статусами и типами.
+    После вставки пересобираются поисковый индекс и счётчики проектов, сбрасываются версии кэша'''
+    rng = random.Random(seed)
+    groups = [Group.objects.get_or_create(name=name)[0] for name in GROUPS]
+    statuses = [Status.objects.get_or_create(name=name)[0] for name in STATUSES]
+    types = [Type.objects.get_or_create(name=name)[0] for name in TYPES]
+    today = datetime.date.today()
+    with transaction.atomic():
+        new_projects = Project.objects.bulk_create([
+            Project(
+                name=f'Проект {number}', description=sentence(rng, 8),
+                start_date=today - datetime.timedelta(days=rng.randint(30, 720)),
+            )
+            for number in range(projects)
+        ], batch_size=batch_size)
+
+        start = User.objects.filter(username__startswith=prefix).count()
+        password_hash = make_password(password)
+        new_users = User.objects.bulk_create([
+            User(username=f'{prefix}{number}', password=password_hash)
+            for number in range(start, start + users)
+        ], batch_size=batch_size)
+        UserGroups = User.groups.through
+        UserGroups.objects.bulk_create([
+            UserGroups(user_id=user.pk, group_id=rng.choices(groups, GROUP_WEIGHTS)[0].pk) for user in new_users
+        ], batch_size=batch_size)
+        ProjectUsers = Project.users.through
+        memberships = {
+            (project.pk, user.pk)
+            for project in new_projects
+            for user in rng.sample(new_users, min(members, len(new_users)))
+        }
+        ProjectUsers.objects.bulk_create([
+            ProjectUsers(project_id=project_pk, user_id=user_pk) for project_pk, user_pk in sorted(memberships)
+        ], batch_size=batch_size)
+
+        for offset in range(0, tasks, batch_size):
+            Task.objects.bulk_create([
+                Task(
+                    summary=sentence(rng, rng.randint(3, 8)),
+                    description=' '.join(sentence(rng, rng.randint(5, 15)) + '.' for _ in range(rng.randint(1, 3))),
+                    status=rng.choice(statuses), type=rng.choice(types), project=rng.choice(new_projects),
+                )
+                for _ in range(min(batch_size, tasks - offset))
+            ])
+        if new_projects:
+            recount([project.pk for project in new_projects])
+
+    get_search_backend().rebuild(Task._base_manager.all())
+    cache.bump_versions(
+        cache.TASKS, cache.PROJECTS, cache.USERS, *[f'project:{project.pk}' for project in new_projects]
+    )
+    return {'projects': len(new_projects), 'users': len(new_users), 'memberships': len(memberships), 'tasks': tasks}
+
@@ -0,0 +1,45 @@
+import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from issue.models import Status, Task, TaskEvent, Type
+from issue.reference import reference_cache
+
+
+# запас при чтении изменений: updated_at выставляется до COMMIT, и задача,
+# сохранённая чуть раньше чужой водяной отметки, становится видна позже неё
+CHANGES_OVERLAP = datetime.timedelta(seconds=5)
+
+CARD_FIELDS = ('id', 'summary', 'status_id', 'type_id', 'project_id', 'is_deleted', 'updated_at')
+
+
+def get_columns(project) -> tuple:
+    '''колонки доски по всем статусам (из справочника) и водяная отметка -
+    наибольший updated_at на доске; задачи проекта читаются одним запросом'''
+    tasks = list(Task.objects.filter(project=project).for_list().order_by('-updated_at', '-pk'))
+    columns = {pk: {'status': status, 'tasks': []} for pk, status in reference_cache.objects(Status).items()}
+    for task in tasks:
+        if task.status_id in columns:
+            columns[task.status_id]['tasks'].append(task)
+    watermark = max((task.updated_at for task in tasks), default=None) or timezone.now()
+    return list(columns.values()), watermark
+
+
+def get_changes(project_pk, since: datetime.datetime) -> tuple:
+    '''задачи проекта, изменённые после since (с запасом CHANGES_OVERLAP), включая удалённые
+    и перенесённые в другой проект - их клиент убирает с доски. Один запрос из двух поисков (MULTI-INDEX OR):
+    задачи проекта по task_project_updated_idx, перенесённые - по событиям истории за тот же период
+    (task_event_created_idx), условие на JSON проверяется только у этих событий'''
+    after = since - CHANGES_OVERLAP
+    moved = TaskEvent.objects.filter(created_at__gt=after, changes__project__0=project_pk).values('task_id')
+    rows = list(
+        Task.all_objects.filter(Q(project_id=project_pk) | Q(pk__in=moved), updated_at__gt=after)
+        .order_by('updated_at', 'pk').values(*CARD_FIELDS)
+    )
+    types = reference_cache.objects(Type)
+    for row in rows:
+        row['type'] = str(types.get(row['type_id'], ''))
+        row['removed'] = row['is_deleted'] or row['project_id'] != project_pk
+    watermark = max([row['updated_at'] for row in rows] + [since])
+    return rows, watermark
@@ -0,0 +1,96 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+TASKS = 'tasks'
+PROJECTS = 'projects'
+USERS = 'users'
+REFERENCE = 'reference'
+
+
+def version_key(*parts) -> str:
+    return 'issue:version:' + ':'.join(str(part) for part in parts)
+
+
+def get_versions(*names) -> dict:
+    '''версии по именам одним обращением к кэшу.
+    Версия - время последнего изменения в наносекундах, поэтому служит и для Last-Modified'''
+    keys = {name: version_key(name) for name in names}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for name, key in keys.items():
+        if key not in found:
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+        versions[name] = found[key]
+    return versions
+
+
+def bump_versions(*names, at=None):
+    '''сбрасывает закэшированные фрагменты и ETag, зависящие от этих версий,
+    at - время изменения (datetime), по умолчанию текущее.
+    Внутри транзакции версии сдвигаются ещё раз после COMMIT: запрос, прочитавший
+    старые данные между первым сдвигом и фиксацией, иначе закэшировал бы их под новой версией'''
+    version = int(at.timestamp() * 1e9) if at else time.time_ns()
+    keys = [version_key(name) for name in names]
+    cache.set_many({key: version for key in keys}, timeout=None)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.set_many({key: time.time_ns() for key in keys}, timeout=None))
+
+
+def get_etag(request, view_name: str, versions: dict) -> str:
+    '''в ETag входят пользователь и CSRF-cookie, потому что страница содержит формы с токеном'''
+    parts = [
+        view_name,
+        request.get_full_path(),
+        str(request.user.pk),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ] + [f'{name}={value}' for name, value in sorted(versions.items())]
+    return quote_etag(hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest())
+
+
+def get_last_modified(versions: dict) -> int:
+    '''Last-Modified в целых секундах: заголовок If-Modified-Since не хранит долей секунды,
+    и с дробным временем страница всегда считалась бы изменённой'''
+    return max(versions.values()) // 1_000_000_000
+
+
+def set_conditional_headers(response, etag: str, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+class ConditionalGetMixin:
+    '''ETag и Last-Modified для страниц чтения по версиям из get_version_names(),
+    при совпадении браузер получает 304 без рендеринга шаблона'''
+
+    def get_version_names(self) -> list:
+        return [REFERENCE]
+
+    def get_last_modified(self, versions: dict) -> int:
+        return get_last_modified(versions)
+
+    def get(self, request, *args, **kwargs):
+        self.cache_versions = get_versions(*self.get_version_names())
+        etag = get_etag(request, self.__class__.__name__, self.cache_versions)
+        last_modified = self.get_last_modified(self.cache_versions)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return set_conditional_headers(response, etag, last_modified)
+
+    def get_context_data(self, **kwargs):
+        '''версии и время жизни для тегов {% cache %} в шаблоне'''
+        context = super().get_context_data(**kwargs)
+        context['cache_versions'] = self.cache_versions
+        context['fragment_timeout'] = settings.ISSUE_FRAGMENT_CACHE_TIMEOUT
+        return context
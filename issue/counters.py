@@ -0,0 +1,106 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from issue.models import Project, ProjectStatusCounter, ProjectTypeCounter, Task
+
+
+def task_state(task: Task, loaded=False):
+    '''(проект, статус, тип, удалена) - по этим полям задача входит в счётчики;
+    loaded - значения, прочитанные из базы, до изменений в объекте'''
+    names = ('project_id', 'status_id', 'type_id', 'is_deleted')
+    if loaded:
+        return tuple(
+            task.get_loaded_value(name) if name in getattr(task, '_loaded_values', {}) else getattr(task, name)
+            for name in names
+        )
+    return tuple(getattr(task, name) for name in names)
+
+
+def contributions(state) -> Counter:
+    project_id, status_id, type_id, is_deleted = state
+    if is_deleted:
+        return Counter({('deleted', project_id, None): 1})
+    return Counter({
+        ('total', project_id, None): 1,
+        ('status', project_id, status_id): 1,
+        ('type', project_id, type_id): 1,
+    })
+
+
+def get_deltas(old_states=(), new_states=()) -> Counter:
+    '''изменение счётчиков при переходе задач из old_states в new_states, нулевые отброшены'''
+    deltas = Counter()
+    for state in old_states:
+        deltas.subtract(contributions(state))
+    for state in new_states:
+        deltas.update(contributions(state))
+    return Counter({key: value for key, value in deltas.items() if value})
+
+
+def apply_deltas(deltas: Counter) -> set:
+    '''F-выражения в одной транзакции, возвращает id затронутых проектов'''
+    projects = {}
+    rows = {'status': (ProjectStatusCounter, 'status_id'), 'type': (ProjectTypeCounter, 'type_id')}
+    # постоянный порядок обновления строк, чтобы параллельные транзакции не ждали друг друга по кругу
+    ordered = sorted(deltas.items(), key=lambda item: (item[0][0], item[0][1], item[0][2] or 0))
+    with transaction.atomic():
+        for (kind, project_id, key), value in ordered:
+            if kind in rows:
+                model, field = rows[kind]
+                lookup = {'project_id': project_id, field: key}
+                if not model.objects.filter(**lookup).update(count=F('count') + value):
+                    model.objects.bulk_create([model(**lookup)], ignore_conflicts=True)
+                    model.objects.filter(**lookup).update(count=F('count') + value)
+            else:
+                projects.setdefault(project_id, {})[f'tasks_{kind}'] = F(f'tasks_{kind}') + value
+        for project_id, values in projects.items():
+            Project.objects.filter(pk=project_id).update(**values)
+    return {project_id for _, project_id, _ in deltas}
+
+
+def recount(project_ids=None) -> int:
+    '''пересчёт счётчиков агрегатами по таблице задач, исправляет расхождения.
+    Возвращает число проектов, у которых счётчики изменились'''
+    projects = Project.objects.all()
+    tasks = Task.all_objects.all()
+    if project_ids:
+        projects = projects.filter(pk__in=project_ids)
+        tasks = tasks.filter(project_id__in=project_ids)
+    with transaction.atomic():
+        before = snapshot(projects)
+        totals = {
+            row['project_id']: row for row in tasks.values('project_id').annotate(
+                total=Count('pk', filter=Q(is_deleted=False)), deleted=Count('pk', filter=Q(is_deleted=True))
+            )
+        }
+        changed = []
+        for project in projects.only('pk', 'tasks_total', 'tasks_deleted'):
+            row = totals.get(project.pk, {'total': 0, 'deleted': 0})
+            project.tasks_total, project.tasks_deleted = row['total'], row['deleted']
+            changed.append(project)
+        Project.objects.bulk_update(changed, ['tasks_total', 'tasks_deleted'], batch_size=500)
+        live = tasks.filter(is_deleted=False)
+        for model, field in ((ProjectStatusCounter, 'status_id'), (ProjectTypeCounter, 'type_id')):
+            model.objects.filter(project__in=projects).delete()
+            model.objects.bulk_create([
+                model(project_id=row['project_id'], count=row['count'], **{field: row[field]})
+                for row in live.order_by().values('project_id', field).annotate(count=Count('pk'))
+            ], batch_size=500)
+        after = snapshot(projects)
+    return sum(1 for project_id, counters in after.items() if before.get(project_id) != counters)
+
+
+def snapshot(projects) -> dict:
+    '''все счётчики проектов для сравнения до и после пересчёта'''
+    data = {
+        pk: {'total': total, 'deleted': deleted}
+        for pk, total, deleted in projects.values_list('pk', 'tasks_total', 'tasks_deleted')
+    }
+    for model, field in ((ProjectStatusCounter, 'status_id'), (ProjectTypeCounter, 'type_id')):
+        for project_id, key, count in model.objects.filter(project__in=projects, count__gt=0).values_list(
+            'project_id', field, 'count'
+        ):
+            data[project_id][(field, key)] = count
+    return data
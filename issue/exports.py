@@ -0,0 +1,86 @@
+import csv
+import datetime
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import Storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from issue.models import Task
+
+
+EXPORT_CHUNK_SIZE = 2000
+# формат выгрузки -> Content-Type
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class Echo:
+    '''буфер для csv.writer, который сразу возвращает записанную строку'''
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(fields, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(fields, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+def get_rows(columns, filters):
+    '''строки задач по возрастанию id, читаются iterator() пачками,
+    поэтому память не зависит от размера таблицы'''
+    return Task.objects.filter(**filters).values_list(*columns).order_by('pk').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def iter_export(export_format, fields, rows):
+    '''строки файла выгрузки'''
+    if export_format == 'csv':
+        return stream_csv(fields, rows)
+    return stream_ndjson(fields, rows)
+
+
+def delete_expired(storage: Storage, retention_days=None) -> int:
+    '''удаляет файлы выгрузок старше JOBS_EXPORT_RETENTION_DAYS'''
+    retention_days = settings.JOBS_EXPORT_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = timezone.now() - datetime.timedelta(days=retention_days)
+    if not storage.exists('exports'):
+        return 0
+    deleted = 0
+    for name in storage.listdir('exports')[1]:
+        path = f'exports/{name}'
+        if storage.get_modified_time(path) < cutoff:
+            storage.delete(path)
+            deleted += 1
+    return deleted
+
+
+def write_export(storage: Storage, export_format, fields, columns, filters) -> dict:
+    '''записывает выгрузку в exports/ хранилища построчно, без сборки файла в памяти.
+    Недописанный файл при ошибке удаляется'''
+    name = f'exports/{uuid.uuid4().hex}.{export_format}'
+    path = storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rows = 0
+    try:
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            for line in iter_export(export_format, fields, get_rows(columns, filters)):
+                file.write(line)
+                rows += 1
+    except BaseException:
+        storage.delete(name)
+        raise
+    # строка заголовка CSV не считается
+    return {'file': name, 'format': export_format, 'rows': rows - 1 if export_format == 'csv' else rows}
@@ -1,16 +1,64 @@
+import re
+
 from django import forms
 
-from issue.models import Task, Project
+from issue.models import Project, Status, Task, Type
+from issue.reference import ReferenceChoiceField
 
 
 class TaskForm(forms.ModelForm):
     class Meta:
         model = Task
         fields = ['summary', 'description',  'status',  'type', 'project']
+        field_classes = {'status': ReferenceChoiceField, 'type': ReferenceChoiceField}
+
+
+class TaskCreateForm(TaskForm):
+    '''создание задачи в проекте из адреса страницы'''
+    class Meta(TaskForm.Meta):
+        fields = ['summary', 'description', 'status', 'type']
+
+
+class SearchTaskForm(forms.Form):
+    MODE_FULLTEXT = 'fulltext'
+    MODE_REGEX = 'regex'
+    MODE_CHOICES = [
+        (MODE_FULLTEXT, 'По словам'),
+        (MODE_REGEX, 'Регулярное выражение'),
+    ]
+
+    search = forms.CharField(required=False, label='')
+    mode = forms.ChoiceField(required=False, label='', choices=MODE_CHOICES, initial=MODE_FULLTEXT)
+
+    def clean_mode(self):
+        '''по умолчанию полнотекстовый поиск, regex включается явно'''
+        return self.cleaned_data.get('mode') or self.MODE_FULLTEXT
+
+    def clean(self):
+        '''проверяет регулярное выражение до запроса в базу'''
+        cleaned_data = super().clean()
+        search = cleaned_data.get('search')
+        if search and cleaned_data.get('mode') == self.MODE_REGEX:
+            try:
+                re.compile(search)
+            except re.error:
+                raise forms.ValidationError('Некорректное регулярное выражение')
+        return cleaned_data
+
 
+class TaskFilterForm(forms.Form):
+    '''фильтр задач проекта по статусу и типу, варианты и проверка - из справочников в памяти'''
+    status = ReferenceChoiceField(queryset=Status.objects.all(), required=False, label='Статус', empty_label='Все статусы')
+    type = ReferenceChoiceField(queryset=Type.objects.all(), required=False, label='Тип', empty_label='Все типы')
 
-# class SearchTaskForm(forms.Form):
-#     search = forms.CharField(required=False, label='')
+    def filter(self, queryset):
+        '''некорректные значения отбрасываются, остальные условия применяются'''
+        self.is_valid()
+        for name in ('status', 'type'):
+            value = self.cleaned_data.get(name)
+            if value is not None:
+                queryset = queryset.filter(**{f'{name}_id': value.pk})
+        return queryset
 
 
 class ProjectForm(forms.ModelForm):
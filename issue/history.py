@@ -0,0 +1,108 @@
+from issue.models import Project, Task, TaskEvent
+from issue.reference import reference_cache
+
+
+# поля задачи в истории: имя в changes -> атрибут модели
+HISTORY_FIELDS = {
+    'summary': 'summary',
+    'description': 'description',
+    'status': 'status_id',
+    'type': 'type_id',
+    'project': 'project_id',
+    'is_deleted': 'is_deleted',
+}
+
+
+def get_changes(task: Task, created: bool) -> dict:
+    '''{"поле": [было, стало]} по значениям, загруженным из базы (Task.get_loaded_value)'''
+    changes = {}
+    for name, attname in HISTORY_FIELDS.items():
+        new = getattr(task, attname)
+        if created:
+            changes[name] = [None, new]
+            continue
+        if attname not in getattr(task, '_loaded_values', {}):
+            continue
+        old = task.get_loaded_value(attname)
+        if old != new:
+            changes[name] = [old, new]
+    return changes
+
+
+def get_kind(changes: dict, created: bool) -> str:
+    if created:
+        return TaskEvent.CREATED
+    if 'is_deleted' in changes:
+        return TaskEvent.DELETED if changes['is_deleted'][1] else TaskEvent.RESTORED
+    if set(changes) == {'status'}:
+        return TaskEvent.STATUS
+    return TaskEvent.UPDATED
+
+
+def build_event(task: Task, created: bool, user=None) -> TaskEvent | None:
+    changes = get_changes(task, created)
+    if not changes:
+        return None
+    if created:
+        # в событии создания пустые поля не хранятся
+        changes = {name: values for name, values in changes.items() if values[1] not in (None, '', False)}
+    kind = get_kind(changes, created)
+    if not created and 'status' in changes:
+        # проект и тип на момент смены статуса: по ним дневные итоги (issue.analytics)
+        # относят закрытие задачи, даже если позже её перенесут. В подписи истории не попадают
+        changes['context'] = {'project': task.project_id, 'type': task.type_id}
+    user = user if user is not None else getattr(task, 'changed_by', None)
+    return TaskEvent(
+        task_id=task.pk, kind=kind, changes=changes,
+        user=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def record_event(task: Task, created: bool):
+    '''одна вставка в транзакции сохранения задачи (Task.save), без изменений - без записи'''
+    event = build_event(task, created)
+    if event is not None:
+        event.save()
+    return event
+
+
+def record_created(tasks, user=None):
+    '''события создания для bulk_create одной вставкой'''
+    TaskEvent.objects.bulk_create([
+        event for event in (build_event(task, True, user) for task in tasks) if event is not None
+    ])
+
+
+def format_value(name, value, projects: dict):
+    if value is None:
+        return ''
+    if name in ('status', 'type'):
+        model = Task._meta.get_field(name).related_model
+        obj = reference_cache.get(model, value)
+        return obj.name if obj is not None else value
+    if name == 'project':
+        return projects.get(value, value)
+    if name == 'is_deleted':
+        return 'да' if value else 'нет'
+    return value
+
+
+def describe_events(events) -> list:
+    '''события страницы с подписями полей и названиями статусов, типов и проектов;
+    названия проектов - одним запросом на страницу'''
+    project_ids = {
+        value for event in events for value in event.changes.get('project', ()) if value is not None
+    }
+    projects = dict(Project.objects.filter(pk__in=project_ids).values_list('pk', 'name')) if project_ids else {}
+    rows = []
+    for event in events:
+        changes = [
+            (
+                Task._meta.get_field(name).verbose_name,
+                format_value(name, old, projects),
+                format_value(name, new, projects),
+            )
+            for name, (old, new) in event.changes.items() if name in HISTORY_FIELDS
+        ]
+        rows.append({'event': event, 'changes': changes})
+    return rows
@@ -0,0 +1,145 @@
+import csv
+import io
+import json
+
+from django import forms
+from django.db import DatabaseError, transaction
+
+from issue.forms import TaskForm
+from issue.models import Project, Status, Task, Type
+from issue.reference import reference_cache
+from issue.signals import tasks_bulk_created
+
+
+# проверка текстовых полей теми же правилами, что и в TaskForm;
+# статус и тип сверяются со справочниками в памяти, без запроса на каждую строку
+TaskImportForm = forms.modelform_factory(Task, form=TaskForm, fields=['summary', 'description'])
+
+FORMATS = ('csv', 'ndjson')
+
+
+class TaskImportError(ValueError):
+    '''файл не удаётся прочитать целиком (формат, кодировка)'''
+
+
+def read_csv(stream):
+    '''строки CSV с заголовком summary,description,status,type'''
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_ndjson(stream):
+    '''по одному JSON-объекту на строку, пустые строки пропускаются'''
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def open_text(file, encoding='utf-8-sig'):
+    '''текстовый поток поверх бинарного файла без чтения его в память'''
+    if isinstance(file, io.TextIOBase):
+        return file
+    return io.TextIOWrapper(file, encoding=encoding, newline='')
+
+
+def detect_format(name: str, default='csv') -> str:
+    extension = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    if extension in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    if extension == 'csv':
+        return 'csv'
+    return default
+
+
+class TaskImporter:
+    '''потоковый импорт задач в проект: строки читаются по одной, проверяются,
+    копятся в пачку и пишутся bulk_create в отдельной транзакции на пачку.
+    Ошибочные строки попадают в errors и не прерывают загрузку'''
+    max_errors = 1000
+
+    def __init__(self, project: Project, batch_size=500, user=None):
+        self.project = project
+        self.batch_size = batch_size
+        self.user = user
+        self.statuses = {obj.name.casefold(): pk for pk, obj in reference_cache.objects(Status).items()}
+        self.types = {obj.name.casefold(): pk for pk, obj in reference_cache.objects(Type).items()}
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line_number, errors: dict):
+        '''в отчёт попадают первые max_errors ошибок, остальные только считаются'''
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_number, 'errors': errors})
+
+    def resolve(self, lookup: dict, value, field: str, errors: dict):
+        pk = lookup.get(str(value or '').strip().casefold())
+        if pk is None:
+            errors[field] = [f'Неизвестное значение: {value}']
+        return pk
+
+    def build_task(self, line_number, row) -> Task | None:
+        if row is None:
+            self.add_error(line_number, {'__all__': ['Некорректная строка']})
+            return None
+        form = TaskImportForm({'summary': row.get('summary'), 'description': row.get('description')})
+        errors = {} if form.is_valid() else {field: list(messages) for field, messages in form.errors.items()}
+        status_id = self.resolve(self.statuses, row.get('status'), 'status', errors)
+        type_id = self.resolve(self.types, row.get('type'), 'type', errors)
+        if errors:
+            self.add_error(line_number, errors)
+            return None
+        return Task(
+            summary=form.cleaned_data['summary'], description=form.cleaned_data['description'],
+            status_id=status_id, type_id=type_id, project=self.project,
+        )
+
+    def flush(self, batch: list):
+        if not batch:
+            return
+        lines, tasks = zip(*batch)
+        try:
+            with transaction.atomic():
+                created = Task.objects.bulk_create(tasks)
+                # счётчики проекта и поисковый индекс в той же транзакции, что и задачи
+                tasks_bulk_created.send(sender=Task, tasks=created, user=self.user)
+        except DatabaseError as error:
+            for line in lines:
+                self.add_error(line, {'__all__': [str(error)]})
+            return
+        self.created += len(created)
+
+    def run(self, rows) -> dict:
+        batch = []
+        try:
+            for line_number, row in rows:
+                task = self.build_task(line_number, row)
+                if task is not None:
+                    batch.append((line_number, task))
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = []
+        except (UnicodeDecodeError, csv.Error) as error:
+            raise TaskImportError(f'Не удалось прочитать файл: {error}')
+        finally:
+            self.flush(batch)
+        return {
+            'project': self.project.pk,
+            'created': self.created,
+            'failed': self.error_count,
+            'errors': self.errors,
+        }
+
+    def import_file(self, file, file_format='csv') -> dict:
+        '''file - бинарный или текстовый файл, file_format - csv или ndjson'''
+        stream = open_text(file)
+        rows = read_ndjson(stream) if file_format == 'ndjson' else read_csv(stream)
+        return self.run(rows)
@@ -0,0 +1,195 @@
+import datetime
+import logging
+import traceback
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from issue import cache, exports
+from issue.archive import archive_deleted
+from issue.counters import recount
+from issue.importers import TaskImporter, TaskImportError
+from issue.membership import MembershipError, update_members
+from issue.models import Job, Project
+
+
+logger = logging.getLogger('issue.jobs')
+
+# имя задания -> функция(**payload), результат должен сериализоваться в JSON
+HANDLERS = {}
+
+
+class JobError(Exception):
+    '''ошибка, которую бесполезно повторять (некорректные данные): задание сразу завершается'''
+
+
+def register(name):
+    '''регистрирует функцию как задание с именем name'''
+    def decorator(func):
+        HANDLERS[name] = func
+        return func
+    return decorator
+
+
+def get_storage() -> FileSystemStorage:
+    '''файлы заданий: загруженные импорты до их обработки и готовые выгрузки'''
+    return FileSystemStorage(location=settings.JOBS_FILE_DIR)
+
+
+def enqueue(name, payload=None, dedup_key=None, user=None, max_attempts=None) -> Job:
+    '''ставит задание в очередь и сразу возвращает его. Если незавершённое задание
+    с тем же dedup_key уже есть, новое не создаётся - возвращается существующее'''
+    if name not in HANDLERS:
+        raise KeyError(f'Неизвестное задание {name}')
+    fields = {
+        'name': name,
+        'payload': payload or {},
+        'dedup_key': dedup_key,
+        'user': user if user is not None and user.is_authenticated else None,
+        'max_attempts': max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    }
+    if dedup_key is None:
+        return Job.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            return Job.objects.create(**fields)
+    except IntegrityError:
+        existing = Job.objects.filter(dedup_key=dedup_key, status__in=[Job.QUEUED, Job.RUNNING]).first()
+        # прежнее задание могло завершиться между INSERT и SELECT
+        return existing or Job.objects.create(**fields)
+
+
+def claim(worker: str, limit: int) -> list[int]:
+    '''забирает до limit готовых к запуску заданий. Каждое забирается условным UPDATE
+    (status = 'queued'), поэтому два обработчика не получат одно задание и без SELECT FOR UPDATE'''
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'id').values_list('pk', flat=True)[:limit]
+    )
+    claimed = []
+    for pk in candidates:
+        updated = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, started_at=now, attempts=F('attempts') + 1,
+        )
+        if updated:
+            claimed.append(pk)
+    return claimed
+
+
+def get_retry_delay(attempts: int) -> datetime.timedelta:
+    '''экспоненциальная пауза перед повтором: JOBS_RETRY_DELAY, 2x, 4x...'''
+    return datetime.timedelta(seconds=settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def execute(job_pk) -> str:
+    '''выполняет забранное задание, возвращает итоговое состояние.
+    Ошибка возвращает задание в очередь с паузой, пока не исчерпаны попытки.
+    Запись результата проверяет обработчика: задание, возвращённое в очередь
+    requeue_stale, не будет перезаписано'''
+    close_old_connections()
+    try:
+        job = Job.objects.get(pk=job_pk)
+        current = Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker)
+        handler = HANDLERS.get(job.name)
+        try:
+            if handler is None:
+                raise JobError(f'Неизвестное задание {job.name}')
+            result = handler(**job.payload)
+        except Exception as error:
+            now = timezone.now()
+            if isinstance(error, JobError) or job.attempts >= job.max_attempts:
+                current.update(status=Job.FAILED, error=str(error), finished_at=now)
+                logger.error('job %s failed: %s', job, traceback.format_exc())
+                return Job.FAILED
+            current.update(
+                status=Job.QUEUED, error=str(error), worker='', run_at=now + get_retry_delay(job.attempts),
+            )
+            logger.warning('job %s will be retried: %s', job, error)
+            return Job.QUEUED
+        current.update(status=Job.DONE, result=result, error='', finished_at=timezone.now())
+        return Job.DONE
+    finally:
+        close_old_connections()
+
+
+def requeue_stale(timeout=None) -> int:
+    '''задания, которые выполняются дольше timeout секунд (процесс обработчика завершился
+    аварийно), возвращаются в очередь или завершаются, если попытки исчерпаны'''
+    now = timezone.now()
+    timeout = settings.JOBS_STALE_TIMEOUT if timeout is None else timeout
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=now - datetime.timedelta(seconds=timeout))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, error='Превышено время выполнения', finished_at=now,
+    )
+    return failed + stale.update(status=Job.QUEUED, worker='', run_at=now)
+
+
+def job_data(job: Job) -> dict:
+    '''состояние задания для опроса клиентом, у выполненной выгрузки - ещё адрес файла'''
+    data = {
+        'id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'attempts': job.attempts,
+        'result': job.result,
+        'error': job.error,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+        'url': reverse('api_job_detail', kwargs={'pk': job.pk}),
+    }
+    if job.status == Job.DONE and isinstance(job.result, dict) and 'file' in job.result:
+        data['file_url'] = reverse('api_job_file', kwargs={'pk': job.pk})
+    return data
+
+
+@register('import_tasks')
+def import_tasks(project, path, file_format='csv', batch_size=500, user=None):
+    '''импорт файла, сохранённого TaskImportView; файл удаляется после обработки'''
+    storage = get_storage()
+    try:
+        importer = TaskImporter(
+            Project.objects.get(pk=project), batch_size=batch_size, user=User.objects.filter(pk=user).first(),
+        )
+        with storage.open(path, 'rb') as file:
+            return importer.import_file(file, file_format)
+    except (Project.DoesNotExist, TaskImportError) as error:
+        raise JobError(str(error) or 'Проект не найден')
+    finally:
+        storage.delete(path)
+
+
+@register('update_members')
+def update_project_members(project, add=None, remove=None, replace=None):
+    try:
+        return update_members(Project.objects.get(pk=project), add=add, remove=remove, replace=replace)
+    except Project.DoesNotExist:
+        raise JobError('Проект не найден')
+    except MembershipError as error:
+        raise JobError(str(error))
+
+
+@register('recount_project_counters')
+def recount_project_counters(projects=None):
+    changed = recount(projects or None)
+    if changed:
+        cache.bump_versions(cache.PROJECTS)
+    return {'changed': changed}
+
+
+@register('archive_deleted_tasks')
+def archive_deleted_tasks(retention_days=None, batch_size=None):
+    return {'archived': archive_deleted(retention_days, batch_size)}
+
+
+@register('export_tasks')
+def export_tasks(fields, columns, filters, export_format='ndjson'):
+    '''выгрузка TaskExportApiView с ?background=1 в файл JOBS_FILE_DIR/exports,
+    заодно удаляются выгрузки старше JOBS_EXPORT_RETENTION_DAYS'''
+    storage = get_storage()
+    exports.delete_expired(storage)
+    return exports.write_export(storage, export_format, fields, columns, filters)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from issue.archive import archive_deleted
+from issue.jobs import enqueue
+
+
+class Command(BaseCommand):
+    help = (
+        'Перенос задач, удалённых дольше TASK_ARCHIVE_RETENTION_DAYS дней, из корзины в архив (ArchivedTask) '
+        'пачками, запускать по расписанию'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, help='по умолчанию TASK_ARCHIVE_RETENTION_DAYS')
+        parser.add_argument('--batch-size', type=int, help='по умолчанию TASK_ARCHIVE_BATCH_SIZE')
+        parser.add_argument('--background', action='store_true', help='поставить перенос в очередь заданий')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            job = enqueue(
+                'archive_deleted_tasks',
+                {'retention_days': options['retention_days'], 'batch_size': options['batch_size']},
+                dedup_key='archive_deleted_tasks',
+            )
+            self.stdout.write(self.style.SUCCESS(f'задание {job.pk}: {job.status}'))
+            return
+        archived = archive_deleted(options['retention_days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'перенесено в архив задач: {archived}'))
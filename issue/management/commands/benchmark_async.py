@@ -0,0 +1,88 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from issue.benchmark import seed_small_tracker, summarize, temporary_database
+from issue.models import Project, Task
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер страниц чтения: синхронные представления через WSGI-клиент '
+        'в пуле потоков против асинхронных через ASGI-клиент, пропускная способность и p99'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help='запросов на страницу')
+        parser.add_argument('--concurrency', type=int, default=50, help='одновременных запросов')
+        parser.add_argument('--tasks', type=int, default=200, help='задач в тестовой базе')
+        parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            user = seed_small_tracker(options['tasks'])
+            task_pk = Task.objects.values_list('pk', flat=True).first()
+            project_pk = Project.objects.values_list('pk', flat=True).first()
+            pages = {
+                'task_list': ('task_list', 'async_task_list', {}),
+                'task_detail': ('task_detail', 'async_task_detail', {'pk': task_pk}),
+                'project_list': ('project_list', 'async_project_list', {}),
+                'project_detail': ('project_detail', 'async_project_detail', {'pk': project_pk}),
+            }
+            results = {}
+            for page, (sync_name, async_name, kwargs) in pages.items():
+                results[page] = {
+                    'wsgi': self.run_sync(reverse(sync_name, kwargs=kwargs), user, options),
+                    'asgi': asyncio.run(self.run_async(reverse(async_name, kwargs=kwargs), user, options)),
+                }
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for page, modes in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(page))
+            for mode, summary in modes.items():
+                self.stdout.write(
+                    f'  {mode}: {summary["throughput_rps"]} req/s, '
+                    f'p50 {summary["p50_ms"]} ms, p99 {summary["p99_ms"]} ms'
+                )
+
+    def run_sync(self, url, user, options) -> dict:
+        '''клиенты по одному на поток с общей сессией, вход выполняется один раз'''
+        login = Client()
+        login.force_login(user)
+        local = threading.local()
+
+        def request(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.cookies = login.cookies
+            started = time.perf_counter()
+            local.client.get(url)
+            return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            timings = list(executor.map(request, range(options['requests'])))
+        return summarize(timings, time.perf_counter() - started)
+
+    async def run_async(self, url, user, options) -> dict:
+        client = AsyncClient()
+        await asyncio.to_thread(client.force_login, user)
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        timings = []
+
+        async def request():
+            async with semaphore:
+                started = time.perf_counter()
+                await client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[request() for _ in range(options['requests'])])
+        return summarize(timings, time.perf_counter() - started)
@@ -0,0 +1,89 @@
+import json
+import time
+
+from django import forms
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from issue.benchmark import seed_small_tracker, temporary_database
+from issue.forms import TaskForm
+from issue.models import Project, Task
+from issue.reference import reference_cache
+
+
+# форма задачи в исходном виде: варианты статуса и типа из базы, проверка ForeignKey запросом
+PlainTaskForm = forms.modelform_factory(Task, fields=TaskForm.Meta.fields)
+
+
+class Command(BaseCommand):
+    help = (
+        'Число запросов и время форм создания и изменения задачи: '
+        'обычная ModelForm против TaskForm со справочниками в памяти'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200, help='повторов каждого замера')
+        parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            user = seed_small_tracker(10)
+            task = Task.objects.first()
+            project = Project.objects.first()
+            data = {
+                'summary': 'Benchmark', 'description': 'text',
+                'status': task.status_id, 'type': task.type_id, 'project': project.pk,
+            }
+            reference_cache.get_data()
+            results = {}
+            for name, form_class in (('before', PlainTaskForm), ('after', TaskForm)):
+                results[name] = {
+                    'create_render': self.measure(lambda: str(form_class()), options),
+                    'create_validate': self.measure(lambda: form_class(data).is_valid(), options),
+                    'update_render': self.measure(lambda: str(form_class(instance=task)), options),
+                    'update_validate': self.measure(lambda: form_class(data, instance=task).is_valid(), options),
+                }
+            results['views'] = self.measure_views(user, task, project)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, cases in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for case, summary in cases.items():
+                line = f'  {case}: {summary["queries"]} queries'
+                if 'mean_ms' in summary:
+                    line += f', {summary["mean_ms"]} ms'
+                self.stdout.write(line)
+
+    def measure(self, action, options) -> dict:
+        # журнал запросов ограничен по длине, после переполнения счётчик показывал бы 0
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            action()
+        started = time.perf_counter()
+        for _ in range(options['repeat']):
+            action()
+        return {
+            'queries': len(queries),
+            'mean_ms': round((time.perf_counter() - started) * 1000 / options['repeat'], 3),
+        }
+
+    def measure_views(self, user, task, project) -> dict:
+        '''страницы целиком со вторым запросом, когда права уже в кэше'''
+        client = Client()
+        client.force_login(user)
+        project.users.add(user)
+        results = {}
+        for name, url in (
+            ('task_create', reverse('task_create', kwargs={'pk': project.pk})),
+            ('task_update', reverse('task_update', kwargs={'pk': task.pk})),
+        ):
+            client.get(url)
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            results[name] = {'queries': len(queries), 'status': response.status_code}
+        return results
@@ -0,0 +1,99 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.rendering import PROFILES, get_templates
+from issue.benchmark import percentile, seed_small_tracker, summarize, temporary_database
+from issue.models import Project, Task
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер рендеринга страниц в профилях DJANGO_RENDER_PROFILE (core.rendering): время до первого непустого '
+        'блока тела (с Accept-Encoding: gzip), '
+        'полное время ответа и байты тела без сжатия и с Accept-Encoding: gzip'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='запросов на страницу')
+        parser.add_argument('--tasks', type=int, default=200, help='задач в тестовой базе')
+        parser.add_argument('--cold', action='store_true', help='очищать кэш перед каждым запросом')
+        parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            user = seed_small_tracker(options['tasks'])
+            task_pk = Task.objects.values_list('pk', flat=True).first()
+            project_pk = Project.objects.values_list('pk', flat=True).first()
+            pages = {
+                'task_list': reverse('task_list'),
+                'project_detail': reverse('project_detail', kwargs={'pk': project_pk}),
+                'project_list': reverse('project_list'),
+                'task_detail': reverse('task_detail', kwargs={'pk': task_pk}),
+                'api_task_list': reverse('api_task_list'),
+            }
+            results = {}
+            for profile in PROFILES:
+                production = profile == 'production'
+                with override_settings(
+                    TEMPLATES=get_templates(settings.TEMPLATES, profile),
+                    STREAMING_TEMPLATES=production, RESPONSE_COMPRESSION=production,
+                ):
+                    # промежуточные слои загружаются клиентом при первом запросе, уже с настройками профиля
+                    client = Client()
+                    client.force_login(user)
+                    for page, url in pages.items():
+                        results.setdefault(page, {})[profile] = self.measure(client, url, options)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for page, profiles in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(page))
+            for profile, summary in profiles.items():
+                self.stdout.write(
+                    f'  {profile:10} first byte p50 {summary["first_byte_p50_ms"]:>8} ms  '
+                    f'p50 {summary["p50_ms"]:>8} ms  p90 {summary["p90_ms"]:>8} ms  '
+                    f'{summary["bytes"]:>7} B, gzip {summary["wire_bytes"]:>7} B'
+                )
+
+    def request(self, client, url, **headers):
+        '''(время до первого непустого блока тела, полное время, тело). У обычного ответа тело готово,
+        когда client.get вернул ответ; у потоковой страницы оно рендерится во время чтения'''
+        started = time.perf_counter()
+        response = client.get(url, **headers)
+        if not response.streaming:
+            first_byte = time.perf_counter() - started
+            return first_byte * 1000, first_byte * 1000, response.content
+        first_byte = None
+        chunks = []
+        for chunk in response.streaming_content:
+            if chunk and first_byte is None:
+                first_byte = time.perf_counter() - started
+            chunks.append(chunk)
+        total = time.perf_counter() - started
+        return (total if first_byte is None else first_byte) * 1000, total * 1000, b''.join(chunks)
+
+    def measure(self, client, url, options) -> dict:
+        '''первый запрос прогревает кэш и шаблоны, размер без сжатия - отдельным запросом'''
+        self.request(client, url)
+        first_bytes, timings = [], []
+        wire_bytes = None
+        for _ in range(options['requests']):
+            if options['cold']:
+                cache.clear()
+            first_byte, total, body = self.request(client, url, HTTP_ACCEPT_ENCODING='gzip')
+            first_bytes.append(first_byte)
+            timings.append(total)
+            wire_bytes = len(body)
+        summary = summarize(timings)
+        summary.update({
+            'first_byte_p50_ms': round(percentile(first_bytes, 50), 3),
+            'bytes': len(self.request(client, url)[2]),
+            'wire_bytes': wire_bytes,
+        })
+        return summary
@@ -0,0 +1,95 @@
+import datetime
+import json
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from core.db import get_databases
+from issue.benchmark import summarize
+from issue.models import Project, Status, Task, Type
+
+
+ALIAS = 'writers'
+
+
+def write_tasks(args) -> dict:
+    '''рабочий процесс: чтение проекта и запись задачи со счётчиком в одной транзакции,
+    как при сохранении формы; ошибки блокировки считаются, а не повторяются'''
+    project_pk, status_pk, type_pk, operations = args
+    timings, locked = [], 0
+    for number in range(operations):
+        started = time.perf_counter()
+        try:
+            with transaction.atomic(using=ALIAS):
+                project = Project.objects.using(ALIAS).only('pk').get(pk=project_pk)
+                Task.objects.using(ALIAS).bulk_create([Task(
+                    summary=f'Task {number}', description='text', status_id=status_pk, type_id=type_pk,
+                    project=project,
+                )])
+                Project.objects.using(ALIAS).filter(pk=project_pk).update(tasks_total=F('tasks_total') + 1)
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+            continue
+        timings.append((time.perf_counter() - started) * 1000)
+    connections[ALIAS].close()
+    return {'timings': timings, 'locked': locked}
+
+
+class Command(BaseCommand):
+    help = (
+        'Параллельная запись в SQLite из нескольких процессов: профиль sqlite (по умолчанию) '
+        'против sqlite-wal, число ошибок "database is locked" и время транзакций'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8, help='пишущих процессов')
+        parser.add_argument('--operations', type=int, default=200, help='транзакций на процесс')
+        parser.add_argument('--profiles', nargs='*', default=['sqlite', 'sqlite-wal'])
+        parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        results = {}
+        for profile in options['profiles']:
+            with tempfile.TemporaryDirectory() as directory:
+                results[profile] = self.run_profile(profile, Path(directory) / 'writers.sqlite3', options)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for profile, summary in results.items():
+            self.stdout.write(
+                f'{profile:12} locked {summary["locked"]:>5}  committed {summary["requests"]:>6}  '
+                f'{summary["throughput_rps"]} tx/s  p50 {summary["p50_ms"]} ms  p99 {summary["p99_ms"]} ms'
+            )
+
+    def run_profile(self, profile, path, options) -> dict:
+        database = get_databases(settings.BASE_DIR, {'DJANGO_DB_PROFILE': profile, 'DJANGO_DB_NAME': str(path)})
+        connections.databases[ALIAS] = {**connections.databases['default'], 'OPTIONS': {}, **database['default']}
+        try:
+            call_command('migrate', database=ALIAS, verbosity=0)
+            project = Project.objects.using(ALIAS).create(name='Writers', start_date=datetime.date.today())
+            status = Status.objects.using(ALIAS).create(name='New')
+            task_type = Type.objects.using(ALIAS).create(name='Task')
+            # процессы создаются fork, открытые соединения не должны достаться им по наследству
+            connections.close_all()
+            jobs = [(project.pk, status.pk, task_type.pk, options['operations'])] * options['processes']
+            started = time.perf_counter()
+            with multiprocessing.get_context('fork').Pool(options['processes']) as pool:
+                workers = pool.map(write_tasks, jobs)
+            elapsed = time.perf_counter() - started
+            summary = summarize([timing for worker in workers for timing in worker['timings']], elapsed)
+            summary['locked'] = sum(worker['locked'] for worker in workers)
+            summary['tasks_total'] = Project.objects.using(ALIAS).get(pk=project.pk).tasks_total
+            return summary
+        finally:
+            connections[ALIAS].close()
+            del connections[ALIAS]
+            del connections.databases[ALIAS]
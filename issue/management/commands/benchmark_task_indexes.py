@@ -0,0 +1,129 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from issue.models import Project, Status, Task, Type
+
+
+ALIAS = 'benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную базу SQLite синтетическими задачами и сравнивает '
+        'EXPLAIN QUERY PLAN и время горячих запросов без индексов Task.Meta.indexes и с ними'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=1_000_000, help='количество задач')
+        parser.add_argument('--projects', type=int, default=100, help='количество проектов')
+        parser.add_argument('--deleted-ratio', type=float, default=0.1, help='доля удалённых задач')
+        parser.add_argument('--batch-size', type=int, default=50_000, help='размер пачки вставки')
+        parser.add_argument('--repeat', type=int, default=5, help='повторов каждого запроса')
+        parser.add_argument('--database', help='файл SQLite, по умолчанию временный и удаляется после замера')
+
+    def handle(self, *args, **options):
+        path = options['database'] or os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+        connections.databases[ALIAS] = dict(
+            connections.databases['default'], ENGINE='django.db.backends.sqlite3', NAME=path, OPTIONS={},
+        )
+        try:
+            call_command('migrate', database=ALIAS, verbosity=0)
+            if not Task.all_objects.using(ALIAS).exists():
+                self.seed(options)
+            connection = connections[ALIAS]
+            with connection.schema_editor() as editor:
+                for index in Task._meta.indexes:
+                    editor.remove_index(Task, index)
+            before = self.measure(options['repeat'])
+            with connection.schema_editor() as editor:
+                for index in Task._meta.indexes:
+                    editor.add_index(Task, index)
+            after = self.measure(options['repeat'])
+            self.report(before, after)
+        finally:
+            connections[ALIAS].close()
+            del connections.databases[ALIAS]
+            if not options['database']:
+                os.remove(path)
+
+    def seed(self, options):
+        '''массовая вставка сырыми executemany, сигналы и поисковый индекс не участвуют'''
+        connection = connections[ALIAS]
+        statuses = [Status.objects.using(ALIAS).create(name=name).pk for name in ('New', 'In Progress', 'Done')]
+        types = [Type.objects.using(ALIAS).create(name=name).pk for name in ('Task', 'Bug', 'Enhancement')]
+        Project.objects.using(ALIAS).bulk_create([
+            Project(name=f'Project {number}', start_date=timezone.now().date())
+            for number in range(options['projects'])
+        ])
+        projects = list(Project.objects.using(ALIAS).values_list('pk', flat=True))
+
+        start = timezone.now() - timedelta(days=3 * 365)
+        step = timedelta(days=3 * 365) / max(options['tasks'], 1)
+        adapt = connection.ops.adapt_datetimefield_value
+        sql = (
+            f'INSERT INTO {Task._meta.db_table} '
+            '(summary, description, status_id, type_id, is_deleted, created_at, updated_at, project_id) '
+            'VALUES (%s, %s, %s, %s, %s, %s, %s, %s)'
+        )
+        rng = random.Random(0)
+        for offset in range(0, options['tasks'], options['batch_size']):
+            rows = []
+            for number in range(offset, min(offset + options['batch_size'], options['tasks'])):
+                created_at = adapt(start + step * number)
+                rows.append((
+                    f'Task {number}', f'Description of task {number}',
+                    rng.choice(statuses), rng.choice(types), rng.random() < options['deleted_ratio'],
+                    created_at, created_at, rng.choice(projects),
+                ))
+            with transaction.atomic(using=ALIAS), connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+            self.stdout.write(f'seeded {offset + len(rows)} tasks')
+
+    def get_queries(self) -> dict:
+        tasks = Task.objects.using(ALIAS)
+        project_pk = Project.objects.using(ALIAS).values_list('pk', flat=True).first()
+        middle = tasks.order_by('-created_at', '-pk')[tasks.count() // 2]
+        return {
+            'task_list': tasks.for_list().order_by('-created_at', '-pk')[:20],
+            'task_list_cursor': tasks.for_list().filter(
+                Q(created_at__lt=middle.created_at) | Q(created_at=middle.created_at, pk__lt=middle.pk)
+            ).order_by('-created_at', '-pk')[:20],
+            'project_tasks': tasks.for_list().filter(project_id=project_pk).order_by('-created_at', '-pk')[:20],
+            'project_trash': Task.all_objects.using(ALIAS).filter(
+                project_id=project_pk, is_deleted=True
+            ).order_by('-created_at', '-pk')[:20],
+            'project_membership': Project.users.through.objects.using(ALIAS).filter(
+                project_id=project_pk, user_id=1
+            )[:1],
+        }
+
+    def measure(self, repeat) -> dict:
+        with connections[ALIAS].cursor() as cursor:
+            cursor.execute('ANALYZE')
+        results = {}
+        for name, queryset in self.get_queries().items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {'plan': queryset.explain(), 'median_ms': statistics.median(timings)}
+        return results
+
+    def report(self, before, after):
+        for name in before:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f'  без индексов: {before[name]["median_ms"]:.2f} ms')
+            self.stdout.write('    ' + before[name]['plan'].replace('\n', '\n    '))
+            self.stdout.write(f'  с индексами:  {after[name]["median_ms"]:.2f} ms')
+            self.stdout.write('    ' + after[name]['plan'].replace('\n', '\n    '))
@@ -0,0 +1,142 @@
+import json
+import time
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import accounts.urls
+import issue.urls
+from issue.benchmark import generate_tracker, summarize, temporary_database
+from issue.models import Project, Task
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер всех адресов issue/urls.py и accounts/urls.py на синтетических данных: '
+        'перцентили времени ответа и число запросов к базе, JSON для сравнения между коммитами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='запросов на адрес')
+        parser.add_argument('--projects', type=int, default=20)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--tasks', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--cold', action='store_true', help='очищать кэш перед каждым запросом')
+        parser.add_argument('--only', nargs='*', default=(), help='имена URL для замера')
+        parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+        parser.add_argument('--output', help='записать JSON в файл')
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            dataset = generate_tracker(
+                projects=options['projects'], users=options['users'], tasks=options['tasks'], seed=options['seed'],
+            )
+            cases = self.get_cases()
+            names = [pattern.name for pattern in issue.urls.urlpatterns + accounts.urls.urlpatterns]
+            results = {}
+            for name in names:
+                if name not in cases or (options['only'] and name not in options['only']):
+                    continue
+                results[name] = self.measure(name, *cases[name], options)
+        report = {
+            'dataset': dataset,
+            'options': {key: options[key] for key in ('requests', 'cold', 'seed')},
+            'results': results,
+            'not_measured': sorted(set(names) - set(cases)),
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2, sort_keys=True, ensure_ascii=False)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False))
+            return
+        for name, summary in results.items():
+            self.stdout.write(
+                f'{name:22} {summary["status"]} {summary["queries"]:>3} queries  '
+                f'p50 {summary["p50_ms"]:>8} ms  p90 {summary["p90_ms"]:>8} ms  p99 {summary["p99_ms"]:>8} ms'
+            )
+        if report['not_measured']:
+            self.stdout.write(self.style.WARNING(f'не замерены: {", ".join(report["not_measured"])}'))
+
+    def get_cases(self) -> dict:
+        '''имя URL -> (клиент, метод, kwargs, данные); изменяющие запросы подобраны так,
+        чтобы не менять данные между повторами (повторное добавление участника, импорт с ошибками)'''
+        project = Project.objects.order_by('pk').first()
+        member = project.users.order_by('pk').first()
+        outsider = User.objects.exclude(projects=project).order_by('pk').first()
+        task = Task.objects.filter(project=project).order_by('pk').first()
+        manager = User.objects.create_user('benchmark_manager')
+        manager.groups.add(Group.objects.get(name='Project Manager'))
+        project.users.add(manager)
+        client = Client()
+        client.force_login(manager)
+        anonymous = Client()
+        project_kwargs, task_kwargs = {'pk': project.pk}, {'pk': task.pk}
+        return {
+            'task_list': (client, 'get', {}, None),
+            'task_detail': (client, 'get', task_kwargs, None),
+            'task_update': (client, 'get', task_kwargs, None),
+            'task_delete': (client, 'get', task_kwargs, None),
+            'project_list': (client, 'get', {}, None),
+            'project_detail': (client, 'get', project_kwargs, None),
+            'project_tasks': (client, 'get', project_kwargs, None),
+            'project_board': (client, 'get', project_kwargs, None),
+            'project_trash': (client, 'get', project_kwargs, None),
+            'project_create': (client, 'get', {}, None),
+            'task_create': (client, 'get', project_kwargs, None),
+            'users_add': (client, 'post', project_kwargs, {'users': [member.pk]}),
+            'user_search': (client, 'get', project_kwargs, {'q': outsider.username[:4]}),
+            'user_delete': (client, 'post', {'project_pk': project.pk, 'user_pk': outsider.pk}, None),
+            'project_members': (client, 'post', project_kwargs, {'add': [member.pk]}),
+            'task_import': (client, 'post', project_kwargs, lambda: {
+                'file': SimpleUploadedFile('tasks.csv', b'summary,description,status,type\nTask,Text,Unknown,Bug\n'),
+            }),
+            'api_task_list': (client, 'get', {}, None),
+            'api_task_export': (client, 'get', {}, None),
+            'api_task_detail': (client, 'get', task_kwargs, None),
+            'api_project_list': (client, 'get', {}, None),
+            'api_project_detail': (client, 'get', project_kwargs, None),
+            'api_project_board_changes': (client, 'get', project_kwargs, {'since': task.updated_at.isoformat()}),
+            'api_project_analytics': (client, 'get', project_kwargs, None),
+            'async_task_list': (client, 'get', {}, None),
+            'async_task_detail': (client, 'get', task_kwargs, None),
+            'async_project_list': (client, 'get', {}, None),
+            'async_project_detail': (client, 'get', project_kwargs, None),
+            'login': (anonymous, 'get', {}, None),
+            'logout': (anonymous, 'get', {}, None),
+            'register': (anonymous, 'get', {}, None),
+        }
+
+    def request(self, client, method, url, data):
+        payload = data() if callable(data) else data
+        response = getattr(client, method)(url, payload or {})
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, name, client, method, kwargs, data, options) -> dict:
+        '''первый запрос прогревает кэш, число запросов к базе - по второму'''
+        url = reverse(name, kwargs=kwargs)
+        self.request(client, method, url, data)
+        timings = []
+        queries = status = None
+        for number in range(options['requests']):
+            if options['cold']:
+                cache.clear()
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = self.request(client, method, url, data)
+                timings.append((time.perf_counter() - started) * 1000)
+            if number == 0:
+                queries, status = len(captured), response.status_code
+        summary = summarize(timings)
+        summary.update({'method': method.upper(), 'path': url, 'status': status, 'queries': queries})
+        return summary
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from issue.benchmark import generate_tracker
+
+
+class Command(BaseCommand):
+    help = 'Синтетические проекты, пользователи и задачи массовыми вставками для замеров на больших данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=10)
+        parser.add_argument('--users', type=int, default=50, help='пользователи в группах PM/TL/Developer')
+        parser.add_argument('--tasks', type=int, default=1000)
+        parser.add_argument('--members', type=int, default=5, help='участников в каждом проекте')
+        parser.add_argument('--seed', type=int, default=0, help='одинаковый seed - одинаковые данные')
+        parser.add_argument('--password', default='password', help='пароль всех пользователей')
+        parser.add_argument('--prefix', default='user', help='префикс имён пользователей')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        result = generate_tracker(
+            projects=options['projects'], users=options['users'], tasks=options['tasks'],
+            members=options['members'], seed=options['seed'], password=options['password'],
+            prefix=options['prefix'], batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'создано: ' + ', '.join(f'{name} {count}' for name, count in result.items())
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from issue.importers import FORMATS, TaskImporter, TaskImportError, detect_format
+from issue.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Импорт задач в проект из CSV или NDJSON (поля summary, description, status, type)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project', type=int, help='id проекта')
+        parser.add_argument('path', help='путь к файлу')
+        parser.add_argument('--format', choices=FORMATS, help='по умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=500, help='строк в одном bulk_create')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options['project'])
+        except Project.DoesNotExist:
+            raise CommandError(f'Проект {options["project"]} не найден')
+        file_format = options['format'] or detect_format(options['path'])
+        importer = TaskImporter(project, batch_size=options['batch_size'])
+        try:
+            with open(options['path'], 'rb') as file:
+                result = importer.import_file(file, file_format)
+        except (OSError, TaskImportError) as error:
+            raise CommandError(str(error))
+        for error in result['errors']:
+            self.stderr.write(f'строка {error["line"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'создано задач: {result["created"]}, строк с ошибками: {result["failed"]}'
+        ))
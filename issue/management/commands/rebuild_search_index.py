@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from issue.models import Task
+from issue.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='размер пачки при индексации')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        count = backend.rebuild(Task._base_manager.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{backend.__class__.__name__}: проиндексировано задач - {count}'
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from issue import cache
+from issue.counters import recount
+from issue.jobs import enqueue
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков задач проектов по таблице задач (исправление расхождений)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('projects', nargs='*', type=int, help='id проектов, по умолчанию все')
+        parser.add_argument('--background', action='store_true', help='поставить пересчёт в очередь заданий')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            projects = sorted(options['projects'])
+            job = enqueue(
+                'recount_project_counters', {'projects': projects},
+                dedup_key=f'recount:{",".join(map(str, projects)) or "all"}',
+            )
+            self.stdout.write(self.style.SUCCESS(f'задание {job.pk}: {job.status}'))
+            return
+        changed = recount(options['projects'] or None)
+        if changed:
+            cache.bump_versions(cache.PROJECTS)
+        self.stdout.write(self.style.SUCCESS(f'исправлено проектов: {changed}'))
@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from issue.jobs import claim, execute, requeue_stale
+
+
+class Command(BaseCommand):
+    help = (
+        'Обработчик фоновой очереди заданий (issue.jobs): забирает готовые задания из таблицы '
+        'и выполняет их в пуле процессов, без внешнего брокера. Для нескольких процессов на SQLite '
+        'нужен профиль DJANGO_DB_PROFILE=sqlite-wal, иначе ошибки блокировки уходят в повторы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 1,
+            help='размер пула процессов, 0 - выполнять в текущем процессе',
+        )
+        parser.add_argument('--once', action='store_true', help='выполнить готовые задания и выйти')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL, help='секунд')
+
+    def handle(self, *args, **options):
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        try:
+            if options['processes'] > 0:
+                self.run_pool(options['processes'], options)
+            else:
+                self.run_inline(options)
+        except KeyboardInterrupt:
+            self.stdout.write('остановлено')
+
+    def report(self, job_pk, status):
+        self.stdout.write(f'задание {job_pk}: {status}')
+
+    def run_inline(self, options):
+        while True:
+            requeue_stale()
+            job_ids = claim(self.worker, 1)
+            for job_pk in job_ids:
+                self.report(job_pk, execute(job_pk))
+            if job_ids:
+                continue
+            if options['once']:
+                return
+            time.sleep(options['poll_interval'])
+
+    def run_pool(self, processes, options):
+        '''задания забираются по мере освобождения процессов, долгое задание не держит остальные'''
+        # процессы создаются fork, открытые соединения не должны достаться им по наследству
+        connections.close_all()
+        running = {}
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            while True:
+                for job_pk, result in list(running.items()):
+                    if result.ready():
+                        del running[job_pk]
+                        try:
+                            self.report(job_pk, result.get())
+                        except Exception as error:
+                            self.stderr.write(f'задание {job_pk}: {error}')
+                job_ids = []
+                if len(running) < processes:
+                    requeue_stale()
+                    job_ids = claim(self.worker, processes - len(running))
+                for job_pk in job_ids:
+                    running[job_pk] = pool.apply_async(execute, (job_pk,))
+                if options['once'] and not running and not job_ids:
+                    return
+                if not job_ids:
+                    time.sleep(options['poll_interval'] if not running else min(options['poll_interval'], 0.1))
@@ -0,0 +1,42 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from issue import analytics
+
+
+def parse_day(value) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Ожидается дата ГГГГ-ММ-ДД: {value}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Дневные итоги аналитики проектов: по умолчанию добавляет события после водяной отметки '
+        '(запускать по расписанию), --recompute пересчитывает период целиком'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='событий в одной транзакции')
+        parser.add_argument('--recompute', action='store_true', help='пересчитать итоги за период')
+        parser.add_argument('--projects', nargs='*', type=int, default=(), help='id проектов для --recompute')
+        parser.add_argument('--start', type=parse_day, help='первый день для --recompute')
+        parser.add_argument('--end', type=parse_day, help='последний день для --recompute')
+        parser.add_argument('--numpy', action='store_true', help='сводить события для --recompute на NumPy')
+
+    def handle(self, *args, **options):
+        if options['numpy'] and analytics.numpy is None:
+            raise CommandError('NumPy не установлен')
+        started = time.perf_counter()
+        processed = analytics.update_rollups(batch_size=options['batch_size'])
+        self.stdout.write(f'учтено событий: {processed}')
+        if options['recompute']:
+            rows = analytics.recompute_rollups(
+                list(options['projects']), options['start'], options['end'], vectorised=options['numpy'],
+            )
+            engine = 'numpy' if options['numpy'] else 'python'
+            self.stdout.write(f'пересчитано строк итогов: {rows} ({engine})')
+        self.stdout.write(self.style.SUCCESS(f'готово за {time.perf_counter() - started:.2f} с'))
@@ -0,0 +1,77 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from issue.models import Project
+
+
+# сколько пользователей отдаёт поиск для добавления в проект
+USER_SEARCH_LIMIT = 10
+USER_SEARCH_MAX_LIMIT = 50
+
+
+class MembershipError(ValueError):
+    '''некорректный список пользователей'''
+
+
+def parse_user_ids(values) -> set[int]:
+    '''приводит переданные id к int, ошибка если хотя бы один не число'''
+    if values is None:
+        return set()
+    if isinstance(values, (str, int)):
+        values = [values]
+    try:
+        return {int(value) for value in values}
+    except (TypeError, ValueError):
+        raise MembershipError('id пользователей должны быть целыми числами')
+
+
+def update_members(project: Project, add=(), remove=(), replace=None) -> dict:
+    '''массовое изменение участников проекта за несколько запросов независимо от числа пользователей:
+    проверка всех id одним SELECT, вставка одним INSERT и удаление одним DELETE в транзакции.
+    replace - полный новый состав, применяется как разница с текущим.
+    Изменения идут через project.users, поэтому m2m_changed (кэш прав) срабатывает как обычно'''
+    add, remove = parse_user_ids(add), parse_user_ids(remove)
+    replace = parse_user_ids(replace) if replace is not None else None
+    requested = add | (replace or set())
+    valid = set(User.objects.filter(pk__in=requested).values_list('pk', flat=True)) if requested else set()
+    invalid = requested - valid
+
+    with transaction.atomic():
+        current = set(Project.users.through.objects.filter(project=project).values_list('user_id', flat=True))
+        if replace is not None:
+            to_add = (replace & valid) - current
+            to_remove = current - replace
+        else:
+            to_add = (add & valid) - current
+            to_remove = remove & current
+        if to_add:
+            project.users.add(*to_add)
+        if to_remove:
+            project.users.remove(*to_remove)
+
+    return {
+        'project': project.pk,
+        'added': sorted(to_add),
+        'removed': sorted(to_remove),
+        'invalid': sorted(invalid),
+        'members': len((current | to_add) - to_remove),
+    }
+
+
+def search_users(query: str, project_pk=None, limit=USER_SEARCH_LIMIT) -> list[dict]:
+    '''пользователи, у которых логин, имя или фамилия начинается с query (без учёта регистра),
+    кроме участников проекта project_pk; не больше limit строк по логину.
+    Каждое условие идёт по префиксному индексу из миграции 0012, поэтому
+    стоимость запроса не зависит от числа пользователей'''
+    query = query.strip()
+    queryset = User.objects.filter(is_active=True)
+    if query:
+        queryset = queryset.filter(
+            Q(username__istartswith=query) | Q(first_name__istartswith=query) | Q(last_name__istartswith=query)
+        )
+    if project_pk is not None:
+        members = Project.users.through.objects.filter(project_id=project_pk, user_id=OuterRef('pk'))
+        queryset = queryset.exclude(Exists(members))
+    limit = max(1, min(limit, USER_SEARCH_MAX_LIMIT))
+    return list(queryset.order_by('username').values('id', 'username', 'first_name', 'last_name')[:limit])
@@ -0,0 +1,41 @@
+# Generated by Django 4.1.2 on 2026-10-18 08:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    '''виртуальная таблица FTS5 для поиска задач, только для SQLite'''
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS issue_task_fts "
+        "USING fts5(summary, description, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO issue_task_fts (rowid, summary, description) "
+        "SELECT id, summary, COALESCE(description, '') FROM issue_task"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS issue_task_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('issue', '0006_project_users'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='project',
+            name='users',
+            field=models.ManyToManyField(blank=True, null=True, related_name='projects', to=settings.AUTH_USER_MODEL, verbose_name='Пользователи'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
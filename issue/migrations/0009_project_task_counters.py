@@ -0,0 +1,71 @@
+# Generated by Django 4.1.2 on 2026-10-18 08:19
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    '''начальные значения счётчиков по существующим задачам'''
+    alias = schema_editor.connection.alias
+    Project = apps.get_model('issue', 'Project')
+    Task = apps.get_model('issue', 'Task')
+    rows = Task.objects.using(alias).values('project_id').annotate(
+        total=Count('pk', filter=Q(is_deleted=False)), deleted=Count('pk', filter=Q(is_deleted=True))
+    )
+    for row in rows:
+        Project.objects.using(alias).filter(pk=row['project_id']).update(tasks_total=row['total'], tasks_deleted=row['deleted'])
+    live = Task.objects.using(alias).filter(is_deleted=False).order_by()
+    for model_name, field in (('ProjectStatusCounter', 'status_id'), ('ProjectTypeCounter', 'type_id')):
+        model = apps.get_model('issue', model_name)
+        model.objects.using(alias).bulk_create([
+            model(project_id=row['project_id'], count=row['count'], **{field: row[field]})
+            for row in live.values('project_id', field).annotate(count=Count('pk'))
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0008_task_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='tasks_deleted',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Удалённых задач'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='tasks_total',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Задач'),
+        ),
+        migrations.CreateModel(
+            name='ProjectTypeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='type_counters', to='issue.project')),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='issue.type')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProjectStatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_counters', to='issue.project')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='issue.status')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='projecttypecounter',
+            constraint=models.UniqueConstraint(fields=('project', 'type'), name='project_type_counter_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='projectstatuscounter',
+            constraint=models.UniqueConstraint(fields=('project', 'status'), name='project_status_counter_unique'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
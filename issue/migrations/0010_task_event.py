@@ -0,0 +1,32 @@
+# Generated by Django 4.1.2 on 2026-10-18 08:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('issue', '0009_project_task_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('created', 'Создана'), ('updated', 'Изменена'), ('status', 'Смена статуса'), ('deleted', 'Удалена'), ('restored', 'Восстановлена')], max_length=10, verbose_name='Событие')),
+                ('changes', models.JSONField(default=dict, verbose_name='Изменения')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='issue.task', verbose_name='Задача')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='taskevent',
+            index=models.Index(fields=['task', '-created_at', '-id'], name='task_event_timeline_idx'),
+        ),
+    ]
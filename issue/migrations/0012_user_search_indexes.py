@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import migrations
+
+
+# поля auth_user, по началу которых ищутся пользователи (issue.membership.search_users)
+USER_SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def create_user_search_indexes(apps, schema_editor):
+    '''индексы под поиск по префиксу без учёта регистра (istartswith):
+    в SQLite LIKE 'abc%' идёт по индексу с COLLATE NOCASE,
+    в PostgreSQL UPPER(поле) LIKE UPPER('abc%') - по индексу text_pattern_ops'''
+    vendor = schema_editor.connection.vendor
+    for field in USER_SEARCH_FIELDS:
+        if vendor == 'sqlite':
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS auth_user_{field}_prefix_idx ON auth_user ({field} COLLATE NOCASE)'
+            )
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS auth_user_{field}_prefix_idx '
+                f'ON auth_user (UPPER({field}::text) text_pattern_ops)'
+            )
+
+
+def drop_user_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    for field in USER_SEARCH_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS auth_user_{field}_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('issue', '0011_task_project_updated_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_user_search_indexes, drop_user_search_indexes),
+    ]
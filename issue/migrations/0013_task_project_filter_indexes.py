@@ -0,0 +1,21 @@
+# Generated by Django 4.1.2 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0012_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['project', 'status', '-created_at', '-id'], name='task_project_status_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['project', 'type', '-created_at', '-id'], name='task_project_type_live_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.2 on 2026-10-18 08:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0014_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProjectDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День')),
+                ('created', models.IntegerField(default=0, verbose_name='Создано')),
+                ('closed', models.IntegerField(default=0, verbose_name='Закрыто')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='issue.project')),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='issue.type')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='projectdailystats',
+            constraint=models.UniqueConstraint(fields=('project', 'date', 'type'), name='project_daily_stats_unique'),
+        ),
+    ]
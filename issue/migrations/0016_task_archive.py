@@ -0,0 +1,68 @@
+# Generated by Django 4.1.2 on 2026-10-18 08:43
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_deleted_at(apps, schema_editor):
+    '''удалённым раньше задачам время удаления неизвестно, берётся время последнего изменения'''
+    Task = apps.get_model('issue', 'Task')
+    Task.objects.filter(is_deleted=True, deleted_at__isnull=True).update(deleted_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0015_project_daily_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('summary', models.CharField(max_length=200, verbose_name='Заголовок')),
+                ('description', models.TextField(null=True, verbose_name='Описание')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата изменения')),
+                ('deleted_at', models.DateTimeField(verbose_name='Дата удаления')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата переноса в архив')),
+                ('events', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='История')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата удаления'),
+        ),
+        migrations.RunPython(fill_deleted_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['project', '-deleted_at', '-id'], name='task_project_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='task_deleted_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='archived_tasks', to='issue.project', verbose_name='Проект'),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='status',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='issue.status', verbose_name='Статус'),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='issue.type', verbose_name='Тип'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtask',
+            index=models.Index(fields=['project', '-deleted_at'], name='archived_task_project_idx'),
+        ),
+    ]
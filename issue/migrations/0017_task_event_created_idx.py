@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0016_task_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taskevent',
+            index=models.Index(fields=['created_at'], name='task_event_created_idx'),
+        ),
+    ]
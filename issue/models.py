@@ -1,6 +1,11 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
+from django.db.models import Prefetch
 from django.contrib.auth.models import User
 
+from issue.reference import ReferenceIterable
+
 
 class Status(models.Model):
     name = models.CharField(verbose_name='Название', max_length=50, null=False)
@@ -16,16 +21,107 @@ class Type(models.Model):
         return self.name
 
 
+class ReferenceQuerySet(models.QuerySet):
+
+    def with_reference(self):
+        '''статус и тип подставляются из справочников в памяти (issue.reference)'''
+        clone = self._chain()
+        clone._iterable_class = ReferenceIterable
+        return clone
+
+
+class ProjectQuerySet(models.QuerySet):
+    '''наборы полей проекта под конкретные шаблоны'''
+
+    def for_list(self):
+        '''project_list.html: название и счётчики задач, по статусам - одним запросом без агрегатов'''
+        return self.only('name', 'tasks_total', 'tasks_deleted').prefetch_related(
+            Prefetch(
+                'status_counters',
+                queryset=ProjectStatusCounter.objects.filter(count__gt=0).order_by('status_id').with_reference(),
+            )
+        )
+
+    def for_detail(self):
+        '''проект с задачами (статус, тип) и участниками, подгружаются двумя запросами'''
+        return self.prefetch_related(
+            Prefetch('tasks', queryset=Task.objects.for_list().order_by('-created_at', '-pk')),
+            Prefetch('users', queryset=User.objects.only('username').order_by('username')),
+        )
+
+
 class Project(models.Model):
     name = models.CharField(verbose_name='Название проекта', max_length=50, null=False)
     description = models.TextField(verbose_name='Описание', null=True)
     start_date = models.DateField(verbose_name='Дата начала', null=False)
     end_date = models.DateField(verbose_name='Дата окончания', null=True)
     users = models.ManyToManyField(to=User, verbose_name='Пользователи', blank=True, related_name='projects', null=True)
+    # счётчики задач, обновляются в issue.counters вместе с сохранением задачи
+    tasks_total = models.IntegerField(verbose_name='Задач', default=0, editable=False)
+    tasks_deleted = models.IntegerField(verbose_name='Удалённых задач', default=0, editable=False)
+
+    objects = ProjectQuerySet.as_manager()
+
+    counter_fields = ('tasks_total', 'tasks_deleted')
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        '''счётчики меняются только через F-выражения, сохранение проекта из формы
+        не должно перезаписать их значениями, загруженными раньше'''
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class ProjectStatusCounter(models.Model):
+    '''число неудалённых задач проекта в статусе'''
+    project = models.ForeignKey(to='issue.Project', related_name='status_counters', on_delete=models.CASCADE)
+    status = models.ForeignKey(to='issue.Status', related_name='+', on_delete=models.CASCADE)
+    count = models.IntegerField(default=0)
+
+    objects = ReferenceQuerySet.as_manager()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['project', 'status'], name='project_status_counter_unique')]
+
+
+class ProjectTypeCounter(models.Model):
+    '''число неудалённых задач проекта по типу'''
+    project = models.ForeignKey(to='issue.Project', related_name='type_counters', on_delete=models.CASCADE)
+    type = models.ForeignKey(to='issue.Type', related_name='+', on_delete=models.CASCADE)
+    count = models.IntegerField(default=0)
+
+    objects = ReferenceQuerySet.as_manager()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['project', 'type'], name='project_type_counter_unique')]
+
+
+class TaskQuerySet(ReferenceQuerySet):
+    '''наборы полей задачи под конкретные шаблоны'''
+
+    def for_list(self):
+        '''task_list.html и список задач проекта: статус и тип без JOIN, из справочников'''
+        return self.only(
+            'summary', 'description', 'created_at', 'updated_at', 'project_id', 'status_id', 'type_id'
+        ).with_reference()
+
+    def for_detail(self):
+        '''task_detail.html и формы задачи'''
+        return self.select_related('project').with_reference()
+
+
+class TaskManager(models.Manager.from_queryset(TaskQuerySet)):
+    '''менеджер по умолчанию: удалённые задачи не попадают ни в один список'''
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
 
 class Task(models.Model):
     summary = models.CharField(verbose_name='Заголовок', max_length=200, null=False)
@@ -35,7 +131,205 @@ class Task(models.Model):
     is_deleted = models.BooleanField(verbose_name='Удалено', default=False, null=False)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+    # заполняется в save при мягком удалении, по нему задача уходит в архив (issue.archive)
+    deleted_at = models.DateTimeField(verbose_name='Дата удаления', null=True, blank=True, editable=False)
     project = models.ForeignKey(to='issue.Project', verbose_name='Проект', related_name='tasks', on_delete=models.RESTRICT)
 
+    objects = TaskManager()
+    all_objects = TaskQuerySet.as_manager()
+
+    # поля, исходные значения которых нужны сигналам после сохранения (см. from_db):
+    # счётчики проекта и история изменений (TaskEvent)
+    tracked_fields = ('summary', 'description', 'project_id', 'status_id', 'type_id', 'is_deleted')
+
+    class Meta:
+        # частичные индексы по живым задачам: условие совпадает с фильтром TaskManager
+        # (NOT is_deleted), сортировка совпадает с пагинацией по (created_at, id)
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(is_deleted=False), name='task_live_created_idx'
+            ),
+            models.Index(
+                fields=['project', '-created_at', '-id'], condition=models.Q(is_deleted=False),
+                name='task_project_live_created_idx',
+            ),
+            # задачи проекта с фильтром по статусу или типу (ProjectTaskListView)
+            models.Index(
+                fields=['project', 'status', '-created_at', '-id'], condition=models.Q(is_deleted=False),
+                name='task_project_status_live_idx',
+            ),
+            models.Index(
+                fields=['project', 'type', '-created_at', '-id'], condition=models.Q(is_deleted=False),
+                name='task_project_type_live_idx',
+            ),
+            # изменения для доски проекта, вместе с удалёнными задачами
+            models.Index(fields=['project', 'updated_at'], name='task_project_updated_idx'),
+            # корзина проекта и выборка задач для архива, только по удалённым
+            models.Index(
+                fields=['project', '-deleted_at', '-id'], condition=models.Q(is_deleted=True),
+                name='task_project_trash_idx',
+            ),
+            models.Index(fields=['deleted_at'], condition=models.Q(is_deleted=True), name='task_deleted_at_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return self.summary
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        '''запоминает значения tracked_fields, загруженные из базы'''
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: instance.__dict__[name] for name in cls.tracked_fields if name in instance.__dict__
+        }
+        return instance
+
+    def get_loaded_value(self, name):
+        '''значение поля до изменений, None для новой задачи'''
+        return getattr(self, '_loaded_values', {}).get(name)
+
+    def save(self, *args, **kwargs):
+        '''задача и счётчики проекта (сигнал post_save) в одной транзакции.
+        deleted_at следует за is_deleted: время удаления, при восстановлении - None'''
+        deleted_at = self.deleted_at
+        if not self.is_deleted:
+            self.deleted_at = None
+        elif self.deleted_at is None:
+            self.deleted_at = timezone.now()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.deleted_at != deleted_at:
+            kwargs['update_fields'] = {*update_fields, 'deleted_at'}
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+        self._loaded_values = {name: self.__dict__[name] for name in self.tracked_fields if name in self.__dict__}
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
+
+class ArchivedTask(models.Model):
+    '''задача, удалённая дольше TASK_ARCHIVE_RETENTION_DAYS, перенесена из Task вместе с историей
+    (issue.archive). id совпадает с id задачи, events - записи TaskEvent от старых к новым'''
+    id = models.BigIntegerField(primary_key=True)
+    summary = models.CharField(verbose_name='Заголовок', max_length=200)
+    description = models.TextField(verbose_name='Описание', null=True)
+    status = models.ForeignKey(to='issue.Status', verbose_name='Статус', related_name='+', on_delete=models.RESTRICT)
+    type = models.ForeignKey(to='issue.Type', verbose_name='Тип', related_name='+', on_delete=models.RESTRICT)
+    project = models.ForeignKey(
+        to='issue.Project', verbose_name='Проект', related_name='archived_tasks', on_delete=models.RESTRICT
+    )
+    created_at = models.DateTimeField(verbose_name='Дата создания')
+    updated_at = models.DateTimeField(verbose_name='Дата изменения')
+    deleted_at = models.DateTimeField(verbose_name='Дата удаления')
+    archived_at = models.DateTimeField(verbose_name='Дата переноса в архив', default=timezone.now)
+    events = models.JSONField(verbose_name='История', default=list, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        indexes = [models.Index(fields=['project', '-deleted_at'], name='archived_task_project_idx')]
+
     def __str__(self) -> str:
         return self.summary
+
+
+class TaskEvent(models.Model):
+    '''запись истории задачи, только добавляется.
+    changes - {"поле": [было, стало]}, для внешних ключей - id; при смене статуса ещё
+    context - {"project": id, "type": id} задачи на момент изменения'''
+    CREATED = 'created'
+    UPDATED = 'updated'
+    STATUS = 'status'
+    DELETED = 'deleted'
+    RESTORED = 'restored'
+    KIND_CHOICES = [
+        (CREATED, 'Создана'),
+        (UPDATED, 'Изменена'),
+        (STATUS, 'Смена статуса'),
+        (DELETED, 'Удалена'),
+        (RESTORED, 'Восстановлена'),
+    ]
+
+    task = models.ForeignKey(to='issue.Task', verbose_name='Задача', related_name='events', on_delete=models.CASCADE)
+    kind = models.CharField(verbose_name='Событие', max_length=10, choices=KIND_CHOICES)
+    changes = models.JSONField(verbose_name='Изменения', default=dict)
+    user = models.ForeignKey(
+        to=User, verbose_name='Пользователь', related_name='+', null=True, blank=True, on_delete=models.SET_NULL
+    )
+    created_at = models.DateTimeField(verbose_name='Время', default=timezone.now)
+
+    class Meta:
+        # лента задачи читается по ключу (created_at, id) от новых к старым;
+        # task_event_created_idx - события за период без задачи: переносы для доски (issue.board)
+        indexes = [
+            models.Index(fields=['task', '-created_at', '-id'], name='task_event_timeline_idx'),
+            models.Index(fields=['created_at'], name='task_event_created_idx'),
+        ]
+
+
+class Job(models.Model):
+    '''задание фоновой очереди (issue.jobs), выполняется командой manage.py run_jobs.
+    dedup_key - одно незавершённое задание на ключ: повторная постановка вернёт существующее'''
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнено'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(verbose_name='Задание', max_length=100)
+    payload = models.JSONField(verbose_name='Параметры', default=dict)
+    status = models.CharField(verbose_name='Состояние', max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    dedup_key = models.CharField(verbose_name='Ключ дедупликации', max_length=200, null=True, blank=True)
+    attempts = models.PositiveIntegerField(verbose_name='Попыток', default=0)
+    max_attempts = models.PositiveIntegerField(verbose_name='Наибольшее число попыток', default=3)
+    result = models.JSONField(verbose_name='Результат', null=True, blank=True)
+    error = models.TextField(verbose_name='Ошибка', blank=True, default='')
+    user = models.ForeignKey(
+        to=User, verbose_name='Пользователь', related_name='+', null=True, blank=True, on_delete=models.SET_NULL
+    )
+    worker = models.CharField(verbose_name='Обработчик', max_length=100, blank=True, default='')
+    run_at = models.DateTimeField(verbose_name='Запуск не раньше', default=timezone.now)
+    created_at = models.DateTimeField(verbose_name='Дата создания', auto_now_add=True)
+    started_at = models.DateTimeField(verbose_name='Начало', null=True, blank=True)
+    finished_at = models.DateTimeField(verbose_name='Окончание', null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'], condition=models.Q(status__in=['queued', 'running']), name='job_active_dedup_key',
+            ),
+        ]
+        indexes = [
+            # выборка готовых к запуску заданий обработчиком
+            models.Index(fields=['run_at', 'id'], condition=models.Q(status='queued'), name='job_queued_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name} #{self.pk}'
+
+
+class ProjectDailyStats(models.Model):
+    '''дневные итоги по проекту и типу задачи для аналитики (issue.analytics):
+    created - создано задач, closed - переведено в закрытый статус (ANALYTICS_CLOSED_STATUSES)'''
+    project = models.ForeignKey(to='issue.Project', related_name='+', on_delete=models.CASCADE)
+    type = models.ForeignKey(to='issue.Type', related_name='+', on_delete=models.CASCADE)
+    date = models.DateField(verbose_name='День')
+    created = models.IntegerField(verbose_name='Создано', default=0)
+    closed = models.IntegerField(verbose_name='Закрыто', default=0)
+
+    class Meta:
+        # запросы аналитики - диапазон дней одного проекта
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'date', 'type'], name='project_daily_stats_unique'),
+        ]
+
+
+class RollupState(models.Model):
+    '''водяная отметка свёртки: id последнего учтённого события TaskEvent'''
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,152 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+
+class CursorPage:
+    '''страница курсорной пагинации, без номера страницы и общего количества'''
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    '''keyset-пагинация по (created_at, id) от новых к старым.
+    Страница выбирается условием WHERE по ключу последней строки, поэтому
+    не нужны COUNT(*) и OFFSET, и любая страница стоит одинаково'''
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self, queryset, per_page, field='created_at'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    def encode(self, obj, direction) -> str:
+        '''obj - модель или словарь из values() с ключами field и id'''
+        if isinstance(obj, dict):
+            value, pk = obj[self.field], obj['id']
+        else:
+            value, pk = getattr(obj, self.field), obj.pk
+        data = json.dumps([value.isoformat(), pk, direction], separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode(self, cursor: str):
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            value, pk, direction = json.loads(data)
+            value = parse_datetime(value)
+        except (binascii.Error, ValueError, TypeError):
+            raise Http404('Некорректный курсор')
+        if value is None or not isinstance(pk, int) or direction not in (self.NEXT, self.PREVIOUS):
+            raise Http404('Некорректный курсор')
+        return value, pk, direction
+
+    def get_rows_queryset(self, cursor: str | None):
+        '''запрос страницы на page_size + 1 строк и направление'''
+        field = self.field
+        if not cursor:
+            return self.queryset.order_by(f'-{field}', '-pk')[:self.per_page + 1], None
+        value, pk, direction = self.decode(cursor)
+        if direction == self.NEXT:
+            queryset = self.queryset.filter(
+                Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+            ).order_by(f'-{field}', '-pk')
+        else:
+            queryset = self.queryset.filter(
+                Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+            ).order_by(field, 'pk')
+        return queryset[:self.per_page + 1], direction
+
+    def build_page(self, rows: list, direction) -> CursorPage:
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction is None:
+            return CursorPage(rows, self, next_cursor=self.encode(rows[-1], self.NEXT) if has_more else None)
+        if direction == self.NEXT:
+            next_cursor = self.encode(rows[-1], self.NEXT) if has_more else None
+            previous_cursor = self.encode(rows[0], self.PREVIOUS) if rows else None
+        else:
+            rows = rows[::-1]
+            previous_cursor = self.encode(rows[0], self.PREVIOUS) if has_more else None
+            next_cursor = self.encode(rows[-1], self.NEXT) if rows else None
+        return CursorPage(rows, self, next_cursor=next_cursor, previous_cursor=previous_cursor)
+
+    def page(self, cursor: str | None = None) -> CursorPage:
+        queryset, direction = self.get_rows_queryset(cursor)
+        return self.build_page(list(queryset), direction)
+
+    async def apage(self, cursor: str | None = None) -> CursorPage:
+        '''то же, что page(), через асинхронный ORM'''
+        queryset, direction = self.get_rows_queryset(cursor)
+        return self.build_page([row async for row in queryset], direction)
+
+
+class CursorPaginationMixin:
+    '''для ListView: курсорная пагинация вместо номеров страниц.
+    Включается настройкой pagination_mode = 'cursor' или параметром ?pagination=cursor,
+    размер страницы - параметр page_size, не больше max_page_size, ключ - (cursor_field, id)'''
+    pagination_mode = 'offset'
+    cursor_kwarg = 'cursor'
+    cursor_field = 'created_at'
+    max_page_size = 100
+
+    def get_pagination_mode(self) -> str:
+        return self.pagination_mode
+
+    def is_cursor_pagination(self) -> bool:
+        return self.request.GET.get('pagination', self.get_pagination_mode()) == 'cursor'
+
+    def get_paginate_by(self, queryset):
+        return self.get_page_size(super().get_paginate_by(queryset))
+
+    def get_page_size(self, default):
+        '''размер страницы: для курсорных страниц - ?page_size, не больше max_page_size'''
+        if not self.is_cursor_pagination():
+            return default
+        try:
+            page_size = int(self.request.GET.get('page_size', default))
+        except ValueError:
+            page_size = default
+        return max(1, min(page_size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.is_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size, self.cursor_field)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        '''query - параметры запроса без страницы/курсора для ссылок пагинации'''
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.copy()
+        for key in (self.page_kwarg, self.cursor_kwarg):
+            query.pop(key, None)
+        if self.is_cursor_pagination():
+            query['pagination'] = 'cursor'
+        context['query'] = query.urlencode()
+        context['cursor_pagination'] = self.is_cursor_pagination()
+        return context
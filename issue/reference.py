@@ -0,0 +1,125 @@
+import threading
+
+from django import forms
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db.models import Value
+from django.db.models.query import ModelIterable
+from django.forms.models import ModelChoiceIterator
+
+from issue.cache import REFERENCE, get_versions
+
+
+# маленькие справочники, которые почти не меняются
+REFERENCE_MODELS = ('issue.Status', 'issue.Type')
+
+
+class ReferenceCache:
+    '''справочники в памяти процесса: загружаются одним запросом и живут до смены
+    версии REFERENCE в кэше (её сдвигает сигнал при изменении статуса или типа,
+    в том числе из админки), поэтому другие процессы перечитывают их при следующем обращении -
+    если кэш default общий для процессов (DJANGO_CACHE_BACKEND, core/caches.py).
+    Объекты общие для всех запросов - только для чтения'''
+
+    def __init__(self, model_labels=REFERENCE_MODELS):
+        self.model_labels = model_labels
+        self.version = None
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get_models(self) -> list:
+        return [apps.get_model(label) for label in self.model_labels]
+
+    def is_reference(self, model) -> bool:
+        return model._meta.label in self.model_labels
+
+    def load(self) -> dict:
+        '''все справочники одним UNION-запросом, в каждом - порядок по pk'''
+        models = self.get_models()
+        queries = [
+            model._default_manager.annotate(reference=Value(model._meta.label)).values_list('reference', 'pk', 'name')
+            for model in models
+        ]
+        data = {model._meta.label: {} for model in models}
+        for label, pk, name in sorted(queries[0].union(*queries[1:], all=True), key=lambda row: row[1]):
+            model = apps.get_model(label)
+            data[label][pk] = model.from_db(model._default_manager.db, ['id', 'name'], (pk, name))
+        return data
+
+    def get_data(self) -> dict:
+        version = get_versions(REFERENCE)[REFERENCE]
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self.data = self.load()
+                    self.version = version
+        return self.data
+
+    def objects(self, model) -> dict:
+        '''pk -> объект'''
+        return self.get_data()[model._meta.label]
+
+    def get(self, model, pk):
+        try:
+            return self.objects(model).get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def clear(self):
+        self.version = None
+        self.data = {}
+
+
+reference_cache = ReferenceCache()
+
+
+class ReferenceIterable(ModelIterable):
+    '''объекты с внешними ключами на справочники берутся из reference_cache
+    вместо JOIN или отдельного запроса на каждую строку'''
+
+    def __iter__(self):
+        fields = [
+            field for field in self.queryset.model._meta.concrete_fields
+            if field.many_to_one and reference_cache.is_reference(field.related_model)
+        ]
+        data = reference_cache.get_data() if fields else {}
+        for obj in super().__iter__():
+            for field in fields:
+                pk = obj.__dict__.get(field.attname)
+                related = data[field.related_model._meta.label].get(pk)
+                if related is not None and not field.is_cached(obj):
+                    field.set_cached_value(obj, related)
+            yield obj
+
+
+class ReferenceChoiceIterator(ModelChoiceIterator):
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in reference_cache.objects(self.queryset.model).values():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(reference_cache.objects(self.queryset.model)) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(reference_cache.objects(self.queryset.model))
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    '''ModelChoiceField для справочника: варианты и проверка значения без запросов.
+    queryset поля используется только для определения модели'''
+    iterator = ReferenceChoiceIterator
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        obj = reference_cache.get(self.queryset.model, value)
+        if obj is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value}
+            )
+        return obj
@@ -0,0 +1,235 @@
+import bisect
+import re
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text: str | None) -> list[str]:
+    '''разбивает текст на слова в нижнем регистре'''
+    if not text:
+        return []
+    return [token.casefold() for token in TOKEN_RE.findall(text)]
+
+
+class BaseSearchBackend:
+    '''базовый класс поискового движка по задачам.
+    Индекс обновляется сигналами Task (issue.signals), полная перестройка -
+    командой manage.py rebuild_search_index'''
+
+    def index(self, task):
+        raise NotImplementedError
+
+    def index_many(self, tasks):
+        for task in tasks:
+            self.index(task)
+
+    def remove(self, task_pk):
+        raise NotImplementedError
+
+    def remove_many(self, task_pks):
+        for task_pk in task_pks:
+            self.remove(task_pk)
+
+    def clear(self):
+        raise NotImplementedError
+
+    def rebuild(self, queryset, batch_size=1000):
+        '''перестраивает индекс целиком, возвращает число проиндексированных задач'''
+        self.clear()
+        count = 0
+        batch = []
+        for task in queryset.only('pk', 'summary', 'description').iterator(chunk_size=batch_size):
+            batch.append(task)
+            if len(batch) >= batch_size:
+                self.index_many(batch)
+                count += len(batch)
+                batch = []
+        self.index_many(batch)
+        return count + len(batch)
+
+    def search(self, queryset, query: str):
+        '''фильтрует queryset по запросу и сортирует по релевантности'''
+        raise NotImplementedError
+
+    async def asearch(self, queryset, query: str):
+        '''search() для асинхронных представлений: построение запроса может обращаться
+        к базе (загрузка индекса в памяти), поэтому выполняется в потоке'''
+        return await sync_to_async(self.search)(queryset, query)
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    '''поиск через виртуальную таблицу SQLite FTS5 (создаётся миграцией 0007),
+    rowid записи индекса совпадает с pk задачи'''
+    table = 'issue_task_fts'
+
+    @staticmethod
+    def build_match(query: str) -> str:
+        '''превращает ввод пользователя в запрос FTS5 с префиксным поиском по каждому слову'''
+        return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+    def index(self, task):
+        self.index_many([task])
+
+    def index_many(self, tasks):
+        rows = [(task.pk, task.summary, task.description or '') for task in tasks]
+        if not rows:
+            return
+        # FTS5 поддерживает OR REPLACE по rowid: старая запись удаляется из индекса тем же запросом
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {self.table} (rowid, summary, description) VALUES (%s, %s, %s)', rows
+            )
+
+    def remove(self, task_pk):
+        self.remove_many([task_pk])
+
+    def remove_many(self, task_pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(task_pk,) for task_pk in task_pks])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def rebuild(self, queryset, batch_size=1000):
+        '''перестройка одним INSERT ... SELECT, если индексируется вся таблица задач'''
+        if queryset.query.where:
+            return super().rebuild(queryset, batch_size)
+        task_table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, summary, description) '
+                f'SELECT id, summary, COALESCE(description, \'\') FROM {task_table}'
+            )
+            return cursor.rowcount
+
+    def search(self, queryset, query: str):
+        match = self.build_match(query)
+        if not match:
+            return queryset.none()
+        task_table = queryset.model._meta.db_table
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', (match,))
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT rank FROM {self.table} WHERE {self.table} MATCH %s AND rowid = "{task_table}"."id"',
+                (match,),
+            )
+        ).order_by('search_rank', '-pk')
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    '''инвертированный индекс в памяти процесса, запасной вариант для баз без FTS5.
+    Индекс строится при первом поиске; в каждом процессе-воркере он свой,
+    поэтому изменения из других процессов видны только после перезапуска'''
+    max_matches = 1000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self.terms = []
+        self.loaded = False
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            from issue.models import Task
+            self.rebuild(Task._base_manager.all())
+
+    def index(self, task):
+        if not self.loaded:
+            return
+        with self.lock:
+            self._remove(task.pk)
+            frequencies = defaultdict(int)
+            for token in tokenize(task.summary) + tokenize(task.description):
+                frequencies[token] += 1
+            for token, frequency in frequencies.items():
+                if token not in self.postings:
+                    bisect.insort(self.terms, token)
+                self.postings[token][task.pk] = frequency
+            self.documents[task.pk] = list(frequencies)
+
+    def remove(self, task_pk):
+        with self.lock:
+            self._remove(task_pk)
+
+    def _remove(self, task_pk):
+        for token in self.documents.pop(task_pk, []):
+            postings = self.postings[token]
+            postings.pop(task_pk, None)
+            if not postings:
+                del self.postings[token]
+                self.terms.pop(bisect.bisect_left(self.terms, token))
+
+    def clear(self):
+        with self.lock:
+            self.postings.clear()
+            self.documents.clear()
+            self.terms.clear()
+        self.loaded = True
+
+    def expand(self, prefix: str) -> list[str]:
+        '''все слова индекса, начинающиеся с prefix'''
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + '\uffff')
+        return self.terms[start:end]
+
+    def score(self, query: str) -> dict:
+        self.ensure_loaded()
+        scores = None
+        with self.lock:
+            for prefix in tokenize(query):
+                prefix_scores = defaultdict(int)
+                for term in self.expand(prefix):
+                    for task_pk, frequency in self.postings[term].items():
+                        prefix_scores[task_pk] += frequency
+                if scores is None:
+                    scores = prefix_scores
+                else:
+                    scores = {pk: scores[pk] + value for pk, value in prefix_scores.items() if pk in scores}
+                if not scores:
+                    return {}
+        return scores or {}
+
+    def search(self, queryset, query: str):
+        scores = self.score(query)
+        if not scores:
+            return queryset.none()
+        best = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:self.max_matches]
+        return queryset.filter(pk__in=[pk for pk, _ in best]).annotate(
+            search_rank=Case(
+                *[When(pk=pk, then=Value(-float(score))) for pk, score in best],
+                output_field=FloatField(),
+            )
+        ).order_by('search_rank', '-pk')
+
+
+def regex_search(queryset, pattern: str):
+    '''старый режим поиска регулярным выражением, полный просмотр таблицы'''
+    return queryset.filter(Q(summary__iregex=pattern) | Q(description__iregex=pattern))
+
+
+@lru_cache(maxsize=None)
+def get_search_backend() -> BaseSearchBackend:
+    '''возвращает движок из settings.ISSUE_SEARCH_BACKEND,
+    по умолчанию FTS5 для SQLite и индекс в памяти для остальных баз'''
+    path = getattr(settings, 'ISSUE_SEARCH_BACKEND', None)
+    if not path:
+        if connection.vendor == 'sqlite':
+            path = 'issue.search.SQLiteFTSBackend'
+        else:
+            path = 'issue.search.InMemorySearchBackend'
+    return import_string(path)()
@@ -0,0 +1,124 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from issue import cache, counters, history
+from issue.models import Project, Status, Task, Type
+from issue.search import get_search_backend
+
+
+# задачи созданы bulk_create без post_save, аргумент tasks - список с pk,
+# необязательный user - кто загрузил
+tasks_bulk_created = Signal()
+
+
+@receiver(post_save, sender=Task, dispatch_uid='issue_task_search_index')
+def index_task(sender, instance: Task, **kwargs):
+    '''обновляет поисковый индекс после сохранения задачи'''
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Task, dispatch_uid='issue_task_search_remove')
+def remove_task_from_index(sender, instance: Task, **kwargs):
+    '''удаляет задачу из поискового индекса'''
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(tasks_bulk_created, sender=Task, dispatch_uid='issue_tasks_bulk_search_index')
+def index_tasks(sender, tasks, **kwargs):
+    get_search_backend().index_many(tasks)
+
+
+@receiver(tasks_bulk_created, sender=Task, dispatch_uid='issue_tasks_bulk_cache')
+def tasks_created(sender, tasks, **kwargs):
+    cache.bump_versions(cache.TASKS, *{f'project:{task.project_id}' for task in tasks})
+
+
+@receiver(post_save, sender=Task, dispatch_uid='issue_task_history_saved')
+def task_history(sender, instance: Task, created, **kwargs):
+    '''событие истории в той же транзакции, что и сохранение задачи'''
+    history.record_event(instance, created)
+
+
+@receiver(tasks_bulk_created, sender=Task, dispatch_uid='issue_tasks_bulk_history')
+def tasks_history(sender, tasks, user=None, **kwargs):
+    history.record_created(tasks, user)
+
+
+@receiver(post_save, sender=Task, dispatch_uid='issue_task_counters_saved')
+def task_counters_saved(sender, instance: Task, created, **kwargs):
+    '''счётчики проекта: новая задача, перенос, смена статуса или типа, мягкое удаление'''
+    old_states = [] if created else [counters.task_state(instance, loaded=True)]
+    update_counters(counters.get_deltas(old_states, [counters.task_state(instance)]))
+
+
+@receiver(post_delete, sender=Task, dispatch_uid='issue_task_counters_deleted')
+def task_counters_deleted(sender, instance: Task, **kwargs):
+    update_counters(counters.get_deltas([counters.task_state(instance, loaded=True)]))
+
+
+@receiver(tasks_bulk_created, sender=Task, dispatch_uid='issue_tasks_bulk_counters')
+def tasks_counters_created(sender, tasks, **kwargs):
+    update_counters(counters.get_deltas(new_states=[counters.task_state(task) for task in tasks]))
+
+
+def update_counters(deltas):
+    '''счётчики выводятся в списке проектов, поэтому его кэш сбрасывается'''
+    if deltas:
+        counters.apply_deltas(deltas)
+        cache.bump_versions(cache.PROJECTS)
+
+
+@receiver(post_save, sender=Task, dispatch_uid='issue_task_cache_saved')
+@receiver(post_delete, sender=Task, dispatch_uid='issue_task_cache_deleted')
+def task_changed(sender, instance: Task, signal, **kwargs):
+    '''сбрасывает кэш списка, задачи и её проекта (и прежнего проекта при переносе).
+    Версия задачи после сохранения равна updated_at и отдаётся как Last-Modified'''
+    names = {cache.TASKS, f'project:{instance.project_id}'}
+    loaded_project_id = instance.get_loaded_value('project_id')
+    if loaded_project_id is not None:
+        names.add(f'project:{loaded_project_id}')
+    cache.bump_versions(*names)
+    cache.bump_versions(f'task:{instance.pk}', at=instance.updated_at if signal is post_save else None)
+
+
+@receiver(post_save, sender=Project, dispatch_uid='issue_project_cache_saved')
+@receiver(post_delete, sender=Project, dispatch_uid='issue_project_cache_deleted')
+def project_changed(sender, instance: Project, **kwargs):
+    cache.bump_versions(cache.PROJECTS, f'project:{instance.pk}')
+
+
+@receiver(m2m_changed, sender=Project.users.through, dispatch_uid='issue_project_users_cache')
+def project_users_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    '''состав участников выводится на странице проекта'''
+    if action == 'pre_clear' and reverse:
+        # после очистки связи пользователя уже не найти, проекты запоминаются заранее
+        instance._cleared_project_ids = list(instance.projects.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        cache.bump_versions(f'project:{instance.pk}')
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_project_ids', None)
+    if pk_set:
+        cache.bump_versions(*[f'project:{project_pk}' for project_pk in pk_set])
+
+
+@receiver(post_save, sender=User, dispatch_uid='issue_user_cache_saved')
+@receiver(post_delete, sender=User, dispatch_uid='issue_user_cache_deleted')
+def user_changed(sender, update_fields=None, **kwargs):
+    '''список пользователей для добавления в проект, вход в систему его не меняет'''
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    cache.bump_versions(cache.USERS)
+
+
+@receiver(post_save, sender=Status, dispatch_uid='issue_status_cache_saved')
+@receiver(post_delete, sender=Status, dispatch_uid='issue_status_cache_deleted')
+@receiver(post_save, sender=Type, dispatch_uid='issue_type_cache_saved')
+@receiver(post_delete, sender=Type, dispatch_uid='issue_type_cache_deleted')
+def reference_changed(sender, **kwargs):
+    '''названия статусов и типов входят во все фрагменты задач'''
+    cache.bump_versions(cache.REFERENCE)
@@ -1,3 +1,1340 @@
-from django.test import TestCase
+import collections
+import datetime
+import gzip
+import io
+import json
+import re
+import tempfile
+import time
+import unittest
+import zlib
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.utils import load_backend
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from accounts.backends import CachedModelBackend
+from accounts.ratelimit import get_login_buckets
+from core.caches import get_caches
+from core.db import get_databases
+from core.metrics import registry
+from core.middleware import PerformanceMiddleware, StaticFilesMiddleware
+from core.rendering import get_templates
+from issue import analytics, jobs
+from issue import cache as issue_cache
+from issue.archive import archive_deleted
+from issue.benchmark import generate_tracker
+from issue.forms import TaskForm
+from issue.importers import TaskImporter
+from issue.models import ArchivedTask, Job, Project, ProjectDailyStats, Status, Task, TaskEvent, Type
+from issue.reference import ReferenceCache, reference_cache
+from issue.search import InMemorySearchBackend, SQLiteFTSBackend
+
+
+# число запросов в тестах посчитано для сессий в базе, независимо от DJANGO_SESSION_ENGINE
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+class TrackerTestCase(TestCase):
+    '''общие данные для тестов трекера'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(name='New')
+        cls.type = Type.objects.create(name='Bug')
+        cls.project = Project.objects.create(name='Tracker', start_date=datetime.date(2022, 10, 1))
+
+    def setUp(self):
+        cache.clear()
+        caches[settings.LOGIN_RATE_LIMIT_CACHE].clear()
+
+    @classmethod
+    def create_user(cls, username, group='Developer'):
+        user = User.objects.create_user(username=username, password=username)
+        user.groups.add(Group.objects.get_or_create(name=group)[0])
+        return user
+
+    @classmethod
+    def create_task(cls, summary, description='', **kwargs):
+        kwargs.setdefault('status', cls.status)
+        kwargs.setdefault('type', cls.type)
+        kwargs.setdefault('project', cls.project)
+        return Task.objects.create(summary=summary, description=description, **kwargs)
+
+
+class SearchTests(TrackerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login_task = self.create_task('Ошибка входа', 'Пользователь не может войти в систему')
+        self.report_task = self.create_task('Отчёт по задачам', 'Выгрузка отчёта, ошибка в отчёте')
+        self.other_task = self.create_task('Logo', 'Update the logo')
+
+    def search(self, backend, query):
+        return list(backend.search(Task.objects.all(), query))
+
+    def test_fts_prefix_and_ranking(self):
+        backend = SQLiteFTSBackend()
+        self.assertEqual(self.search(backend, 'отч'), [self.report_task])
+        self.assertEqual(set(self.search(backend, 'ошиб')), {self.login_task, self.report_task})
+        self.assertEqual(self.search(backend, 'LOGO'), [self.other_task])
+
+    def test_fts_index_follows_save_and_delete(self):
+        backend = SQLiteFTSBackend()
+        self.other_task.summary = 'Favicon'
+        self.other_task.save()
+        self.assertEqual(self.search(backend, 'favicon'), [self.other_task])
+        self.other_task.delete()
+        self.assertEqual(self.search(backend, 'favicon'), [])
+
+    def test_fts_rebuild(self):
+        backend = SQLiteFTSBackend()
+        backend.clear()
+        self.assertEqual(self.search(backend, 'logo'), [])
+        self.assertEqual(backend.rebuild(Task.objects.all()), 3)
+        self.assertEqual(self.search(backend, 'logo'), [self.other_task])
+
+    def test_in_memory_backend(self):
+        backend = InMemorySearchBackend()
+        self.assertEqual(self.search(backend, 'отч ош'), [self.report_task])
+        results = self.search(backend, 'ошибк')
+        self.assertEqual(results[0], self.report_task)
+        backend.remove(self.report_task.pk)
+        self.assertEqual(self.search(backend, 'отч'), [])
+
+    def test_list_view_modes(self):
+        response = self.client.get(reverse('task_list'), {'search': 'logo'})
+        self.assertEqual(list(response.context['tasks']), [self.other_task])
+        response = self.client.get(reverse('task_list'), {'search': '^Lo.o$', 'mode': 'regex'})
+        self.assertEqual(list(response.context['tasks']), [self.other_task])
+        response = self.client.get(reverse('task_list'), {'search': '(', 'mode': 'regex'})
+        self.assertEqual(response.status_code, 200)
+
+
+class QueryCountTests(TrackerTestCase):
+    '''число запросов страницы не зависит от количества строк'''
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = cls.create_user('dev')
+        cls.project.users.add(cls.user)
+
+    def add_rows(self, count):
+        start = Status.objects.count()
+        for number in range(start, start + count):
+            status = Status.objects.create(name=f'status {number}')
+            task_type = Type.objects.create(name=f'type {number}')
+            project = Project.objects.create(name=f'project {number}', start_date=datetime.date(2022, 10, 1))
+            self.create_task(f'task {number}', status=status, type=task_type, project=project)
+            self.create_task(f'task {number}', status=status, type=task_type)
+            self.project.users.add(User.objects.create(username=f'user {number}'))
+
+    def assert_constant_queries(self, url, num, **params):
+        for count in (1, 5):
+            self.add_rows(count)
+            cache.clear()
+            # справочники статусов и типов в рабочем процессе уже загружены
+            reference_cache.get_data()
+            with self.assertNumQueries(num):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+
+    def test_task_list(self):
+        # COUNT для пагинатора, страница задач
+        self.assert_constant_queries(reverse('task_list'), 2)
+
+    def test_task_list_authenticated(self):
+        self.client.force_login(self.user)
+        # сессия, пользователь и его группы (кэш очищен), COUNT, страница задач
+        self.assert_constant_queries(reverse('task_list'), 5)
+
+    def test_task_list_search(self):
+        self.assert_constant_queries(reverse('task_list'), 2, search='task')
+
+    def test_project_list(self):
+        self.client.force_login(self.user)
+        # сессия, пользователь, группы, проекты, счётчики по статусам
+        self.assert_constant_queries(reverse('project_list'), 5)
+
+    def test_project_detail(self):
+        self.client.force_login(self.user)
+        # сессия, пользователь, группы, проект, задачи, участники; пользователи ищутся отдельно (user_search)
+        self.assert_constant_queries(reverse('project_detail', kwargs={'pk': self.project.pk}), 6)
+
+    def test_task_detail(self):
+        self.client.force_login(self.user)
+        task = self.create_task('detail')
+        # сессия, пользователь, группы, задача
+        self.assert_constant_queries(reverse('task_detail', kwargs={'pk': task.pk}), 4)
+
+    def test_task_create_within_budget(self):
+        self.client.force_login(self.user)
+        url = reverse('task_create', kwargs={'pk': self.project.pk})
+        # пользователь с группами и справочники загружаются в кэш страницей формы
+        self.client.get(url)
+        data = {'summary': 'budget', 'description': 'budget', 'status': self.status.pk, 'type': self.type.pk}
+        # первая задача проекта создаёт строки счётчиков, следующие только увеличивают их;
+        # статус и тип проверяются по справочнику в памяти и ещё раз по базе (ForeignKey.validate)
+        with self.assertNumQueries(17):
+            self.client.post(url, data)
+        self.assertLess(17, settings.PERFORMANCE_QUERY_BUDGET)
+        with self.assertNumQueries(13):
+            self.assertEqual(self.client.post(url, data).status_code, 302)
+
+
+class PermissionTests(TrackerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.member = cls.create_user('member', 'Team Lead')
+        cls.outsider = cls.create_user('outsider', 'Team Lead')
+        cls.project.users.add(cls.member)
+
+    def setUp(self):
+        super().setUp()
+        self.task = self.create_task('Task')
+
+    def test_member_access(self):
+        self.client.force_login(self.member)
+        url = reverse('task_update', kwargs={'pk': self.task.pk})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_missing_task(self):
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get(reverse('task_update', kwargs={'pk': 0})).status_code, 404)
+
+    def test_cached_between_requests(self):
+        self.client.force_login(self.member)
+        url = reverse('task_create', kwargs={'pk': self.project.pk})
+        self.client.get(url)
+        # только сессия: пользователь и права из кэша, статусы и типы формы - из справочников в памяти
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_invalidated_on_membership_change(self):
+        self.client.force_login(self.outsider)
+        url = reverse('task_create', kwargs={'pk': self.project.pk})
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.project.users.add(self.outsider)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.outsider.projects.remove(self.project)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_invalidated_on_group_change(self):
+        self.client.force_login(self.member)
+        url = reverse('task_create', kwargs={'pk': self.project.pk})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.member.groups.clear()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class CursorPaginationTests(TrackerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tasks = [self.create_task(f'task {number}') for number in range(7)][::-1]
+
+    def get_page(self, **params):
+        params.setdefault('pagination', 'cursor')
+        return self.client.get(reverse('task_list'), params).context['page_obj']
+
+    def test_walk_forward_and_back(self):
+        first = self.get_page()
+        self.assertEqual(list(first), self.tasks[:3])
+        self.assertFalse(first.has_previous())
+        second = self.get_page(cursor=first.next_cursor)
+        self.assertEqual(list(second), self.tasks[3:6])
+        last = self.get_page(cursor=second.next_cursor)
+        self.assertEqual(list(last), self.tasks[6:])
+        self.assertFalse(last.has_next())
+        back = self.get_page(cursor=last.previous_cursor)
+        self.assertEqual(list(back), self.tasks[3:6])
+        self.assertEqual(list(self.get_page(cursor=back.previous_cursor)), self.tasks[:3])
+
+    def test_page_size_and_no_count_query(self):
+        reference_cache.get_data()
+        with self.assertNumQueries(1):
+            page = self.get_page(page_size=5)
+        self.assertEqual(list(page), self.tasks[:5])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('task_list'), {'pagination': 'cursor', 'cursor': 'broken'})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(TASK_LIST_PAGINATION='cursor')
+    def test_mode_from_settings(self):
+        response = self.client.get(reverse('task_list'))
+        self.assertTrue(response.context['cursor_pagination'])
+        self.assertIsNotNone(response.context['page_obj'].next_cursor)
+
+
+class SoftDeleteManagerTests(TrackerTestCase):
+
+    def test_default_manager_skips_deleted(self):
+        live = self.create_task('live')
+        deleted = self.create_task('deleted', is_deleted=True)
+        self.assertEqual(list(Task.objects.all()), [live])
+        self.assertEqual(set(Task.all_objects.all()), {live, deleted})
+        self.assertEqual(list(self.project.tasks.all()), [live])
+        response = self.client.get(reverse('task_list'))
+        self.assertEqual(list(response.context['tasks']), [live])
+
+    def test_delete_and_restore(self):
+        lead = self.create_user('lead', 'Team Lead')
+        self.project.users.add(lead)
+        self.client.force_login(lead)
+        task = self.create_task('task', 'description')
+        response = self.client.post(reverse('task_delete', kwargs={'pk': task.pk}))
+        self.assertRedirects(response, reverse('task_list'))
+        task = Task.all_objects.get(pk=task.pk)
+        self.assertTrue(task.is_deleted)
+        self.assertIsNotNone(task.deleted_at)
+        self.assertEqual(TaskEvent.objects.filter(task=task).latest('pk').kind, TaskEvent.DELETED)
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual((project.tasks_total, project.tasks_deleted), (0, 1))
+
+        response = self.client.get(reverse('project_trash', kwargs={'pk': self.project.pk}))
+        self.assertEqual(list(response.context['tasks']), [task])
+        response = self.client.post(reverse('task_restore', kwargs={'pk': self.project.pk, 'task_pk': task.pk}))
+        self.assertRedirects(response, reverse('project_trash', kwargs={'pk': self.project.pk}))
+        task = Task.objects.get(pk=task.pk)
+        self.assertIsNone(task.deleted_at)
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual((project.tasks_total, project.tasks_deleted), (1, 0))
+        # восстановить можно только удалённую задачу
+        response = self.client.post(reverse('task_restore', kwargs={'pk': self.project.pk, 'task_pk': task.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_archive_deleted(self):
+        live = self.create_task('live')
+        recent = self.create_task('recent', is_deleted=True)
+        old = [self.create_task(f'old {number}', 'удалённая задача', is_deleted=True) for number in range(3)]
+        Task.all_objects.filter(pk__in=[task.pk for task in old]).update(
+            deleted_at=timezone.now() - datetime.timedelta(days=settings.TASK_ARCHIVE_RETENTION_DAYS + 1)
+        )
+        self.assertEqual(archive_deleted(batch_size=2), 3)
+        self.assertEqual(set(Task.all_objects.all()), {live, recent})
+        archived = ArchivedTask.objects.get(pk=old[0].pk)
+        self.assertEqual((archived.summary, archived.project_id), ('old 0', self.project.pk))
+        self.assertEqual([event['kind'] for event in archived.events], [TaskEvent.CREATED])
+        self.assertFalse(TaskEvent.objects.filter(task_id__in=[task.pk for task in old]).exists())
+        self.assertEqual(list(SQLiteFTSBackend().search(Task.all_objects.all(), 'удалённая')), [])
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual((project.tasks_total, project.tasks_deleted), (1, 1))
+        self.assertEqual(archive_deleted(), 0)
+
+
+class MembershipTests(TrackerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.lead = cls.create_user('lead', 'Team Lead')
+        cls.project.users.add(cls.lead)
+        User.objects.bulk_create([User(username=f'user {number}') for number in range(200)])
+        cls.team = list(User.objects.filter(username__startswith='user ').values_list('pk', flat=True))
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.lead)
+        self.url = reverse('project_members', kwargs={'pk': self.project.pk})
+
+    def test_bulk_add_is_constant_queries(self):
+        self.client.get(reverse('project_list'))
+        # сессия, участие, проект, проверка id, SAVEPOINT, текущие участники,
+        # существующие связи и INSERT внутри add(), RELEASE SAVEPOINT; пользователь из кэша
+        with self.assertNumQueries(9):
+            response = self.client.post(self.url, {'add': self.team}, content_type='application/json')
+        self.assertEqual(response.json()['added'], sorted(self.team))
+        self.assertEqual(self.project.users.count(), 201)
+
+    def test_replace_and_invalid_ids(self):
+        self.project.users.add(*self.team[:10])
+        response = self.client.put(
+            self.url, {'users': [self.lead.pk, *self.team[5:15], 0]}, content_type='application/json'
+        )
+        summary = response.json()
+        self.assertEqual(summary['added'], sorted(self.team[10:15]))
+        self.assertEqual(summary['removed'], sorted(self.team[:5]))
+        self.assertEqual(summary['invalid'], [0])
+        self.assertEqual(summary['members'], 11)
+
+    def test_user_search(self):
+        User.objects.filter(pk=self.team[0]).update(first_name='Ivan', last_name='Petrov')
+        self.project.users.add(self.team[1])
+        url = reverse('user_search', kwargs={'pk': self.project.pk})
+        self.client.get(url)
+        # сессия, поиск; участие в проекте из кэша
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'q': 'USER 1', 'limit': 5})
+        usernames = [user['username'] for user in response.json()['results']]
+        self.assertEqual(usernames, ['user 10', 'user 100', 'user 101', 'user 102', 'user 103'])
+        response = self.client.get(url, {'q': 'pet'})
+        self.assertEqual(response.json()['results'], [
+            {'id': self.team[0], 'username': 'user 0', 'first_name': 'Ivan', 'last_name': 'Petrov'},
+        ])
+        self.assertEqual(self.client.get(url, {'q': 'user 1', 'limit': 1000}).json()['results'][0]['username'], 'user 10')
+        self.assertEqual(len(self.client.get(url, {'q': 'user', 'limit': 1000}).json()['results']), 50)
+        self.assertEqual(self.client.get(url, {'limit': 'x'}).status_code, 400)
+
+    def test_bad_input(self):
+        response = self.client.post(self.url, {'add': ['x']}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('users_add', kwargs={'pk': self.project.pk}))
+        self.assertRedirects(response, reverse('project_detail', kwargs={'pk': self.project.pk}))
+
+
+class CacheTests(TrackerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = cls.create_user('dev')
+        cls.project.users.add(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.task = self.create_task('Cached task')
+
+    def test_conditional_get(self):
+        url = reverse('task_detail', kwargs={'pk': self.task.pk})
+        # первый ответ выставляет CSRF-cookie, которая входит в ETag
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.task.summary = 'Changed'
+        self.task.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_if_modified_since(self):
+        url = reverse('task_detail', kwargs={'pk': self.task.pk})
+        response = self.client.get(url)
+        not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.task.summary = 'Changed'
+        self.task.save(update_fields=['summary'])
+        self.task.refresh_from_db()
+        stale = http_date(self.task.updated_at.timestamp() - 60)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=stale).status_code, 200)
+
+    def test_fragments_invalidated_by_signals(self):
+        url = reverse('project_detail', kwargs={'pk': self.project.pk})
+        self.assertContains(self.client.get(url), 'Cached task')
+        # фрагменты задач и пользователей, пользователь и права из кэша: сессия, проект, участники
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        self.task.summary = 'Renamed task'
+        self.task.save()
+        self.assertContains(self.client.get(url), 'Renamed task')
+        self.status.name = 'Reopened'
+        self.status.save()
+        self.assertContains(self.client.get(reverse('task_list')), 'Reopened')
+
+    def test_user_projects_clear(self):
+        other = Project.objects.create(name='Other', start_date=datetime.date(2022, 10, 1))
+        other.users.add(self.user)
+        before = issue_cache.get_versions(issue_cache.REFERENCE, f'project:{self.project.pk}', f'project:{other.pk}')
+        self.user.projects.clear()
+        after = issue_cache.get_versions(issue_cache.REFERENCE, f'project:{self.project.pk}', f'project:{other.pk}')
+        # справочники не сбрасываются, только страницы проектов пользователя
+        self.assertEqual(after[issue_cache.REFERENCE], before[issue_cache.REFERENCE])
+        self.assertGreater(after[f'project:{self.project.pk}'], before[f'project:{self.project.pk}'])
+        self.assertGreater(after[f'project:{other.pk}'], before[f'project:{other.pk}'])
+
+
+class AsyncViewTests(TrackerTestCase):
+    '''асинхронные представления отдают ту же страницу, что и синхронные'''
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = cls.create_user('dev')
+        cls.project.users.add(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.tasks = [self.create_task(f'task {number}') for number in range(4)]
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+
+    async def test_task_list(self):
+        response = await self.async_client.get(reverse('async_task_list'), {'search': 'task'})
+        self.assertEqual(response.status_code, 200)
+        # 4 задачи при paginate_by = 3 и paginate_orphans = 1 - одна страница
+        self.assertEqual(len(response.context['tasks']), 4)
+        response = await self.async_client.get(reverse('async_task_list'), {'pagination': 'cursor', 'page_size': 3})
+        self.assertEqual(response.context['tasks'], self.tasks[:0:-1])
+
+    async def test_detail_pages(self):
+        response = await self.async_client.get(reverse('async_task_detail', kwargs={'pk': self.tasks[0].pk}))
+        self.assertContains(response, 'task 0')
+        response = await self.async_client.get(reverse('async_project_detail', kwargs={'pk': self.project.pk}))
+        self.assertContains(response, 'task 3')
+        response = await self.async_client.get(reverse('async_project_list'))
+        self.assertContains(response, 'Tracker')
+
+    async def test_permissions(self):
+        await sync_to_async(self.user.groups.clear)()
+        response = await self.async_client.get(reverse('async_project_list'))
+        self.assertEqual(response.status_code, 403)
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(reverse('async_task_detail', kwargs={'pk': self.tasks[0].pk}))
+        self.assertEqual(response.status_code, 302)
+
+
+class ApiTests(TrackerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = cls.create_user('dev')
+        cls.project.users.add(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.tasks = [self.create_task(f'task {number}') for number in range(5)][::-1]
+
+    def test_list_with_fields_and_cursor(self):
+        response = self.client.get(reverse('api_task_list'), {'fields': 'id,status', 'limit': 3})
+        data = response.json()
+        self.assertEqual(data['results'][0], {'id': self.tasks[0].pk, 'status': 'New'})
+        response = self.client.get(reverse('api_task_list'), {'cursor': data['next'], 'limit': 3})
+        self.assertEqual([row['id'] for row in response.json()['results']], [task.pk for task in self.tasks[3:]])
+        response = self.client.get(reverse('api_task_list'), {'fields': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_create_and_update(self):
+        payload = {'summary': 'API', 'description': 'Via API', 'status': self.status.pk, 'type': self.type.pk, 'project': self.project.pk}
+        response = self.client.post(reverse('api_task_list'), payload, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        url = reverse('api_task_detail', kwargs={'pk': response.json()['id']})
+        response = self.client.patch(url, {'summary': 'Patched'}, content_type='application/json')
+        self.assertEqual(response.json()['summary'], 'Patched')
+        response = self.client.patch(url, {'status': 0}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_streams(self):
+        response = self.client.get(reverse('api_task_export'), {'format': 'csv', 'fields': 'id,summary'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,summary')
+        self.assertEqual(len(lines), 6)
+        response = self.client.get(reverse('api_task_export'), {'project': self.project.pk, 'fields': 'summary'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(rows[0], {'summary': 'task 0'})
+
+    async def test_export_under_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        for export_format in ('csv', 'ndjson'):
+            response = await self.async_client.get(
+                reverse('api_task_export'), {'format': export_format, 'fields': 'id,summary'}
+            )
+            # тело читается в цикле событий, как в ASGIHandler: запросы к базе здесь запрещены
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            self.assertFalse(response.streaming)
+            self.assertEqual(response['Content-Disposition'], f'attachment; filename="tasks.{export_format}"')
+            self.assertEqual(len(body.splitlines()), 6 if export_format == 'csv' else 5)
+
+    def test_anonymous(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_project_list')).status_code, 401)
+
+
+class ImportTests(TrackerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.lead = cls.create_user('lead', 'Team Lead')
+        cls.project.users.add(cls.lead)
+
+    def test_csv_upload_with_row_errors(self):
+        content = (
+            'summary,description,status,type\n'
+            'First,One,new,Bug\n'
+            ',Missing summary,New,Bug\n'
+            'Third,Three,Unknown,Bug\n'
+            'Fourth,Four,New,bug\n'
+        )
+        upload = SimpleUploadedFile('tasks.csv', content.encode())
+        self.client.force_login(self.lead)
+        with self.assertNumQueries(30):
+            response = self.client.post(
+                reverse('task_import', kwargs={'pk': self.project.pk}), {'file': upload, 'batch_size': 1}
+            )
+        result = response.json()
+        self.assertEqual(result['created'], 2)
+        self.assertEqual([error['line'] for error in result['errors']], [3, 4])
+        self.assertIn('summary', result['errors'][0]['errors'])
+        self.assertEqual(list(SQLiteFTSBackend().search(Task.objects.all(), 'fourth')), [Task.objects.get(summary='Fourth')])
+
+    def test_ndjson_command(self):
+        content = '{"summary": "A", "description": "a", "status": "New", "type": "Bug"}\nnot json\n'
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as file:
+            file.write(content)
+            file.flush()
+            call_command('import_tasks', self.project.pk, file.name, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(list(Task.objects.values_list('summary', flat=True)), ['A'])
+
+
+class ReferenceCacheTests(TrackerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.lead = cls.create_user('lead', 'Team Lead')
+        cls.project.users.add(cls.lead)
+
+    def test_form_choices_from_memory(self):
+        reference_cache.get_data()
+        form = TaskForm()
+        with self.assertNumQueries(0):
+            choices = list(form.fields['status'].choices) + list(form.fields['type'].choices)
+        self.assertEqual([label for value, label in choices], ['---------', 'New', '---------', 'Bug'])
+
+    def test_invalid_choice(self):
+        form = TaskForm({
+            'summary': 'Task', 'description': 'text', 'status': 999, 'type': self.type.pk, 'project': self.project.pk,
+        })
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['status'][0].code, 'invalid_choice')
+
+    def test_stale_choice_checked_by_database(self):
+        status = Status.objects.create(name='Gone')
+        data = reference_cache.get_data()
+        Status.objects.filter(pk=status.pk).delete()
+        # процесс ещё не увидел новую версию справочников (кэш default не общий)
+        reference_cache.data = data
+        reference_cache.version = issue_cache.get_versions(issue_cache.REFERENCE)[issue_cache.REFERENCE]
+        form = TaskForm({
+            'summary': 'Task', 'description': 'text', 'status': status.pk, 'type': self.type.pk, 'project': self.project.pk,
+        })
+        self.assertFalse(form.is_valid())
+        self.assertEqual(list(form.errors), ['status'])
+
+    def test_change_invalidates_other_processes(self):
+        other_process = ReferenceCache()
+        self.assertEqual(other_process.get(Status, self.status.pk).name, 'New')
+        self.status.name = 'Open'
+        self.status.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(other_process.get(Status, self.status.pk).name, 'Open')
+
+    def test_version_from_other_cache_connection(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(CACHES=get_caches(Path(directory), {'DJANGO_CACHE_BACKEND': 'file'})):
+                worker = ReferenceCache()
+                self.assertEqual(worker.get(Status, self.status.pk).name, 'New')
+                Status.objects.filter(pk=self.status.pk).update(name='Open')
+                # другой рабочий процесс сдвигает версию через своё соединение с кэшем
+                other_worker = caches.create_connection('default')
+                other_worker.set(issue_cache.version_key(issue_cache.REFERENCE), time.time_ns(), timeout=None)
+                with self.assertNumQueries(1):
+                    self.assertEqual(worker.get(Status, self.status.pk).name, 'Open')
+
+    def test_task_update_queries(self):
+        task = self.create_task('Task')
+        self.client.force_login(self.lead)
+        url = reverse('task_update', kwargs={'pk': task.pk})
+        self.client.get(url)
+        # проект задачи, сессия, задача, проекты для выбора; пользователь,
+        # группы и участие в проекте уже в кэше, статусы и типы - в памяти
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertContains(response, 'Bug')
+
+
+class ProjectCounterTests(TrackerTestCase):
+
+    def assert_counters(self, project, total, deleted, statuses, types):
+        project = Project.objects.get(pk=project.pk)
+        self.assertEqual((project.tasks_total, project.tasks_deleted), (total, deleted))
+        self.assertEqual(
+            dict(project.status_counters.filter(count__gt=0).values_list('status__name', 'count')), statuses
+        )
+        self.assertEqual(dict(project.type_counters.filter(count__gt=0).values_list('type__name', 'count')), types)
+
+    def test_task_lifecycle(self):
+        done = Status.objects.create(name='Done')
+        other = Project.objects.create(name='Other', start_date=datetime.date(2022, 10, 1))
+        first = self.create_task('First')
+        second = self.create_task('Second')
+        self.assert_counters(self.project, 2, 0, {'New': 2}, {'Bug': 2})
+
+        first.status = done
+        first.save()
+        self.assert_counters(self.project, 2, 0, {'New': 1, 'Done': 1}, {'Bug': 2})
+
+        second.project = other
+        second.save()
+        self.assert_counters(self.project, 1, 0, {'Done': 1}, {'Bug': 1})
+        self.assert_counters(other, 1, 0, {'New': 1}, {'Bug': 1})
+
+        first.is_deleted = True
+        first.save()
+        first.save()
+        self.assert_counters(self.project, 0, 1, {}, {})
+
+        first.delete()
+        self.assert_counters(self.project, 0, 0, {}, {})
+
+    def test_project_form_keeps_counters(self):
+        self.create_task('First')
+        project = Project.objects.get(pk=self.project.pk)
+        self.create_task('Second')
+        project.name = 'Renamed'
+        project.save()
+        self.assert_counters(self.project, 2, 0, {'New': 2}, {'Bug': 2})
+
+    def test_recount_repairs_drift(self):
+        self.create_task('First')
+        Task.objects.update(is_deleted=True)
+        call_command('recount_project_counters', stdout=io.StringIO())
+        self.assert_counters(self.project, 0, 1, {}, {})
+
+    def test_project_list_breakdown(self):
+        self.create_task('First')
+        self.client.force_login(self.create_user('dev'))
+        response = self.client.get(reverse('project_list'))
+        self.assertContains(response, 'Задач: 1, New: 1')
+
+
+class PerformanceMiddlewareTests(TrackerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+
+    def test_server_timing_and_metrics(self):
+        self.create_task('Task')
+        response = self.client.get(reverse('task_list'))
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+$')
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",view="task_list"} 1', metrics)
+        self.assertIn('http_request_db_queries_bucket{method="GET",view="task_list",le="+Inf"} 1', metrics)
+
+    def test_metrics_staff_only(self):
+        self.client.force_login(self.create_user('dev'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(PERFORMANCE_QUERY_BUDGET=1)
+    def test_query_budget(self):
+        with self.assertLogs('core.performance', 'WARNING') as logs:
+            self.client.get(reverse('task_list'))
+        self.assertIn('task_list made 2 queries (budget 1)', logs.output[0])
+        self.assertIn('http_query_budget_exceeded_total{view="task_list"} 1', registry.render())
+
+    async def test_async_chain(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(PerformanceMiddleware(get_response)))
+        # запросы синхронного представления выполняются в потоке sync_to_async и тоже учитываются
+        response = await self.async_client.get(reverse('task_list'))
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        self.assertIn('http_request_db_queries_sum{method="GET",view="task_list"} 2.0', registry.render())
+
+
+class StaticFilesTests(TrackerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            STATIC_MODE='production', STATIC_ROOT=directory.name,
+            STATICFILES_STORAGE='core.storage.CompressedManifestStaticFilesStorage',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_hashed_compressed_files(self):
+        content = self.client.get(reverse('task_list')).content.decode()
+        url = re.search(r'/static/css/style\.\w{12}\.css', content).group()
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        compressed = b''.join(response.streaming_content)
+        plain = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(gzip.decompress(compressed), b''.join(plain.streaming_content))
+        # без хеша в имени - короткий срок кэширования
+        self.assertNotIn('immutable', self.client.get('/static/css/style.css')['Cache-Control'])
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=plain['Last-Modified'], HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 304)
+
+    async def test_async_chain(self):
+        # AsyncClient в Django 4.1 передаёт именованные аргументы как заголовки без префикса HTTP_
+        response = await self.async_client.get('/static/css/style.css', ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(StaticFilesMiddleware(get_response)))
+
+
+class RenderingTests(TrackerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+        for number in range(5):
+            self.create_task(f'Task {number}', 'description ' * 50)
+
+    def test_streaming_matches_buffered(self):
+        buffered = self.client.get(reverse('task_list'))
+        registry.clear()
+        with override_settings(STREAMING_TEMPLATES=True):
+            response = self.client.get(reverse('task_list'))
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        # шапка страницы - отдельной частью до списка задач
+        self.assertGreater(len(chunks), 1)
+        self.assertNotIn(b'Task 4', chunks[0])
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        csrf = re.compile(rb'name="csrfmiddlewaretoken" value="\w+"')
+        self.assertEqual(csrf.sub(b'', b''.join(chunks)), csrf.sub(b'', buffered.content))
+        # запросы во время отдачи попадают в метрики страницы: COUNT и страница задач
+        self.assertIn('http_request_db_queries_sum{method="GET",view="task_list"} 2.0', registry.render())
+
+    @override_settings(STREAMING_TEMPLATES=True, RESPONSE_COMPRESSION=True, RESPONSE_COMPRESS_MIN_SIZE=1024)
+    def test_compression(self):
+        response = self.client.get(reverse('task_list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        chunks = list(response.streaming_content)
+        self.assertIn(b'Task 4', gzip.decompress(b''.join(chunks)))
+        # сжатие сбрасывается после каждой части: шапка страницы распаковывается из первого блока
+        head = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(chunks[0])
+        self.assertIn(b'<html', head)
+        self.assertNotIn(b'Task 4', head)
+        # короткий JSON не сжимается
+        response = self.client.get(reverse('api_task_list'), {'fields': 'id', 'limit': 1}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    async def test_production_profile_under_asgi(self):
+        user = await sync_to_async(self.create_user)('dev')
+        await sync_to_async(self.project.users.add)(user)
+        await sync_to_async(self.async_client.force_login)(user)
+        with override_settings(
+            TEMPLATES=get_templates(settings.TEMPLATES, 'production'),
+            STREAMING_TEMPLATES=True, RESPONSE_COMPRESSION=True,
+        ):
+            for url in (reverse('task_list'), reverse('project_detail', kwargs={'pk': self.project.pk})):
+                response = await self.async_client.get(url, ACCEPT_ENCODING='gzip')
+                # тело читается в цикле событий, как в ASGIHandler: запросы к базе здесь запрещены
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+                self.assertFalse(response.streaming)
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertIn(b'Task 4', gzip.decompress(body))
+
+
+class SyntheticDataTests(TestCase):
+
+    def test_generate_tracker(self):
+        result = generate_tracker(projects=3, users=12, tasks=50, members=4, batch_size=20)
+        self.assertEqual(result['tasks'], 50)
+        self.assertEqual(Task.objects.count(), 50)
+        self.assertEqual(User.objects.filter(groups__isnull=False).distinct().count(), 12)
+        self.assertEqual(sum(Project.objects.values_list('tasks_total', flat=True)), 50)
+        self.assertTrue(all(project.users.count() == 4 for project in Project.objects.all()))
+        self.assertTrue(SQLiteFTSBackend().search(Task.objects.all(), 'задача').exists())
+
+
+class DatabaseProfileTests(TestCase):
+
+    def test_profiles(self):
+        base_dir = Path('/srv/tracker')
+        self.assertEqual(get_databases(base_dir, {})['default']['ENGINE'], 'django.db.backends.sqlite3')
+        wal = get_databases(base_dir, {'DJANGO_DB_PROFILE': 'sqlite-wal', 'DJANGO_SQLITE_BUSY_TIMEOUT': '5000'})
+        self.assertEqual(wal['default']['OPTIONS']['timeout'], 5)
+        self.assertEqual(wal['default']['OPTIONS']['pragmas']['journal_mode'], 'WAL')
+        pooled = get_databases(base_dir, {'DJANGO_DB_PROFILE': 'postgres', 'DJANGO_DB_POOLER': 'pgbouncer'})
+        self.assertIsNone(pooled['default']['CONN_MAX_AGE'])
+        self.assertTrue(pooled['default']['DISABLE_SERVER_SIDE_CURSORS'])
+        with self.assertRaises(ValueError):
+            get_databases(base_dir, {'DJANGO_DB_PROFILE': 'mysql'})
+
+    def test_cache_backends(self):
+        base_dir = Path('/srv/tracker')
+        self.assertIn('LocMemCache', get_caches(base_dir, {})['default']['BACKEND'])
+        shared = get_caches(base_dir, {'DJANGO_DB_PROFILE': 'sqlite-wal'})
+        self.assertIn('FileBasedCache', shared['default']['BACKEND'])
+        self.assertNotEqual(shared['default']['LOCATION'], shared['sessions']['LOCATION'])
+        redis = get_caches(base_dir, {'DJANGO_DB_PROFILE': 'postgres', 'DJANGO_CACHE_BACKEND': 'redis'})
+        self.assertIn('RedisCache', redis['default']['BACKEND'])
+        with self.assertRaises(ValueError):
+            get_caches(base_dir, {'DJANGO_CACHE_BACKEND': 'memcached'})
+
+    def test_sqlite_wal_connection(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = get_databases(Path(directory), {'DJANGO_DB_PROFILE': 'sqlite-wal'})['default']
+            wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(
+                {**connection.settings_dict, 'OPTIONS': {}, **settings_dict}, alias='profile'
+            )
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 20000)
+            finally:
+                wrapper.close()
+
+
+class AuthenticationTests(TrackerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('dev', password='secret')
+        cls.user.groups.add(Group.objects.get_or_create(name='Developer')[0])
+
+    def test_cached_user_and_groups(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('project_list'))
+        # только сессия: пользователь с группами, права и фрагмент списка - из кэша
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('project_list')).status_code, 200)
+        self.user.groups.clear()
+        self.assertEqual(self.client.get(reverse('project_list')).status_code, 403)
+
+    def test_password_hash_not_cached(self):
+        backend = CachedModelBackend()
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            backend.get_user(self.user.pk)
+        self.assertNotIn(self.user.password, cache_set.call_args.args[1].values())
+        with self.assertNumQueries(0):
+            user = backend.get_user(self.user.pk)
+        self.assertEqual(user.get_session_auth_hash(), self.user.get_session_auth_hash())
+        # сохранение пользователя из кэша не затирает пароль
+        user.first_name = 'Dev'
+        user.save()
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('secret'))
+
+    def test_password_change_ends_cached_session(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('task_list'))
+        self.user.set_password('changed')
+        self.user.save()
+        response = self.client.get(reverse('project_list'))
+        self.assertRedirects(response, reverse('login') + '?next=' + reverse('project_list'))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_session(self):
+        self.client.post(reverse('login'), {'username': 'dev', 'password': 'secret'})
+        self.client.get(reverse('project_list'))
+        # сессия в cookie, пользователь и страница из кэша
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('project_list')).status_code, 200)
+
+    @override_settings(LOGIN_RATE_LIMIT_BURST=2, LOGIN_RATE_LIMIT_PER_MINUTE=1)
+    def test_login_rate_limit(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse('login'), {'username': 'dev', 'password': 'wrong'}).status_code, 302)
+        response = self.client.post(reverse('login'), {'username': 'dev', 'password': 'secret'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        # неудачные попытки с другого адреса не блокируют вход владельцу
+        with self.settings(LOGIN_RATE_LIMIT_BURST=100):
+            for _ in range(3):
+                self.client.post(reverse('login'), {'username': 'DEV', 'password': 'wrong'}, REMOTE_ADDR='10.0.0.2')
+        response = self.client.post(
+            reverse('login'), {'username': 'dev', 'password': 'secret'}, REMOTE_ADDR='10.0.0.3'
+        )
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(LOGIN_RATE_LIMIT_BURST=2, LOGIN_RATE_LIMIT_PER_MINUTE=1)
+    def test_successful_logins_keep_login_limit(self):
+        # удачные входы с разных адресов не расходуют лимит по логину
+        for number in range(4):
+            response = self.client.post(
+                reverse('login'), {'username': 'dev', 'password': 'secret'}, REMOTE_ADDR=f'10.0.0.{number}'
+            )
+            self.assertRedirects(response, reverse('task_list'), fetch_redirect_response=False)
+        # неудачная попытка не лишает входа, пока лимит по логину не исчерпан, удачный вход его сбрасывает
+        address_bucket = get_login_buckets()[0]
+        for password in ('wrong', 'secret', 'wrong', 'secret'):
+            # лимит по адресу здесь не нужен, проверяется только лимит по логину
+            address_bucket.reset('10.0.1.1')
+            response = self.client.post(reverse('login'), {'username': 'dev', 'password': password}, REMOTE_ADDR='10.0.1.1')
+        self.assertEqual(response.status_code, 302)
+
+
+class TaskHistoryTests(TrackerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.lead = cls.create_user('lead', 'Team Lead')
+        cls.project.users.add(cls.lead)
+
+    def test_events_with_diffs(self):
+        done = Status.objects.create(name='Done')
+        self.client.force_login(self.lead)
+        self.client.post(reverse('task_create', kwargs={'pk': self.project.pk}), {
+            'summary': 'Task', 'description': 'text', 'status': self.status.pk, 'type': self.type.pk,
+        })
+        task = Task.objects.get()
+        task.save()
+        task.status = done
+        task.save()
+        task.is_deleted = True
+        task.save()
+        events = list(task.events.order_by('pk').values_list('kind', 'changes', 'user__username'))
+        self.assertEqual(events, [
+            ('created', {
+                'summary': [None, 'Task'], 'description': [None, 'text'], 'status': [None, self.status.pk],
+                'type': [None, self.type.pk], 'project': [None, self.project.pk],
+            }, 'lead'),
+            ('status', {
+                'status': [self.status.pk, done.pk], 'context': {'project': self.project.pk, 'type': self.type.pk},
+            }, None),
+            ('deleted', {'is_deleted': [False, True]}, None),
+        ])
+
+    def test_timeline_keyset_pages(self):
+        task = self.create_task('Task')
+        TaskEvent.objects.bulk_create([
+            TaskEvent(task=task, kind=TaskEvent.UPDATED, changes={'summary': [str(number), str(number + 1)]})
+            for number in range(45)
+        ])
+        self.client.force_login(self.lead)
+        url = reverse('task_history', kwargs={'pk': task.pk})
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['rows']), 20)
+        self.assertContains(response, '<s>44</s> &rarr; 45', html=False)
+        cursor = response.context['page_obj'].next_cursor
+        self.client.get(url, {'cursor': cursor})
+        # сессия, задача, страница событий
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'cursor': cursor})
+        self.assertEqual(response.context['rows'][0]['changes'][0][1], '24')
+
+    def test_bulk_import_events(self):
+        importer = TaskImporter(self.project, user=self.lead)
+        importer.import_file(io.StringIO('summary,description,status,type\nA,a,New,Bug\nB,b,New,Bug\n'))
+        self.assertEqual(TaskEvent.objects.filter(kind=TaskEvent.CREATED, user=self.lead).count(), 2)
+
+
+class BoardTests(TrackerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.done = Status.objects.create(name='Done')
+        cls.user = cls.create_user('dev')
+        cls.project.users.add(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.tasks = [self.create_task(f'task {number}', 'text') for number in range(3)]
+        self.create_task('done task', status=self.done)
+
+    def test_columns_in_one_query(self):
+        url = reverse('project_board', kwargs={'pk': self.project.pk})
+        self.client.get(url)
+        # сессия, проект, задачи доски
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        columns = response.context['columns']
+        self.assertEqual([column['status'].name for column in columns], ['New', 'Done'])
+        self.assertEqual([task.summary for task in columns[0]['tasks']], ['task 2', 'task 1', 'task 0'])
+        self.assertEqual(response.context['watermark'], Task.objects.latest('updated_at').updated_at)
+
+    def test_changes_since_watermark(self):
+        url = reverse('api_project_board_changes', kwargs={'pk': self.project.pk})
+        Task.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        watermark = timezone.now() - datetime.timedelta(minutes=30)
+        response = self.client.get(url, {'since': watermark.isoformat()})
+        self.assertEqual(response.json()['tasks'], [])
+        self.assertEqual(self.client.get(url, {'since': 'x'}).status_code, 400)
+        # проект не менялся: 304 по версии из кэша, из базы читается только сессия
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(url, {'since': watermark.isoformat()}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        other = Project.objects.create(name='Other', start_date=datetime.date(2022, 10, 1))
+        moved, deleted = self.tasks[1], self.tasks[2]
+        moved.project = other
+        moved.save()
+        deleted.is_deleted = True
+        deleted.save()
+        data = self.client.get(url, {'since': watermark.isoformat()}, HTTP_IF_NONE_MATCH=response['ETag']).json()
+        self.assertEqual({task['id']: task['removed'] for task in data['tasks']}, {moved.pk: True, deleted.pk: True})
+        self.assertEqual(data['tasks'][0]['type'], 'Bug')
+        self.assertEqual(data['watermark'][:19], deleted.updated_at.isoformat()[:19])
+
+    def test_move_card(self):
+        url = reverse('api_task_detail', kwargs={'pk': self.tasks[0].pk})
+        response = self.client.patch(f'{url}?fields=id,status_id', {'status': self.done.pk}, content_type='application/json')
+        self.assertEqual(response.json(), {'id': self.tasks[0].pk, 'status_id': self.done.pk})
+        self.assertEqual(TaskEvent.objects.filter(task=self.tasks[0]).latest('pk').kind, TaskEvent.STATUS)
+
+
+class ProjectTaskListTests(TrackerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.done = Status.objects.create(name='Done')
+        cls.user = cls.create_user('dev')
+        cls.project.users.add(cls.user)
+        cls.tasks = [cls.create_task(f'task {number}') for number in range(25)][::-1]
+        cls.done_task = cls.create_task('done task', status=cls.done)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_first_page_and_more(self):
+        response = self.client.get(reverse('project_detail', kwargs={'pk': self.project.pk}), {'status': self.status.pk})
+        self.assertEqual(list(response.context['page_obj']), self.tasks[:20])
+        self.assertNotContains(response, 'done task')
+        next_url = f'{reverse("project_tasks", kwargs={"pk": self.project.pk})}?status={self.status.pk}&cursor='
+        self.assertContains(response, next_url)
+        cursor = response.context['page_obj'].next_cursor
+        self.client.get(next_url + cursor)
+        # сессия и страница задач; пользователь, группы и справочники из кэша
+        with self.assertNumQueries(2):
+            response = self.client.get(next_url + cursor)
+        self.assertEqual(list(response.context['tasks']), self.tasks[20:])
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_filter_fragment(self):
+        url = reverse('project_tasks', kwargs={'pk': self.project.pk})
+        response = self.client.get(url, {'status': self.done.pk})
+        self.assertEqual(list(response.context['tasks']), [self.done_task])
+        self.assertNotContains(response, '<html')
+        # неизвестный статус не применяется
+        response = self.client.get(url, {'status': 0, 'type': self.type.pk, 'page_size': 3})
+        self.assertEqual(len(response.context['tasks']), 3)
+
+    @override_settings(PROJECT_TASKS_PAGE_SIZE=5)
+    def test_page_size_setting(self):
+        response = self.client.get(reverse('project_tasks', kwargs={'pk': self.project.pk}))
+        self.assertEqual(list(response.context['tasks']), [self.done_task] + self.tasks[:4])
+        Task.objects.filter(pk__in=[task.pk for task in self.tasks]).update(is_deleted=True, deleted_at=timezone.now())
+        self.user.groups.add(Group.objects.get_or_create(name='Team Lead')[0])
+        response = self.client.get(reverse('project_trash', kwargs={'pk': self.project.pk}))
+        self.assertEqual(len(response.context['tasks']), 5)
+
+
+class JobQueueTests(TrackerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.lead = cls.create_user('lead', 'Team Lead')
+        cls.project.users.add(cls.lead)
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(JOBS_FILE_DIR=directory.name, JOBS_RETRY_DELAY=0))
+        self.client.force_login(self.lead)
+
+    def run_jobs(self):
+        call_command('run_jobs', once=True, processes=0, stdout=io.StringIO())
+
+    def test_background_import_with_dedup(self):
+        url = reverse('task_import', kwargs={'pk': self.project.pk})
+        content = b'summary,description,status,type\nA,a,New,Bug\nB,b,New,Bug\n'
+        first = self.client.post(url, {'file': SimpleUploadedFile('tasks.csv', content), 'background': 1})
+        second = self.client.post(url, {'file': SimpleUploadedFile('tasks.csv', content), 'background': 1})
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        self.assertEqual(Task.objects.count(), 0)
+        self.run_jobs()
+        status = self.client.get(first.json()['url']).json()
+        self.assertEqual((status['status'], status['result']['created']), (Job.DONE, 2))
+        self.assertEqual(list(Path(settings.JOBS_FILE_DIR).rglob('*.csv')), [])
+        self.assertEqual(TaskEvent.objects.filter(user=self.lead).count(), 2)
+        self.client.force_login(self.create_user('other', 'Team Lead'))
+        self.assertEqual(self.client.get(first.json()['url']).status_code, 404)
+
+    def test_background_export(self):
+        for number in range(3):
+            self.create_task(f'task {number}')
+        response = self.client.get(
+            reverse('api_task_export'), {'format': 'csv', 'fields': 'summary', 'project': self.project.pk, 'background': 1}
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertNotIn('file_url', response.json())
+        self.run_jobs()
+        status = self.client.get(response.json()['url']).json()
+        self.assertEqual((status['status'], status['result']['rows']), (Job.DONE, 3))
+        response = self.client.get(status['file_url'])
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tasks.csv"')
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), ['summary', 'task 0', 'task 1', 'task 2'])
+        self.client.force_login(self.create_user('other', 'Team Lead'))
+        self.assertEqual(self.client.get(status['file_url']).status_code, 404)
+        # старые выгрузки удаляет следующее задание выгрузки
+        jobs.enqueue('export_tasks', {'fields': ['id'], 'columns': ['id'], 'filters': {}})
+        with override_settings(JOBS_EXPORT_RETENTION_DAYS=-1):
+            self.run_jobs()
+        self.assertEqual(len(list(Path(settings.JOBS_FILE_DIR, 'exports').iterdir())), 1)
+
+    def test_retries_then_fails(self):
+        attempts = collections.Counter()
+
+        @jobs.register('flaky')
+        def flaky(key, fail_times):
+            attempts[key] += 1
+            if attempts[key] <= fail_times:
+                raise RuntimeError('temporary')
+            return {'attempts': attempts[key]}
+
+        self.addCleanup(jobs.HANDLERS.pop, 'flaky')
+        retried = jobs.enqueue('flaky', {'key': 'retried', 'fail_times': 2})
+        failed = jobs.enqueue('flaky', {'key': 'failed', 'fail_times': 10}, max_attempts=2)
+        self.assertEqual(jobs.enqueue('update_members', {'project': 0}, dedup_key='x').status, Job.QUEUED)
+        with self.assertLogs('issue.jobs', 'WARNING'):
+            for _ in range(3):
+                self.run_jobs()
+        retried.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertEqual((retried.status, retried.attempts, retried.result), (Job.DONE, 3, {'attempts': 3}))
+        self.assertEqual((failed.status, failed.attempts, failed.error), (Job.FAILED, 2, 'temporary'))
+        # ошибка данных не повторяется
+        self.assertEqual(Job.objects.get(dedup_key='x').attempts, 1)
+
+    def test_stale_job_requeued(self):
+        job = jobs.enqueue('recount_project_counters')
+        self.assertEqual(jobs.claim('crashed', 5), [job.pk])
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(timeout=60), 1)
+        # выполнение брошенным обработчиком не перезаписывает состояние
+        Job.objects.filter(pk=job.pk).update(worker='crashed', status=Job.RUNNING)
+        Job.objects.filter(pk=job.pk).update(worker='new')
+        self.assertEqual(jobs.execute(job.pk), Job.DONE)
+        call_command('recount_project_counters', background=True, stdout=io.StringIO())
+        self.assertEqual(Job.objects.filter(dedup_key='recount:all', status=Job.QUEUED).count(), 1)
+
+
+@override_settings(ANALYTICS_ROLLUP_LAG=0, ANALYTICS_CLOSED_STATUSES=['Done'])
+class AnalyticsTests(TrackerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.done = Status.objects.create(name='Done')
+        cls.feature = Type.objects.create(name='Feature')
+        cls.lead = cls.create_user('lead', 'Team Lead')
+        cls.project.users.add(cls.lead)
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        self.yesterday = self.today - datetime.timedelta(days=1)
+        bug = self.create_task('bug')
+        self.create_task('feature', type=self.feature)
+        self.create_task('created closed', status=self.done)
+        TaskEvent.objects.update(created_at=timezone.now() - datetime.timedelta(days=1))
+        bug.status = self.done
+        bug.save()
+        bug.status = self.status
+        bug.save()
+
+    def get_stats(self):
+        return sorted(ProjectDailyStats.objects.values_list('date', 'type_id', 'created', 'closed'))
+
+    def test_incremental_rollup(self):
+        self.assertEqual(analytics.update_rollups(batch_size=2), 5)
+        expected = [
+            (self.yesterday, self.type.pk, 2, 1),
+            (self.yesterday, self.feature.pk, 1, 0),
+            (self.today, self.type.pk, 0, 1),
+        ]
+        self.assertEqual(self.get_stats(), sorted(expected))
+        self.assertEqual(analytics.update_rollups(), 0)
+        self.create_task('new')
+        self.assertEqual(analytics.update_rollups(), 1)
+        self.assertEqual(ProjectDailyStats.objects.get(date=self.today, type=self.type).created, 1)
+        # пересчёт по событиям даёт те же итоги
+        before = self.get_stats()
+        ProjectDailyStats.objects.update(created=0)
+        analytics.recompute_rollups([self.project.pk], start=self.yesterday)
+        self.assertEqual(self.get_stats(), before)
+
+    def test_recompute_with_archived_tasks(self):
+        analytics.update_rollups()
+        before = self.get_stats()
+        Task.objects.update(is_deleted=True)
+        Task.all_objects.update(deleted_at=timezone.now() - datetime.timedelta(days=1))
+        self.assertEqual(archive_deleted(retention_days=0), 3)
+        self.assertFalse(TaskEvent.objects.exists())
+        # история удалённых задач берётся из архива
+        analytics.recompute_rollups([self.project.pk], start=self.yesterday)
+        self.assertEqual(self.get_stats(), before)
+        analytics.recompute_rollups(end=self.yesterday, vectorised=True)
+        self.assertEqual(self.get_stats(), before)
+        analytics.recompute_rollups([self.project.pk + 1])
+        self.assertEqual(self.get_stats(), before)
+
+    def test_moved_task_keeps_closing_project(self):
+        analytics.update_rollups()
+        other = Project.objects.create(name='Other', start_date=datetime.date(2022, 10, 1))
+        task = Task.objects.get(summary='bug')
+        task.project = other
+        task.type = self.feature
+        task.save()
+        # закрытие относится к проекту и типу на момент смены статуса, как в update_rollups
+        before = self.get_stats()
+        analytics.recompute_rollups([self.project.pk], start=self.yesterday)
+        self.assertEqual(self.get_stats(), before)
+        analytics.recompute_rollups(vectorised=True)
+        self.assertEqual(self.get_stats(), before)
+        self.assertFalse(ProjectDailyStats.objects.filter(project=other).exists())
+
+    @unittest.skipIf(analytics.numpy is None, 'NumPy не установлен')
+    def test_vectorised_aggregate(self):
+        rows = list(analytics.get_events().values_list(*analytics.EVENT_COLUMNS))
+        closed = analytics.get_closed_status_ids()
+        self.assertEqual(analytics.aggregate_arrays(rows, closed), analytics.aggregate_rows(rows, closed))
+
+    def test_endpoint(self):
+        call_command('update_analytics', stdout=io.StringIO())
+        self.client.force_login(self.lead)
+        url = reverse('api_project_analytics', kwargs={'pk': self.project.pk})
+        # сессия, итоги, время обновления; права и справочники из кэша
+        self.client.get(url)
+        with self.assertNumQueries(3):
+            data = self.client.get(url, {'start': self.yesterday.isoformat(), 'type': self.type.pk}).json()
+        self.assertEqual(data['days'], [
+            {'date': self.yesterday.isoformat(), 'created': 2, 'closed': 1},
+            {'date': self.today.isoformat(), 'created': 0, 'closed': 1},
+        ])
+        self.assertEqual(data['types'], [{'type_id': self.type.pk, 'type': 'Bug', 'created': 2, 'closed': 2}])
+        self.assertEqual(len(self.client.get(url).json()['days']), 30)
+        self.assertEqual(self.client.get(url, {'start': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2000-01-01'}).status_code, 400)
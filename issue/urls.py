@@ -1,14 +1,34 @@
 from django.urls import path, include
+from issue.api import (
+    JobDetailApiView,
+    JobFileApiView,
+    ProjectAnalyticsApiView,
+    ProjectBoardChangesApiView,
+    ProjectDetailApiView,
+    ProjectListApiView,
+    TaskDetailApiView,
+    TaskExportApiView,
+    TaskListApiView,
+)
+from issue.async_views import AsyncProjectDetailView, AsyncProjectListView, AsyncTaskDetailView, AsyncTaskListView
 from issue.views import (
     UserInProjectDelete, 
     UserInProjectAdd, 
+    UserSearchView,
+    ProjectMembersView,
+    TaskImportView,
     TaskListView, 
     TaskDetailView, 
+    TaskHistoryView,
     TaskUpdateView, 
     TaskCreateView, 
     TaskDeleteView, 
+    TaskRestoreView,
     ProjectListView, 
     ProjectDetailView, 
+    ProjectBoardView,
+    ProjectTaskListView,
+    ProjectTrashView,
     ProjectCreateView
 )
 
@@ -17,13 +37,36 @@ urlpatterns = [
     path('', TaskListView.as_view(), name='task_list'),
     path('task/detail/<int:pk>', TaskDetailView.as_view(), name='task_detail'),
     path('task/update/<int:pk>', TaskUpdateView.as_view(), name='task_update'),
+    path('task/<int:pk>/history/', TaskHistoryView.as_view(), name='task_history'),
     path('task/delete/<int:pk>', TaskDeleteView.as_view(), name='task_delete'),
 
     path('project/', ProjectListView.as_view(), name='project_list'),
     path('project/detail/<int:pk>', ProjectDetailView.as_view(), name='project_detail'),
+    path('project/<int:pk>/tasks/', ProjectTaskListView.as_view(), name='project_tasks'),
+    path('project/<int:pk>/board/', ProjectBoardView.as_view(), name='project_board'),
+    path('project/<int:pk>/trash/', ProjectTrashView.as_view(), name='project_trash'),
+    path('project/<int:pk>/trash/<int:task_pk>/restore/', TaskRestoreView.as_view(), name='task_restore'),
     path('project/add/', ProjectCreateView.as_view(), name='project_create'),
     path('project/<int:pk>/task/add/', TaskCreateView.as_view(), name='task_create'),
     
     path('project/<int:pk>/users/add/', UserInProjectAdd.as_view(), name='users_add'),
+    path('project/<int:pk>/users/search/', UserSearchView.as_view(), name='user_search'),
     path('project/<int:project_pk>/user/<int:user_pk>/delete/', UserInProjectDelete.as_view(), name='user_delete'),
+    path('project/<int:pk>/members/', ProjectMembersView.as_view(), name='project_members'),
+    path('project/<int:pk>/tasks/import/', TaskImportView.as_view(), name='task_import'),
+
+    path('api/tasks/', TaskListApiView.as_view(), name='api_task_list'),
+    path('api/tasks/export/', TaskExportApiView.as_view(), name='api_task_export'),
+    path('api/tasks/<int:pk>/', TaskDetailApiView.as_view(), name='api_task_detail'),
+    path('api/projects/', ProjectListApiView.as_view(), name='api_project_list'),
+    path('api/projects/<int:pk>/', ProjectDetailApiView.as_view(), name='api_project_detail'),
+    path('api/jobs/<int:pk>/', JobDetailApiView.as_view(), name='api_job_detail'),
+    path('api/jobs/<int:pk>/file/', JobFileApiView.as_view(), name='api_job_file'),
+    path('api/projects/<int:pk>/analytics/', ProjectAnalyticsApiView.as_view(), name='api_project_analytics'),
+    path('api/projects/<int:pk>/board/changes/', ProjectBoardChangesApiView.as_view(), name='api_project_board_changes'),
+
+    path('async/', AsyncTaskListView.as_view(), name='async_task_list'),
+    path('async/task/detail/<int:pk>', AsyncTaskDetailView.as_view(), name='async_task_detail'),
+    path('async/project/', AsyncProjectListView.as_view(), name='async_project_list'),
+    path('async/project/detail/<int:pk>', AsyncProjectDetailView.as_view(), name='async_project_detail'),
 ]
@@ -1,15 +1,28 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponseBadRequest, JsonResponse, QueryDict
+from django.utils.functional import SimpleLazyObject
 from django.shortcuts import get_object_or_404, redirect
-from django.views.generic import TemplateView, ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.views.generic import View, TemplateView, ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse, reverse_lazy
-from django.db.models import Q
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.contrib.auth.models import User
-from accounts.view import GroupPermission
-from django.core.handlers.wsgi import WSGIRequest
+from accounts.view import GroupPermission, ProjectMemberPermission, TaskProjectMemberPermission
+from core.streaming import StreamingTemplateMixin
 
 
-from issue.forms import TaskForm, SearchTaskForm, ProjectForm
-from issue.models import Task, Project
+from issue.board import get_columns
+from issue.cache import ConditionalGetMixin, PROJECTS, REFERENCE, TASKS, get_versions
+from issue.forms import TaskCreateForm, TaskFilterForm, TaskForm, SearchTaskForm, ProjectForm
+from issue.history import describe_events
+from issue.importers import FORMATS, TaskImporter, TaskImportError, detect_format
+from issue.jobs import enqueue, get_storage, job_data
+from issue.membership import USER_SEARCH_LIMIT, MembershipError, search_users, update_members
+from issue.models import Task, TaskEvent, Project
+from issue.pagination import CursorPaginationMixin, CursorPaginator
+from issue.search import get_search_backend, regex_search
 
 
 class SuccessDetailUrlMixin:
@@ -20,13 +33,25 @@ class SuccessDetailUrlMixin:
         return reverse('task_detail', kwargs={'pk': self.object.pk})
 
 
-class TaskListView(ListView):
+class TaskListView(StreamingTemplateMixin, ConditionalGetMixin, CursorPaginationMixin, ListView):
+    '''список задач, пагинация номерами страниц или курсором (см. CursorPaginationMixin),
+    в курсорном режиме результаты поиска идут по дате создания, а не по релевантности.
+    При STREAMING_TEMPLATES шапка страницы уходит до запроса задач'''
     template_name: str = 'task_list.html'
     model = Task
     context_object_name = 'tasks'
+    queryset = Task.objects.for_list()
+    ordering = ['-created_at', '-pk']
     paginate_by = 3
     paginate_orphans = 1
 
+    def get_pagination_mode(self) -> str:
+        # настройка читается на каждый запрос, а не при импорте модуля
+        return settings.TASK_LIST_PAGINATION
+
+    def get_version_names(self):
+        return [TASKS, REFERENCE]
+
  
     def get_context_data(self, **kwargs):
         '''изменение контекста, добавление формы поиска'''
@@ -47,25 +72,53 @@ class TaskListView(ListView):
         return None
 
     def get_queryset(self):
-        '''возвращает список элементов queryset'''
+        '''возвращает список элементов queryset,
+        поиск по индексу или регулярным выражением, если выбран режим regex'''
         queryset = super().get_queryset()
         if self.search_value:
-            queryset = queryset.filter(
-                Q(summary__iregex=self.search_value) | Q(description__iregex=self.search_value)
-                )
+            if self.form.cleaned_data.get('mode') == SearchTaskForm.MODE_REGEX:
+                queryset = regex_search(queryset, self.search_value)
+            else:
+                queryset = get_search_backend().search(queryset, self.search_value)
         return queryset
 
 
-class TaskDetailView(GroupPermission, LoginRequiredMixin, DetailView):
+class TaskDetailView(GroupPermission, LoginRequiredMixin, ConditionalGetMixin, DetailView):
     '''детальный просмотр задачи GroupPermission - разрешение группам пользователей 
     на детальный просмотр'''
     template_name: str = 'task_detail.html'
     model = Task
+    queryset = Task.objects.for_detail()
     context_object_name = 'task'
     groups = ['Project Manager', 'Team Lead', 'Developer']
 
+    def get_version_names(self):
+        return [f'task:{self.kwargs["pk"]}', REFERENCE]
+
+
+class TaskHistoryView(GroupPermission, LoginRequiredMixin, CursorPaginationMixin, ListView):
+    '''история задачи от новых событий к старым, keyset-страницы по (created_at, id)
+    по индексу task_event_timeline_idx, поэтому длинная история не замедляет страницы'''
+    template_name = 'task_history.html'
+    context_object_name = 'events'
+    paginate_by = 20
+    pagination_mode = 'cursor'
+    groups = ['Project Manager', 'Team Lead', 'Developer']
+
+    def get_queryset(self):
+        self.task = get_object_or_404(Task.all_objects.only('summary'), pk=self.kwargs['pk'])
+        return TaskEvent.objects.filter(task_id=self.task.pk).select_related('user').only(
+            'kind', 'changes', 'created_at', 'task_id', 'user__username'
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['task'] = self.task
+        context['rows'] = describe_events(context['events'])
+        return context
 
-class TaskUpdateView(GroupPermission, LoginRequiredMixin, SuccessDetailUrlMixin, UpdateView):
+
+class TaskUpdateView(TaskProjectMemberPermission, GroupPermission, LoginRequiredMixin, SuccessDetailUrlMixin, UpdateView):
     '''добавление задачи, dispatch - проверка на добавление задачи 
     пользователю именно этого проекта'''
     template_name = 'task_update.html'
@@ -74,80 +127,181 @@ class TaskUpdateView(GroupPermission, LoginRequiredMixin, SuccessDetailUrlMixin,
     context_object_name = 'task'
     groups = ['Project Manager', 'Team Lead', 'Developer']
 
-    def dispatch(self, request, *args, **kwargs):
-        task_pk = kwargs['pk']
-        task = Task.objects.get(pk=task_pk)
-        project_of_task: Project = task.project
-        users_in_project = project_of_task.users.all()
-        if not request.user in users_in_project:
-            return self.handle_no_permission()
-        return super().dispatch(request, *args, **kwargs)
+    def form_valid(self, form):
+        form.instance.changed_by = self.request.user
+        return super().form_valid(form)
 
 
-class TaskCreateView(GroupPermission, LoginRequiredMixin, SuccessDetailUrlMixin, CreateView):
+class TaskCreateView(ProjectMemberPermission, GroupPermission, LoginRequiredMixin, SuccessDetailUrlMixin, CreateView):
     '''создание задачи, 
     dispatch - проверка на добавление задачи пользователю именно этого проекта'''
     template_name: str = 'task_create.html'
     model = Task
-    fields = ['summary', 'description', 'status', 'type']
+    form_class = TaskCreateForm
     groups = ['Project Manager', 'Team Lead', 'Developer']
 
 
     def form_valid(self, form):
-        '''проверка на ошибки'''
-        form.instance.project = get_object_or_404(Project, id=self.kwargs.get('pk'))
+        '''проверка на ошибки.
+        Проект не загружается: ProjectMemberPermission уже проверил участие в нём, значит он существует'''
+        form.instance.project_id = self.kwargs['pk']
+        form.instance.changed_by = self.request.user
         return super().form_valid(form)
 
-    def dispatch(self, request, *args, **kwargs):
-        project_pk = kwargs['pk']
-        project = Project.objects.get(pk=project_pk)
-        users_in_project = project.users.all()
-        if not request.user in users_in_project:
-            return self.handle_no_permission()
-        return super().dispatch(request, *args, **kwargs)
-
 
-class TaskDeleteView(GroupPermission, LoginRequiredMixin, DeleteView):
+class TaskDeleteView(TaskProjectMemberPermission, GroupPermission, LoginRequiredMixin, DeleteView):
     '''удаление задачи, 
-    dispatch - проверка на добавление задачи пользователю именно этого проекта'''
+    dispatch - проверка на добавление задачи пользователю именно этого проекта.
+    Удаление мягкое: задача уходит в корзину проекта, откуда её можно восстановить
+    до переноса в архив (issue.archive)'''
     template_name = 'task_delete.html'
     model = Task
     success_url = reverse_lazy('task_list')
     groups = ['Project Manager', 'Team Lead']
 
-    def dispatch(self, request: WSGIRequest, *args, **kwargs):
-        task_pk = kwargs['pk']
-        task = Task.objects.get(pk=task_pk)
-        project_of_task: Project = task.project
-        users_in_project = project_of_task.users.all()
-        if not request.user in users_in_project:
-            return self.handle_no_permission()
-        return super().dispatch(request, *args, **kwargs)
+    def form_valid(self, form):
+        self.object.is_deleted = True
+        self.object.changed_by = self.request.user
+        self.object.save()
+        return redirect(self.get_success_url())
+
+
+class ProjectTrashView(ProjectMemberPermission, GroupPermission, LoginRequiredMixin, CursorPaginationMixin, ListView):
+    '''корзина проекта: удалённые задачи от последних удалённых, keyset-страницы
+    по (deleted_at, id) по частичному индексу task_project_trash_idx'''
+    template_name = 'project/project_trash.html'
+    context_object_name = 'tasks'
+    cursor_field = 'deleted_at'
+    groups = ['Project Manager', 'Team Lead']
+
+    def is_cursor_pagination(self) -> bool:
+        return True
+
+    def get_paginate_by(self, queryset):
+        return self.get_page_size(settings.PROJECT_TASKS_PAGE_SIZE)
+
+    def get_queryset(self):
+        return Task.all_objects.filter(project_id=self.kwargs['pk'], is_deleted=True).only(
+            'summary', 'deleted_at', 'project_id', 'status_id', 'type_id'
+        ).with_reference()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['project'] = get_object_or_404(Project.objects.only('name'), pk=self.kwargs['pk'])
+        context['retention_days'] = settings.TASK_ARCHIVE_RETENTION_DAYS
+        return context
+
+
+class TaskRestoreView(ProjectMemberPermission, GroupPermission, LoginRequiredMixin, View):
+    '''восстановление задачи из корзины проекта'''
+    groups = ['Project Manager', 'Team Lead']
+
+    def post(self, request, pk, task_pk):
+        task = get_object_or_404(Task.all_objects, pk=task_pk, project_id=pk, is_deleted=True)
+        task.is_deleted = False
+        task.changed_by = request.user
+        task.save()
+        return redirect('project_trash', pk=pk)
 
 
-class ProjectListView(GroupPermission, ListView):
+class ProjectListView(GroupPermission, ConditionalGetMixin, ListView):
     '''просмот списка проектов, 
     dispatch - проверка на добавление задачи пользователю именно этого проекта'''
     template_name: str = 'project/project_list.html'
     model = Project
+    queryset = Project.objects.for_list()
     context_object_name = 'projects'
     groups = ['Project Manager', 'Team Lead', 'Developer']
 
+    def get_version_names(self):
+        return [PROJECTS, REFERENCE]
+
+
+def get_project_tasks_context(request, project_pk) -> dict:
+    '''первая страница задач проекта для project_detail.html с фильтром из GET.
+    Страница ленивая: при попадании во фрагментный кэш шаблона запроса нет,
+    следующие страницы догружаются из ProjectTaskListView'''
+    filter_form = TaskFilterForm(request.GET)
+    queryset = filter_form.filter(Task.objects.filter(project_id=project_pk).for_list())
+    paginator = CursorPaginator(queryset, settings.PROJECT_TASKS_PAGE_SIZE)
+    query = QueryDict(mutable=True)
+    for name, value in filter_form.cleaned_data.items():
+        if value is not None:
+            query[name] = value.pk
+    return {
+        'filter_form': filter_form,
+        'page_obj': SimpleLazyObject(paginator.page),
+        'query': query.urlencode(),
+        'project_pk': project_pk,
+    }
+
+
+class ProjectTaskListView(GroupPermission, ConditionalGetMixin, CursorPaginationMixin, ListView):
+    '''HTML-фрагмент со страницей задач проекта (project/project_tasks.html):
+    фильтр по статусу и типу, keyset-страницы по (created_at, id) по частичным индексам
+    task_project_*_live_idx, поэтому время ответа не зависит от размера проекта'''
+    template_name = 'project/project_tasks.html'
+    context_object_name = 'tasks'
+    groups = ['Project Manager', 'Team Lead', 'Developer']
 
-class ProjectDetailView(GroupPermission, DetailView):
+    def is_cursor_pagination(self) -> bool:
+        return True
+
+    def get_paginate_by(self, queryset):
+        '''настройка читается на каждый запрос, а не при импорте модуля'''
+        return self.get_page_size(settings.PROJECT_TASKS_PAGE_SIZE)
+
+    def get_version_names(self):
+        return [f'project:{self.kwargs["pk"]}', REFERENCE]
+
+    def get_queryset(self):
+        return TaskFilterForm(self.request.GET).filter(Task.objects.filter(project_id=self.kwargs['pk']).for_list())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['project_pk'] = self.kwargs['pk']
+        return context
+
+
+class ProjectDetailView(GroupPermission, StreamingTemplateMixin, ConditionalGetMixin, DetailView):
     '''детальный просмот списка проектов,
-    dispatch - проверка на добавление задачи пользователю именно этого проекта'''
+    dispatch - проверка на добавление задачи пользователю именно этого проекта.
+    Задачи и участники передаются ленивыми queryset, чтобы при попадании
+    во фрагментный кэш шаблона они не запрашивались'''
     template_name: str = 'project/project_detail.html'
     model = Project
     context_object_name = 'project'
     groups = ['Project Manager', 'Team Lead', 'Developer']
 
+    def get_version_names(self):
+        return [f'project:{self.kwargs["pk"]}', REFERENCE]
 
     def get_context_data(self, **kwargs):
-        '''передача в контекст пользователей'''
+        '''задачи и участники; пользователи для добавления ищутся через user_search'''
         context = super().get_context_data(**kwargs)
-        users = User.objects.all()
-        context['users'] = users
+        context.update(get_project_tasks_context(self.request, self.object.pk))
+        context['members'] = self.object.users.only('username').order_by('username')
+        context['project_version'] = self.cache_versions[f'project:{self.object.pk}']
+        return context
+
+
+class ProjectBoardView(GroupPermission, DetailView):
+    '''доска проекта: колонки по статусам, задачи одним запросом.
+    Дальше страница опрашивает ProjectBoardChangesApiView с водяной отметкой и ETag,
+    а перенос карточки - PATCH статуса в api_task_detail'''
+    template_name: str = 'project/project_board.html'
+    model = Project
+    queryset = Project.objects.only('name')
+    context_object_name = 'project'
+    groups = ['Project Manager', 'Team Lead', 'Developer']
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # версия читается до задач: изменение между ними даст новый ETag и попадёт в первый опрос
+        name = f'project:{self.object.pk}'
+        context['board_version'] = get_versions(name)[name]
+        context['columns'], context['watermark'] = get_columns(self.object)
+        context['poll_interval'] = settings.ISSUE_BOARD_POLL_INTERVAL
         return context
 
 
@@ -165,7 +319,7 @@ class ProjectCreateView(GroupPermission, LoginRequiredMixin, CreateView):
         return reverse('project_detail', kwargs={'pk': self.object.pk})
 
 
-class UserInProjectAdd(GroupPermission, TemplateView):
+class UserInProjectAdd(ProjectMemberPermission, GroupPermission, TemplateView):
     '''добавление пользователя в проект, 
     dispatch - проверка на добавление задачи пользователю именно этого проекта'''
     groups = ['Project Manager', 'Team Lead']
@@ -174,37 +328,131 @@ class UserInProjectAdd(GroupPermission, TemplateView):
     def post(self, request, *args, **kwargs):
         '''изменение метода пост для добавления пользователя в проект'''
         project_pk = kwargs.get('pk')
-        users_pk = dict(request.POST).get('users')
-        project = Project.objects.get(pk=project_pk)
-        for user_pk in users_pk:
-            project.users.add(User.objects.get(pk=user_pk))
+        project = get_object_or_404(Project, pk=project_pk)
+        try:
+            update_members(project, add=request.POST.getlist('users'))
+        except MembershipError:
+            return HttpResponseBadRequest('Некорректный список пользователей')
         return redirect('project_detail', pk=project_pk)
-        
-    def dispatch(self, request, *args, **kwargs):
-        project_pk = kwargs['pk']
-        project = Project.objects.get(pk=project_pk)
-        users_in_project = project.users.all()
-        if not request.user in users_in_project:
-            return self.handle_no_permission()
-        return super().dispatch(request, *args, **kwargs)
 
 
-class UserInProjectDelete(GroupPermission, TemplateView):
+class UserSearchView(ProjectMemberPermission, GroupPermission, View):
+    '''поиск пользователей для добавления в проект: ?q= - начало логина, имени или фамилии,
+    ?limit= - сколько вернуть; участники проекта в ответ не попадают'''
+    groups = ['Project Manager', 'Team Lead']
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.GET.get('limit', USER_SEARCH_LIMIT))
+        except ValueError:
+            return JsonResponse({'error': 'limit должен быть целым числом'}, status=400)
+        # участие в проекте уже проверено ProjectMemberPermission, значит проект существует
+        return JsonResponse({'results': search_users(request.GET.get('q', ''), kwargs['pk'], limit)})
+
+
+class UserInProjectDelete(ProjectMemberPermission, GroupPermission, TemplateView):
     '''удаление пользователя из проекта'''
     groups = ['Project Manager', 'Team Lead']
+    project_pk_kwarg = 'project_pk'
     
     def post(self, request, *args, **kwargs):
         '''изменение метода для удаления пользователя'''
         user_id = kwargs.get('user_pk')
         project_id = kwargs.get('project_pk')
-        project = Project.objects.get(pk=project_id)
-        project.users.remove(User.objects.get(pk=user_id))
+        project = get_object_or_404(Project, pk=project_id)
+        update_members(project, remove=[user_id])
         return redirect('project_detail', pk=project_id)
-    
-    def dispatch(self, request, *args, **kwargs):
-        project_pk = kwargs['project_pk']
-        project = Project.objects.get(pk=project_pk)
-        users_in_project = project.users.all()
-        if not request.user in users_in_project:
-            return self.handle_no_permission()
-        return super().dispatch(request, *args, **kwargs)
+
+
+class ProjectMembersView(ProjectMemberPermission, GroupPermission, View):
+    '''массовое изменение участников проекта, ответ - JSON со сводкой.
+    POST {"add": [id, ...], "remove": [id, ...]} - добавить/удалить,
+    PUT {"users": [id, ...]} - заменить состав целиком.
+    ?background=1 - изменение выполняется очередью заданий, ответ 202 с адресом состояния'''
+    groups = ['Project Manager', 'Team Lead']
+
+    def get_payload(self):
+        if self.request.content_type == 'application/json':
+            try:
+                payload = json.loads(self.request.body or b'{}')
+            except ValueError:
+                raise MembershipError('Некорректный JSON')
+            if not isinstance(payload, dict):
+                raise MembershipError('Ожидается JSON-объект')
+            return payload
+        data = QueryDict(self.request.body) if self.request.method == 'PUT' else self.request.POST
+        return {key: data.getlist(key) for key in ('add', 'remove', 'users') if key in data}
+
+    def change(self, **changes):
+        project = get_object_or_404(Project, pk=self.kwargs['pk'])
+        if self.request.GET.get('background'):
+            job = enqueue('update_members', {'project': project.pk, **changes}, user=self.request.user)
+            return JsonResponse(job_data(job), status=202, encoder=DjangoJSONEncoder)
+        try:
+            summary = update_members(project, **changes)
+        except MembershipError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        return JsonResponse(summary)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = self.get_payload()
+        except MembershipError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        return self.change(add=payload.get('add'), remove=payload.get('remove'))
+
+    def put(self, request, *args, **kwargs):
+        try:
+            payload = self.get_payload()
+        except MembershipError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        if 'users' not in payload:
+            return JsonResponse({'error': 'Не передан список users'}, status=400)
+        return self.change(replace=payload['users'] or [])
+
+
+class TaskImportView(ProjectMemberPermission, GroupPermission, View):
+    '''загрузка файла задач в проект (поле file, необязательные format и batch_size),
+    ответ - JSON со сводкой и ошибками по строкам. С полем background файл сохраняется
+    и импортируется очередью заданий, ответ 202 с адресом состояния задания'''
+    groups = ['Project Manager', 'Team Lead']
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return JsonResponse({'error': 'Не передан файл'}, status=400)
+        file_format = request.POST.get('format') or detect_format(upload.name)
+        if file_format not in FORMATS:
+            return JsonResponse({'error': 'format должен быть csv или ndjson'}, status=400)
+        try:
+            batch_size = max(1, int(request.POST.get('batch_size', 500)))
+        except ValueError:
+            return JsonResponse({'error': 'batch_size должен быть целым числом'}, status=400)
+        project = get_object_or_404(Project, pk=kwargs['pk'])
+        if request.POST.get('background'):
+            return self.enqueue(project, upload, file_format, batch_size)
+        try:
+            importer = TaskImporter(project, batch_size=batch_size, user=request.user)
+            result = importer.import_file(upload.file, file_format)
+        except TaskImportError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        return JsonResponse(result)
+
+    def enqueue(self, project, upload, file_format, batch_size):
+        '''повторная загрузка того же файла, пока задание не выполнено, не ставит второе'''
+        digest = hashlib.sha256()
+        for chunk in upload.chunks():
+            digest.update(chunk)
+        path = get_storage().save(f'imports/{project.pk}/{digest.hexdigest()}.{file_format}', upload)
+        payload = {
+            'project': project.pk, 'path': path, 'file_format': file_format,
+            'batch_size': batch_size, 'user': self.request.user.pk,
+        }
+        # файл удаляется после первой попытки, повтор импорта мог бы задвоить задачи
+        job = enqueue(
+            'import_tasks', payload, dedup_key=f'import:{project.pk}:{digest.hexdigest()}',
+            user=self.request.user, max_attempts=1,
+        )
+        if job.payload['path'] != path:
+            get_storage().delete(path)
+        return JsonResponse(job_data(job), status=202, encoder=DjangoJSONEncoder)
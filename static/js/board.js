@@ -0,0 +1,134 @@
+// доска проекта: перенос карточки - PATCH статуса задачи,
+// опрос изменений по водяной отметке с If-None-Match (304, пока проект не менялся)
+(function () {
+    const board = document.getElementById('board');
+    if (!board) {
+        return;
+    }
+    const settings = board.dataset;
+    let watermark = settings.watermark;
+    let etag = settings.etag;
+    let dragged = null;
+
+    function taskUrl(template, pk) {
+        return template.replace(/\/0(\/?)$/, '/' + pk + '$1');
+    }
+
+    function column(statusPk) {
+        return board.querySelector('.board-column[data-status="' + statusPk + '"]');
+    }
+
+    function card(pk) {
+        return board.querySelector('.board-card[data-task="' + pk + '"]');
+    }
+
+    function createCard(task) {
+        const element = document.createElement('div');
+        element.className = 'board-card shadow-sm p-2 mb-2 bg-body rounded-3';
+        element.draggable = true;
+        element.dataset.task = task.id;
+        const link = document.createElement('a');
+        link.href = taskUrl(settings.taskUrl, task.id);
+        const type = document.createElement('p');
+        type.className = 'mb-0';
+        type.appendChild(document.createElement('small'));
+        element.append(link, type);
+        return element;
+    }
+
+    function render(task) {
+        let element = card(task.id);
+        const target = column(task.status_id);
+        if (task.removed || !target) {
+            if (element) {
+                element.remove();
+            }
+            return;
+        }
+        if (!element) {
+            element = createCard(task);
+        }
+        element.querySelector('a').textContent = task.summary;
+        element.querySelector('small').textContent = task.type;
+        // новые изменения - наверх колонки, как при первой загрузке
+        target.insertBefore(element, target.querySelector('.board-card'));
+    }
+
+    function poll() {
+        const url = settings.changesUrl + '?since=' + encodeURIComponent(watermark);
+        fetch(url, {headers: {'If-None-Match': etag}, credentials: 'same-origin'})
+            .then(function (response) {
+                if (response.status !== 200) {
+                    return null;
+                }
+                etag = response.headers.get('ETag') || etag;
+                return response.json();
+            })
+            .then(function (data) {
+                if (data) {
+                    data.tasks.forEach(render);
+                    watermark = data.watermark;
+                }
+            })
+            .catch(function () {})
+            .finally(function () {
+                setTimeout(poll, settings.pollInterval * 1000);
+            });
+    }
+
+    function move(element, target) {
+        const source = element.parentElement;
+        const next = element.nextSibling;
+        target.insertBefore(element, target.querySelector('.board-card'));
+        fetch(taskUrl(settings.taskApiUrl, element.dataset.task) + '?fields=id', {
+            method: 'PATCH',
+            credentials: 'same-origin',
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': settings.csrfToken},
+            body: JSON.stringify({status: Number(target.dataset.status)}),
+        }).then(function (response) {
+            if (!response.ok) {
+                source.insertBefore(element, next);
+            }
+        }).catch(function () {
+            source.insertBefore(element, next);
+        });
+    }
+
+    board.addEventListener('dragstart', function (event) {
+        dragged = event.target.closest('.board-card');
+        if (dragged) {
+            event.dataTransfer.effectAllowed = 'move';
+            event.dataTransfer.setData('text/plain', dragged.dataset.task);
+        }
+    });
+
+    board.addEventListener('dragover', function (event) {
+        const target = event.target.closest('.board-column');
+        if (dragged && target) {
+            event.preventDefault();
+            target.classList.add('drop-target');
+        }
+    });
+
+    board.addEventListener('dragleave', function (event) {
+        const target = event.target.closest('.board-column');
+        if (target && !target.contains(event.relatedTarget)) {
+            target.classList.remove('drop-target');
+        }
+    });
+
+    board.addEventListener('drop', function (event) {
+        const target = event.target.closest('.board-column');
+        if (!dragged || !target) {
+            return;
+        }
+        event.preventDefault();
+        target.classList.remove('drop-target');
+        if (target !== dragged.parentElement) {
+            move(dragged, target);
+        }
+        dragged = null;
+    });
+
+    setTimeout(poll, settings.pollInterval * 1000);
+})();
@@ -0,0 +1,58 @@
+// задачи на странице проекта: следующие страницы и фильтр загружаются
+// HTML-фрагментами из project_tasks без перезагрузки страницы
+(function () {
+    const container = document.getElementById('project-tasks');
+    const filter = document.getElementById('project-tasks-filter');
+    if (!container || !filter) {
+        return;
+    }
+
+    function load(url) {
+        return fetch(url, {credentials: 'same-origin'}).then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            return response.text();
+        });
+    }
+
+    container.addEventListener('click', function (event) {
+        const link = event.target.closest('.project-tasks-more a');
+        if (!link) {
+            return;
+        }
+        event.preventDefault();
+        const more = link.parentElement;
+        link.classList.add('disabled');
+        load(link.href)
+            .then(function (html) {
+                more.insertAdjacentHTML('beforebegin', html);
+                more.remove();
+            })
+            .catch(function () {
+                link.classList.remove('disabled');
+            });
+    });
+
+    function applyFilter(event) {
+        if (event) {
+            event.preventDefault();
+        }
+        const query = new URLSearchParams(new FormData(filter));
+        for (const [name, value] of Array.from(query.entries())) {
+            if (!value) {
+                query.delete(name);
+            }
+        }
+        const search = query.toString() ? '?' + query.toString() : '';
+        load(filter.dataset.url + search).then(function (html) {
+            container.innerHTML = html;
+            history.replaceState(null, '', filter.action + search);
+        });
+    }
+
+    filter.addEventListener('submit', applyFilter);
+    filter.addEventListener('change', function () {
+        applyFilter();
+    });
+})();
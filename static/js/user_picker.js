@@ -0,0 +1,97 @@
+// выбор пользователей для добавления в проект: поиск по началу логина, имени или фамилии
+// на сервере (user_search), выбранные пользователи уходят в форму скрытыми полями users
+(function () {
+    const form = document.getElementById('user-picker');
+    if (!form) {
+        return;
+    }
+    const input = document.getElementById('id_user_search');
+    const results = document.getElementById('user-search-results');
+    const selected = document.getElementById('user-selected');
+    let timer = null;
+    let controller = null;
+
+    function label(user) {
+        const name = [user.first_name, user.last_name].filter(Boolean).join(' ');
+        return name ? user.username + ' (' + name + ')' : user.username;
+    }
+
+    function isSelected(pk) {
+        return Boolean(selected.querySelector('input[value="' + pk + '"]'));
+    }
+
+    function select(user) {
+        if (isSelected(user.id)) {
+            return;
+        }
+        const chip = document.createElement('span');
+        chip.className = 'badge bg-secondary me-1';
+        chip.textContent = user.username + ' ';
+        const field = document.createElement('input');
+        field.type = 'hidden';
+        field.name = 'users';
+        field.value = user.id;
+        const remove = document.createElement('button');
+        remove.type = 'button';
+        remove.className = 'btn-close btn-close-white btn-sm';
+        remove.addEventListener('click', function () {
+            chip.remove();
+        });
+        chip.append(field, remove);
+        selected.appendChild(chip);
+    }
+
+    function render(users) {
+        results.replaceChildren();
+        users.filter(function (user) {
+            return !isSelected(user.id);
+        }).forEach(function (user) {
+            const item = document.createElement('li');
+            const button = document.createElement('button');
+            button.type = 'button';
+            button.className = 'btn btn-link btn-sm p-0';
+            button.textContent = label(user);
+            button.addEventListener('click', function () {
+                select(user);
+                item.remove();
+            });
+            item.appendChild(button);
+            results.appendChild(item);
+        });
+    }
+
+    function search() {
+        const query = input.value.trim();
+        if (controller) {
+            controller.abort();
+        }
+        if (!query) {
+            results.replaceChildren();
+            return;
+        }
+        controller = new AbortController();
+        fetch(form.dataset.searchUrl + '?q=' + encodeURIComponent(query), {
+            credentials: 'same-origin',
+            signal: controller.signal,
+        })
+            .then(function (response) {
+                return response.ok ? response.json() : {results: []};
+            })
+            .then(function (data) {
+                render(data.results);
+            })
+            .catch(function () {});
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(search, 250);
+    });
+
+    // Enter в поле поиска не отправляет форму
+    input.addEventListener('keydown', function (event) {
+        if (event.key === 'Enter') {
+            event.preventDefault();
+        }
+    });
+})();